@@ -0,0 +1,78 @@
+#! /usr/bin/env python
+"""Measures the rendering time of draft vs publication quality figures.
+
+NAME
+    figure_quality.py
+
+SYNOPSYS
+    ./figure_quality.py [num_subplots]
+
+DESCRIPTION
+    Renders the same multi-page figure, two subplots per page, once in draft
+    quality (mathtext) and once in publication quality (LaTeX) and prints the
+    time taken by each. Every subplot is a reuse distance like line plot with
+    labelled ticks, as in Benchmark.plot_rd_profiles. Publication quality
+    needs a LaTeX installation, it is reported as unavailable otherwise.
+
+OPTIONS
+    num_subplots
+        Number of subplots to render. Optional, default 1000.
+
+EXAMPLES
+    ./figure_quality.py 1000
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+from cp_utilities import figure as fig
+
+
+def render(quality, num_subplots, directory):
+    """Render the figure, return the time taken in seconds."""
+    bins = np.arange(64)
+    dist_labels = ['%.2f' % (2 ** (x / 4)) for x in bins]
+    rng = np.random.RandomState(0)
+    start = time.time()
+    figure = fig.Figure(os.path.join(directory, quality),
+                        total_subplots=num_subplots,
+                        subplots_per_page=2, font_size=3, quality=quality)
+    for i in xrange(num_subplots):
+        figure.add_plot(False, ['Profile Id %d' % i], 'reuse distance',
+                        'frequency', 'Profile Id %d' % i, dist_labels,
+                        bins, rng.randint(0, 1000, size=len(bins)))
+    figure.save_and_close()
+    return time.time() - start
+
+
+def figure_quality():
+    """See script description."""
+    if len(sys.argv) > 2:
+        sys.stdout.write("Incorrect number of arguments. Program description:\n"
+                         + __doc__)
+        sys.exit(1)
+    num_subplots = int(sys.argv[1]) if len(sys.argv) == 2 else 1000
+    directory = tempfile.mkdtemp()
+    try:
+        for quality in ['draft', 'publication']:
+            try:
+                elapsed = render(quality, num_subplots, directory)
+                sys.stdout.write("%s: %d subplots in %.2f s\n" %
+                                 (quality, num_subplots, elapsed))
+            except (RuntimeError, OSError) as err:
+                sys.stdout.write("%s: unavailable (%s)\n" %
+                                 (quality, str(err).splitlines()[0]))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    figure_quality()
@@ -0,0 +1,98 @@
+#! /usr/bin/env python
+"""Measures the resident memory while rendering a long multi-page figure.
+
+NAME
+    page_memory.py
+
+SYNOPSYS
+    ./page_memory.py [num_pages [subplots_per_page]]
+
+DESCRIPTION
+    Renders a draft quality figure page after page, every subplot a reuse
+    distance like line plot with labelled ticks, as in
+    Benchmark.plot_rd_profiles. Prints the resident memory of the process
+    every tenth of the pages and the peak at the end. The pages are written
+    to the file as they are done, so the resident memory should stay flat
+    whatever the number of pages.
+
+OPTIONS
+    num_pages
+        Number of pages to render. Optional, default 200.
+    subplots_per_page
+        Number of subplots in a page. Optional, default 2.
+
+EXAMPLES
+    ./page_memory.py 500 4
+"""
+
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+from cp_utilities import figure as fig
+
+
+def resident_mb():
+    """Return the current resident memory in MB, or the peak one where
+    /proc is not available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() / 1048576.0
+    except IOError:
+        return peak_mb()
+
+
+def peak_mb():
+    """Return the peak resident memory in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak / 1048576.0
+    return peak / 1024.0
+
+
+def page_memory():
+    """See script description."""
+    if len(sys.argv) > 3:
+        sys.stdout.write("Incorrect number of arguments. Program description:\n"
+                         + __doc__)
+        sys.exit(1)
+    num_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    subplots_per_page = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    num_subplots = num_pages * subplots_per_page
+    bins = np.arange(64)
+    dist_labels = ['%.2f' % (2 ** (x / 4)) for x in bins]
+    rng = np.random.RandomState(0)
+    directory = tempfile.mkdtemp()
+    try:
+        start = time.time()
+        figure = fig.Figure(os.path.join(directory, 'pages'),
+                            total_subplots=num_subplots,
+                            subplots_per_page=subplots_per_page,
+                            font_size=3, quality='draft')
+        for i in xrange(num_subplots):
+            figure.add_plot(False, ['Profile Id %d' % i], 'reuse distance',
+                            'frequency', 'Profile Id %d' % i, dist_labels,
+                            bins, rng.randint(0, 1000, size=len(bins)))
+            page = i / subplots_per_page + 1
+            if (i + 1) % subplots_per_page == 0 and \
+                    page % max(1, num_pages / 10) == 0:
+                sys.stdout.write("page %d: %.1f MB resident\n" %
+                                 (page, resident_mb()))
+        figure.save_and_close()
+        sys.stdout.write("%d pages in %.2f s, peak %.1f MB resident\n" %
+                         (num_pages, time.time() - start, peak_mb()))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    page_memory()
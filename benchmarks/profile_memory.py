@@ -0,0 +1,126 @@
+#! /usr/bin/env python
+"""Compares the memory of the per-thread data of a Benchmark in dicts and in
+the arrays of profile_table.py.
+
+NAME
+    profile_memory.py
+
+SYNOPSYS
+    ./profile_memory.py [--threads N] [--intervals N] [--distances N]
+    [--data directory]
+
+DESCRIPTION
+    Generates a deterministic reuse distance file with synthetic_rd.py,
+    reads it and builds the cdfs, then measures the memory of the profiles,
+    total frequencies and cdfs in two layouts:
+        dicts   the layout before profile_table.py, rebuilt from the
+                benchmark: per thread a dict of profile id to a dict of
+                '%.2f' distance strings to frequency strings, a dict of
+                profile id to total frequency and a dict of profile id to a
+                list of ints for the cdf. Measured as the sum of
+                sys.getsizeof of all the objects, without counting the small
+                ints and the interned strings shared with the rest of the
+                program twice.
+        arrays  Benchmark.nbytes(), the arrays of the tables, capacity
+                included.
+    The peak resident memory of the process is printed too.
+
+OPTIONS
+    --threads N
+        Default 4.
+    --intervals N
+        Default 20000.
+    --distances N
+        Distinct distances per histogram. Default 64.
+    --data directory
+        Where the generated input is kept between runs. Default
+        cp_utils_suite in the temporary directory.
+
+EXAMPLES
+    ./profile_memory.py --intervals 100000
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_here, os.pardir))
+from cp_utilities import benchmark as bm
+from cp_utilities import progress
+import synthetic_rd
+
+
+def deep_size(obj, seen):
+    """Return the bytes of an object and of the objects it holds, each
+    object counted once."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen)
+                    for k, v in obj.iteritems())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(x, seen) for x in obj)
+    return size
+
+
+def dict_layout(benchmark):
+    """Return the per-thread data of a benchmark in the dicts of the old
+    layout: (profiles, total frequencies, cdfs) per thread."""
+    layout = list()
+    for t in xrange(benchmark.num_threads):
+        ids = benchmark.get_profile_ids(t)
+        layout.append((
+            dict((i, benchmark.get_rd_profile(t, i)) for i in ids),
+            dict((i, benchmark.get_total_freq(t, i)) for i in ids),
+            dict((i, benchmark.get_freq_cdf(t, i))
+                 for i in benchmark.get_cdf_ids(t))))
+    return layout
+
+
+def profile_memory():
+    """See script description."""
+    parser = argparse.ArgumentParser(prog='profile_memory.py',
+                                     add_help=False)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--intervals', type=int, default=20000)
+    parser.add_argument('--distances', type=int, default=64)
+    parser.add_argument('--data', default=os.path.join(tempfile.gettempdir(),
+                                                       'cp_utils_suite'))
+    try:
+        args = parser.parse_args()
+    except SystemExit:
+        sys.stdout.write("Program description:\n" + __doc__)
+        raise
+    path = os.path.join(args.data, 'memory_%d_%d_%d.rd' % (
+        args.threads, args.intervals, args.distances))
+    if not os.path.exists(path):
+        if not os.path.isdir(args.data):
+            os.makedirs(args.data)
+        synthetic_rd.write_rd_file(path + '.tmp', args.threads,
+                                   args.intervals, args.distances)
+        os.rename(path + '.tmp', path)
+    benchmark = bm.Benchmark('memory', args.threads, None, 512, 16)
+    benchmark.read_rddata_from_file(path, args.threads)
+    benchmark.build_freq_vs_capacity_profile()
+    arrays = benchmark.nbytes()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    progress.log.info("building the dicts")
+    # the small ints are shared by the whole program, count them as such
+    seen = set(id(x) for x in xrange(-5, 257))
+    dicts = deep_size(dict_layout(benchmark), seen)
+    sys.stdout.write("%d threads, %d intervals, %d distances\n" % (
+        args.threads, args.intervals, args.distances))
+    sys.stdout.write("dicts  %10.1f MB\n" % (dicts / 1048576.))
+    sys.stdout.write("arrays %10.1f MB (%.1fx smaller)\n" % (
+        arrays / 1048576., float(dicts) / arrays))
+    sys.stdout.write("peak RSS with the arrays %.1f MB\n" % (rss / 1024.))
+    sys.stderr.write("my work is done here\n")
+
+
+if __name__ == '__main__':
+    profile_memory()
@@ -0,0 +1,141 @@
+#! /usr/bin/env python
+"""Measures the latency and throughput of the analysis server.
+
+NAME
+    server_load.py
+
+SYNOPSYS
+    ./server_load.py [clients [queries [batch [socket_path benchmark]]]]
+
+DESCRIPTION
+    Opens clients connections to the analysis server (see server.py), each
+    sending queries partition queries for random intervals, preferred
+    threads and numbers of ways, batch queries per request. Prints the
+    median and 99th percentile latency of a request and the queries answered
+    per second over all clients.
+
+    Without a socket path, a server is started in this process on a
+    temporary Unix socket with a synthetic benchmark of 4 threads, 32 ways
+    and 10000 intervals.
+
+OPTIONS
+    clients
+        Number of concurrent connections. Optional, default 4.
+    queries
+        Number of queries per connection. Optional, default 10000.
+    batch
+        Number of queries per request. Optional, default 1.
+    socket_path, benchmark
+        Unix socket of a running server and the benchmark to query.
+        Optional.
+
+EXAMPLES
+    ./server_load.py 8 10000 16
+"""
+
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'cp_utilities'))
+import numpy as np
+import benchmark as bm
+import server
+
+
+def synthetic_server(path):
+    """Start a server with a synthetic benchmark in a thread."""
+    rng = np.random.RandomState(0)
+    new_bm = bm.Benchmark('synthetic', 4, None, 512, 32)
+    for t in xrange(4):
+        for profile_id in xrange(1, 10001):
+            steps = rng.randint(0, 100, size=33)
+            new_bm.set_freq_cdf(t, profile_id, np.cumsum(steps).tolist())
+    data = server.AnalysisData()
+    data.add(new_bm)
+    analysis_server = server.UnixServer(path, data)
+    thread = threading.Thread(target=analysis_server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return analysis_server
+
+
+def client(path, name, intervals, queries, batch, seed, latencies):
+    """Send the queries of one connection, append the request latencies."""
+    rng = np.random.RandomState(seed)
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(path)
+    reader = connection.makefile('r')
+    for dummy in xrange(queries / batch):
+        request = [{'op': 'partition', 'benchmark': name,
+                    'interval': int(rng.randint(intervals[0],
+                                                intervals[1] + 1)),
+                    'ways': int(rng.choice([8, 16, 32])),
+                    'preferred_thread': int(rng.randint(0, 4))}
+                   for i in xrange(batch)]
+        start = time.time()
+        connection.sendall(json.dumps(request) + '\n')
+        response = json.loads(reader.readline())
+        latencies.append(time.time() - start)
+        assert all('alloc' in answer for answer in response), response
+    connection.close()
+
+
+def server_load():
+    """See script description."""
+    if len(sys.argv) > 6 or len(sys.argv) == 5:
+        sys.stdout.write("Incorrect number of arguments. Program description:\n"
+                         + __doc__)
+        sys.exit(1)
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    batch = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    directory = None
+    analysis_server = None
+    if len(sys.argv) == 6:
+        path, name = sys.argv[4], sys.argv[5]
+    else:
+        directory = tempfile.mkdtemp()
+        path, name = os.path.join(directory, 'server.sock'), 'synthetic'
+        analysis_server = synthetic_server(path)
+    try:
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        probe.connect(path)
+        probe.sendall(json.dumps({'op': 'benchmarks'}) + '\n')
+        intervals = json.loads(probe.makefile('r').readline())[
+            'benchmarks'][name]['intervals']
+        probe.close()
+        # warm up: the allocations are computed on the first query
+        client(path, name, intervals, 3 * batch, batch, 0, list())
+        latencies = [list() for i in xrange(clients)]
+        threads = [threading.Thread(target=client,
+                                    args=(path, name, intervals, queries,
+                                          batch, c + 1, latencies[c]))
+                   for c in xrange(clients)]
+        start = time.time()
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        elapsed = time.time() - start
+        all_latencies = np.sort(np.concatenate(latencies)) * 1e3
+        answered = len(all_latencies) * batch
+        sys.stdout.write("%d clients, %d queries per request: median %.3f ms "
+                         "p99 %.3f ms per request, %.0f queries/s\n" %
+                         (clients, batch, np.median(all_latencies),
+                          all_latencies[int(0.99 * (len(all_latencies) - 1))],
+                          answered / elapsed))
+    finally:
+        if analysis_server is not None:
+            analysis_server.shutdown()
+            analysis_server.server_close()
+        if directory is not None:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    server_load()
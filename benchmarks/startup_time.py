@@ -0,0 +1,84 @@
+#! /usr/bin/env python
+"""Measures the startup time of the compute core with and without plotting.
+
+NAME
+    startup_time.py
+
+SYNOPSYS
+    ./startup_time.py [runs]
+
+DESCRIPTION
+    Starts a fresh interpreter which imports the modules used by
+    best_partition.py (benchmark and cluster), then one which also imports
+    figure as benchmark did at load before plotting was imported on first
+    use. Prints the median wall time of each over the runs and the time of
+    the slowest top-level imports of both, measured by timing __import__ in
+    the child (Python 2 has no -X importtime).
+
+OPTIONS
+    runs
+        Number of interpreters started for each case. Optional, default 10.
+
+EXAMPLES
+    ./startup_time.py 20
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+
+_package = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'cp_utilities')
+_cases = [('compute core', 'import benchmark, cluster'),
+          ('with plotting', 'import benchmark, cluster, figure')]
+_profile = """
+import __builtin__, sys, time
+_import = __builtin__.__import__
+times = dict()
+depth = [0]
+def timed_import(name, *args, **kwargs):
+    depth[0] += 1
+    start = time.time()
+    try:
+        return _import(name, *args, **kwargs)
+    finally:
+        depth[0] -= 1
+        if depth[0] == 0:
+            times[name] = times.get(name, 0.0) + time.time() - start
+__builtin__.__import__ = timed_import
+%s
+for name, elapsed in sorted(times.items(), key=lambda x: -x[1])[:5]:
+    sys.stdout.write('%%s %%f\\n' %% (name, elapsed))
+"""
+
+
+def run(code):
+    """Start an interpreter running code, return the wall time and the
+    output."""
+    start = time.time()
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     cwd=_package)
+    return time.time() - start, output
+
+
+def startup_time():
+    """See script description."""
+    if len(sys.argv) > 2:
+        sys.stdout.write("Incorrect number of arguments. Program description:\n"
+                         + __doc__)
+        sys.exit(1)
+    runs = int(sys.argv[1]) if len(sys.argv) == 2 else 10
+    for name, code in _cases:
+        times = sorted(run(code)[0] for i in xrange(runs))
+        sys.stdout.write("%s: median %.3f s over %d runs\n" %
+                         (name, times[len(times) / 2], runs))
+        for line in run(_profile % code)[1].splitlines():
+            module, elapsed = line.split()
+            sys.stdout.write("    import %s: %.3f s\n" %
+                             (module, float(elapsed)))
+
+
+if __name__ == '__main__':
+    startup_time()
@@ -0,0 +1,293 @@
+#! /usr/bin/env python
+"""Times the analysis stages on synthetic inputs and checks for regressions.
+
+NAME
+    suite.py
+
+SYNOPSYS
+    ./suite.py [--quick] [--repeat N] [--results file] [--tolerance T]
+    [--compare commit] [--no-record] [--data directory] [case ...]
+
+DESCRIPTION
+    Generates deterministic reuse distance files with synthetic_rd.py and
+    times the stages of the analysis on each of them: parse
+    (read_rddata_from_file), cdf (build_freq_vs_capacity_profile), partition
+    (find_best_partition) and render (plot_rd_profiles in draft quality, or
+    plot_rd_profiles_by_hit_type). Every stage is run repeat times and its
+    best time is kept. Needs no network and nothing beyond the dependencies
+    of cp_utilities.
+
+    The times are appended as one JSON line, with the commit, the machine
+    and the python version, to the results file, so the same file tracks
+    the times across commits. The times are compared with the median of the
+    last five results of the same machine, python version and suite
+    settings, or with the results of one commit: the suite exits with
+    status 1 if a stage is slower than that by more than the tolerance and
+    by more than 50 ms.
+
+    Cases:
+        flat    4 threads, 2000 intervals, 64 distances
+        wide    4 threads, 200 intervals, 1024 distances
+        hybrid  4 threads, 500 intervals, 64 distances, private and shared
+                stacks, partitioned with the shared profile
+        hits    4 threads, 50 intervals, 64 distances, hit types, parsed and
+                rendered only
+
+OPTIONS
+    --quick
+        Tenth of the intervals, for a fast check.
+    --repeat N
+        Runs of every stage. Default 3.
+    --results file
+        Results file. Default results.jsonl next to this script.
+    --tolerance T
+        Allowed slowdown, relative. Default 0.25.
+    --compare commit
+        Compare with the last result of a commit (a prefix of its hash).
+    --no-record
+        Do not append the times to the results file.
+    --data directory
+        Where the generated inputs are kept between runs. Default
+        cp_utils_suite in the temporary directory.
+    case
+        Cases to run. Default all.
+
+EXAMPLES
+    ./suite.py --quick
+    ./suite.py --compare 2b800e5 flat wide
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_here, os.pardir))
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+from cp_utilities import benchmark as bm
+from cp_utilities import figure as fig
+import synthetic_rd
+
+
+# name: (threads, intervals, distances, hybrid, hit types)
+_cases = [('flat', (4, 2000, 64, False, False)),
+          ('wide', (4, 200, 1024, False, False)),
+          ('hybrid', (4, 500, 64, True, False)),
+          ('hits', (4, 50, 64, False, True))]
+_stages = ['parse', 'cdf', 'partition', 'render']
+_window = 5
+_noise = 0.05
+_render_profiles = 5
+
+
+class _Quiet(object):
+    """Context discarding what the stages print."""
+
+    def __enter__(self):
+        self.stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+
+    def __exit__(self, *exc_info):
+        sys.stdout.close()
+        sys.stdout = self.stdout
+
+
+def input_file(data, name, params, quick):
+    """Return the input file of a case, generating it if needed."""
+    threads, intervals, distances, hybrid, hit_types = params
+    if quick:
+        intervals = max(10, intervals / 10)
+    path = os.path.join(data, '%s_%d_%d_%d.rd' % (name, threads, intervals,
+                                                  distances))
+    if not os.path.exists(path):
+        if not os.path.isdir(data):
+            os.makedirs(data)
+        synthetic_rd.write_rd_file(path + '.tmp', threads, intervals,
+                                   distances, hybrid, hit_types)
+        os.rename(path + '.tmp', path)
+    return path
+
+
+def run_case(name, params, path, directory):
+    """Run the stages of a case once, return the time of every stage."""
+    threads, dummy, dummy, hybrid, hit_types = params
+    times = dict()
+    start = time.time()
+    stack_types = ['private', 'shared'] if hybrid else [None]
+    benchmarks = list()
+    for stack_type in stack_types:
+        new_bm = bm.Benchmark(name, threads, stack_type, 512, 16)
+        new_bm.read_rddata_from_file(path, threads)
+        benchmarks.append(new_bm)
+    times['parse'] = time.time() - start
+    new_bm = benchmarks[0]
+    if not hit_types:
+        start = time.time()
+        for b in benchmarks:
+            b.build_freq_vs_capacity_profile()
+        times['cdf'] = time.time() - start
+        start = time.time()
+        new_bm.find_best_partition(
+            shared_profile=benchmarks[1] if hybrid else None)
+        times['partition'] = time.time() - start
+    # the render cache skips the files already rendered: render in a new
+    # directory every time
+    cwd = os.getcwd()
+    render_dir = tempfile.mkdtemp(dir=directory)
+    os.chdir(render_dir)
+    try:
+        os.mkdir(name)
+        start = time.time()
+        if hit_types:
+            new_bm.plot_rd_profiles_by_hit_type(processes=1)
+        else:
+            new_bm.plot_rd_profiles(
+                profile_ids=new_bm.get_profile_ids(0)[:_render_profiles],
+                processes=1)
+        times['render'] = time.time() - start
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(render_dir)
+    return times
+
+
+def git_commit():
+    """Return the commit of the working tree and whether it has local
+    changes, or (None, None) outside of git."""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                         cwd=_here).strip()
+        status = subprocess.check_output(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=_here)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def read_results(path):
+    """Return the results recorded so far, oldest first."""
+    if not os.path.exists(path):
+        return list()
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def baseline(results, record, compare=None):
+    """Return the reference times {case: {stage: seconds}} for a record and
+    a description of where they come from."""
+    same = [r for r in results
+            if (r['machine'], r['python'], r['quick'], r['repeat']) ==
+            (record['machine'], record['python'], record['quick'],
+             record['repeat'])]
+    if compare is not None:
+        same = [r for r in same if (r['commit'] or '').startswith(compare)]
+        same = same[-1:]
+        source = 'commit %s' % compare
+    else:
+        same = same[-_window:]
+        source = 'median of the last %d results' % len(same)
+    reference = dict()
+    for case, times in record['times'].iteritems():
+        for stage in times:
+            previous = [r['times'][case][stage] for r in same
+                        if stage in r['times'].get(case, {})]
+            if previous:
+                reference.setdefault(case, dict())[stage] = float(
+                    np.median(previous))
+    return reference, source
+
+
+def regressions(record, reference, tolerance):
+    """Return the (case, stage, seconds, reference seconds) slower than the
+    reference by more than the tolerance and the noise."""
+    slower = list()
+    for case, times in sorted(record['times'].iteritems()):
+        for stage in _stages:
+            if stage not in times or stage not in reference.get(case, {}):
+                continue
+            now, then = times[stage], reference[case][stage]
+            if now > then * (1 + tolerance) and now - then > _noise:
+                slower.append((case, stage, now, then))
+    return slower
+
+
+def suite():
+    """See script description."""
+    parser = argparse.ArgumentParser(prog='suite.py', add_help=False)
+    parser.add_argument('--quick', action='store_true')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--results',
+                        default=os.path.join(_here, 'results.jsonl'))
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--compare')
+    parser.add_argument('--no-record', action='store_true')
+    parser.add_argument('--data', default=os.path.join(tempfile.gettempdir(),
+                                                       'cp_utils_suite'))
+    parser.add_argument('cases', nargs='*')
+    try:
+        args = parser.parse_args()
+        unknown = set(args.cases) - set(name for name, dummy in _cases)
+        if unknown:
+            parser.error('unknown cases: ' + ', '.join(sorted(unknown)))
+    except SystemExit:
+        sys.stdout.write("Program description:\n" + __doc__)
+        raise
+    fig.set_default_quality('draft')
+    commit, dirty = git_commit()
+    record = {'commit': commit, 'dirty': dirty,
+              'date': datetime.datetime.now().isoformat(),
+              'machine': platform.node(),
+              'python': platform.python_version(),
+              'quick': args.quick, 'repeat': args.repeat,
+              'times': dict()}
+    directory = tempfile.mkdtemp()
+    try:
+        for name, params in _cases:
+            if args.cases and name not in args.cases:
+                continue
+            path = input_file(args.data, name, params, args.quick)
+            best = dict()
+            for dummy in xrange(args.repeat):
+                with _Quiet():
+                    times = run_case(name, params, path, directory)
+                for stage, seconds in times.iteritems():
+                    best[stage] = min(seconds, best.get(stage, seconds))
+            record['times'][name] = best
+    finally:
+        shutil.rmtree(directory)
+    results = read_results(args.results)
+    reference, source = baseline(results, record, args.compare)
+    sys.stdout.write("%-8s %-10s %10s %10s\n" % ('case', 'stage', 'seconds',
+                                                 'reference'))
+    for name, times in sorted(record['times'].iteritems()):
+        for stage in _stages:
+            if stage in times:
+                then = reference.get(name, {}).get(stage)
+                sys.stdout.write("%-8s %-10s %10.3f %10s\n" % (
+                    name, stage, times[stage],
+                    '-' if then is None else '%.3f' % then))
+    slower = regressions(record, reference, args.tolerance)
+    if not args.no_record:
+        with open(args.results, 'a') as f:
+            f.write(json.dumps(record, sort_keys=True) + '\n')
+    if slower:
+        sys.stdout.write("Regressions against the %s:\n" % source)
+        for name, stage, now, then in slower:
+            sys.stdout.write("    %s %s: %.3f s, was %.3f s (+%.0f%%)\n" % (
+                name, stage, now, then, 100 * (now / then - 1)))
+        sys.exit(1)
+    sys.stderr.write("my work is done here\n")
+
+
+if __name__ == '__main__':
+    suite()
@@ -0,0 +1,119 @@
+#! /usr/bin/env python
+"""Writes a synthetic output file of the reuse distance tool.
+
+NAME
+    synthetic_rd.py
+
+SYNOPSYS
+    ./synthetic_rd.py output_file num_threads num_intervals num_distances
+    [--hybrid] [--hit-types] [--phase-length N] [--seed N]
+
+DESCRIPTION
+    Writes reuse distance signatures in the format of the Pin tool, as read
+    by Benchmark.read_rddata_from_file: for every interval and thread, a
+    histogram over num_distances distinct distances plus the misses at the
+    magic miss distance. The intervals go through phases of phase_length
+    intervals, each phase with its own signature, and every interval draws
+    its frequencies from the signature of its phase. The same arguments
+    always give the same file.
+
+OPTIONS
+    output_file
+        File to write.
+    num_threads, num_intervals, num_distances
+        Size of the output.
+    --hybrid
+        Write a private and a shared histogram for every thread.
+    --hit-types
+        Break every frequency in miss, private self and foreign hits, shared
+        self and foreign hits.
+    --phase-length
+        Number of intervals of a phase. Default 10.
+    --seed
+        Seed of the generator. Default 0.
+
+EXAMPLES
+    ./synthetic_rd.py rd.out 4 1000 64 --hybrid
+"""
+
+import argparse
+import numpy as np
+
+
+_MAGIC_MISS_DISTANCE = 4611686018427387904  # 2^62
+_NUM_HIT_TYPES = 5
+
+
+def _histogram(distances, frequencies, misses):
+    """Return a histogram line. frequencies has one column per hit type, or
+    is 1-D."""
+    if frequencies.ndim == 1:
+        tokens = ['%d:%d' % pair for pair in zip(distances.tolist(),
+                                                  frequencies.tolist())]
+        tokens.append('%d:%d' % (_MAGIC_MISS_DISTANCE, misses))
+    else:
+        tokens = ['%d:%s' % (d, ':'.join(map(str, f))) for d, f in
+                  zip(distances.tolist(), frequencies.tolist())]
+        tokens.append('%d:%s' % (_MAGIC_MISS_DISTANCE,
+                                 ':'.join([str(misses)] +
+                                          ['0'] * (_NUM_HIT_TYPES - 1))))
+    return 'histogram:{' + ', '.join(tokens) + '}\n'
+
+
+def write_rd_file(output_file, num_threads, num_intervals, num_distances,
+                  hybrid=False, hit_types=False, phase_length=10, seed=0):
+    """Write a synthetic reuse distance file, see the script description."""
+    rng = np.random.RandomState(seed)
+    distances = np.cumsum(rng.randint(1, 8, size=num_distances)) - 1
+    stacks = ['Private', 'Shared'] if hybrid else [None]
+    num_phases = max(1, (num_intervals + phase_length - 1) / phase_length)
+    # mean frequency per phase, thread, stack and distance: a background
+    # plus a peak around a random distance
+    position = np.arange(num_distances)
+    centers = rng.randint(0, num_distances,
+                          size=(num_phases, num_threads, len(stacks), 1))
+    widths = rng.randint(1, max(2, num_distances / 8) + 1,
+                         size=centers.shape)
+    means = 2.0 + 50.0 * np.exp(-((position - centers) / widths.astype(float))
+                                ** 2)
+    with open(output_file, 'w') as out:
+        for interval in xrange(num_intervals):
+            out.write('Interval:%d\n' % (interval + 1))
+            phase_means = means[interval / phase_length]
+            for t in xrange(num_threads):
+                out.write('thread:%d\n' % t)
+                for s, stack in enumerate(stacks):
+                    if stack is not None:
+                        out.write(stack + '\n')
+                    mean = phase_means[t, s]
+                    if hit_types:
+                        shares = rng.dirichlet(np.ones(_NUM_HIT_TYPES),
+                                               size=num_distances)
+                        frequencies = rng.poisson(mean[:, None] * shares)
+                    else:
+                        frequencies = rng.poisson(mean)
+                    misses = rng.poisson(mean.sum() / 10.0)
+                    out.write(_histogram(distances, frequencies, misses))
+
+
+def synthetic_rd():
+    """See script description."""
+    parser = argparse.ArgumentParser(prog='synthetic_rd.py',
+                                     description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output_file')
+    parser.add_argument('num_threads', type=int)
+    parser.add_argument('num_intervals', type=int)
+    parser.add_argument('num_distances', type=int)
+    parser.add_argument('--hybrid', action='store_true')
+    parser.add_argument('--hit-types', action='store_true')
+    parser.add_argument('--phase-length', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_rd_file(args.output_file, args.num_threads, args.num_intervals,
+                  args.num_distances, args.hybrid, args.hit_types,
+                  args.phase_length, args.seed)
+
+
+if __name__ == '__main__':
+    synthetic_rd()
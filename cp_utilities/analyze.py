@@ -1,24 +1,71 @@
-"""Coming Later
+#! /usr/bin/env python
+"""Plots miss rate vs interval for benchmarks.
 
-"""
+NAME
+    analyze.py
+
+SYNOPSYS
+    ./analyze.py benchmarks input_files num_threads [capacities]
+
+DESCRIPTION
+    For every benchmark, plots the miss rate of every thread vs interval,
+    one subplot per cache capacity, in benchmark/benchmark_mr_i_<digest>.pdf.
+    The miss rates are computed from the reuse distance profiles of the input
+    file (see Benchmark.miss_rate_tensor), for any capacities. An input file
+    holding precomputed miss rates (lines num_intervals and
+    miss_rate_all_intervals per thread) is still read, for its nine
+    capacities 64 to 1M only. Then all the benchmarks are plotted together
+    in bm_v_interval.pdf.
+
+OPTIONS
+    benchmarks
+        Comma separated benchmark names.
+
+    input_files
+        Comma separated input files, one per benchmark: output of the reuse
+        distance tool, or precomputed miss rates.
+
+    num_threads
+        Number of threads.
 
-"""Additional Info
+    capacities
+        Comma separated capacities in blocks, with an optional K or M
+        suffix. Default 64,256,512,1K,2K,64K,256K,512K,1M.
+
+EXAMPLES
+    ./analyze.py blackscholes,canneal rda_blackscholes.out,rda_canneal.out 4
+
+    ./analyze.py blackscholes rda_blackscholes.out 4 128,1K,8K,32K
+
+NOTES
+    The output directory of every benchmark must exist.
 
 Created on Oct 28, 2011
 @author: Abhisek
-
 """
 import sys
 import benchmark as bm
 import plot_data as pd
 
 
+def _has_miss_rates(bmfile):
+    """Return True if a file holds precomputed miss rates rather than reuse
+    distance profiles."""
+    with open(bmfile) as src:
+        for line in src:
+            if line.startswith("Interval"):
+                return False
+            if line.startswith("miss_rate_all_intervals"):
+                return True
+    return False
+
+
 def analyze():
-    """ """
+    """See script description."""
     #=======================================================================
     # command line processing
     #=======================================================================
-    if len(sys.argv) != 4:
+    if not(4 <= len(sys.argv) <= 5):
         sys.stdout.write("Incorrect number of arguments. Program description:\n" 
                          + __doc__)
         sys.exit(1)
@@ -26,16 +73,20 @@ def analyze():
     benchmarks_to_analyze = sys.argv[1].split(',')
     file_names = sys.argv[2].split(',')
     num_threads = int(sys.argv[3])
+    capacities = None
+    if len(sys.argv) == 5: capacities = sys.argv[4].split(',')
     
     bm_list = list()
-    for program_name in benchmarks_to_analyze:
-        new_bm = bm.Benchmark(program_name, num_threads)
-        bmfile = file_names[benchmarks_to_analyze.index(program_name)]
-        new_bm.read_mrdata_from_file(bmfile)
-        new_bm.plot_mr_v_interval(new_style=False)
+    for program_name, bmfile in zip(benchmarks_to_analyze, file_names):
+        new_bm = bm.Benchmark(program_name, num_threads, None)
+        if _has_miss_rates(bmfile):
+            new_bm.read_mrdata_from_file(bmfile)
+        else:
+            new_bm.read_rddata_from_file(bmfile, num_threads)
+        new_bm.plot_mr_v_interval(new_style=False, capacities=capacities)
         bm_list.append(new_bm)
         
-    #pd.plot_mr_v_interval(bm_list, "bm_v_interval.eps", same_axis=False)
+    pd.plot_mr_v_interval(bm_list, "bm_v_interval", capacities)
     sys.stderr.write("my work is done here\n")
 
 if __name__ == '__main__':
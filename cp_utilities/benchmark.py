@@ -1,17 +1,67 @@
 """
 Exports the Benchmark class, which is responsible for storing and plotting the
 data corresponding to a benchmark. Utility class that is used by most scripts.
+
+The plotting methods import figure, and with it matplotlib, on first use, so
+scripts which only parse profiles and search partitions never load them.
+The long loops report their progress and per-interval debug messages through
+progress.py.
+The names of the plot files end with a digest of what they are drawn from,
+and plots which are already up to date are not rendered again, see
+render_cache.py.
 """
-import datetime as dt
-import figure as fig
+import filter_cache as fc
+import instrument
 import itertools as it
 import numpy as np
+import os
+import profile_table as pt
+import progress
+import render
+import render_cache as rc
 import sys
 
 
 _cache_capacities = ["64", "256", "512", "1K", "2K", "64K", "256K", "512K", "1M"]
 _MAGIC_MISS_DISTANCE = 4611686018427387904.0  #2^62
 
+
+def _capacity(capacity):
+    """Return a capacity in blocks given as a number or as a string with an
+    optional K or M suffix, such as "64K"."""
+    if isinstance(capacity, basestring):
+        units = {'K': 1024, 'M': 1024 ** 2}
+        unit = units.get(capacity[-1:].upper())
+        if unit is not None:
+            return float(capacity[:-1]) * unit
+    return float(capacity)
+
+
+def _cdf_rows(lengths, distances, frequencies, limits):
+    """Return the cdfs of the frequencies vs the sorted limits of profiles
+    concatenated one after the other, as a matrix with one row per profile:
+    element k of a row is the total frequency of the distances smaller than
+    limits[k]. Hit types are summed."""
+    if frequencies.ndim == 2:
+        frequencies = frequencies.sum(axis=1)
+    # a distance counts from the first limit above it on
+    first = np.searchsorted(limits, distances, side='right')
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    pdf = np.zeros((len(lengths), len(limits) + 1), np.int64)
+    np.add.at(pdf, (rows, first), frequencies)
+    return pdf.cumsum(axis=1)[:, :len(limits)]
+
+
+def _gain(freq_cdf, from_alloc, to_alloc):
+    """Return the gain obtained between two allocations on a cdf."""
+    value_for_from_alloc = value_for_to_alloc = 0
+    if from_alloc > 0:
+        value_for_from_alloc = freq_cdf[from_alloc - 1]
+    if to_alloc > 0:
+        value_for_to_alloc = freq_cdf[to_alloc - 1]
+    return value_for_to_alloc - value_for_from_alloc
+
+
 class _ThreadData(object):
     """ Holds per-thread data.
 
@@ -19,11 +69,25 @@ class _ThreadData(object):
     Members:
     miss_rate_all_intervals: dictionary, the keys are cache capacities, and
     the value is a list of miss-rates for all intervals for that capacity.
-    rd_profiles: dictionary, keys are intervals and value is a dictionary of
-    frequencies for different bins of reuse-distance ie. bins are keys and
+    rd_profiles: ProfileTable, keys are intervals and value is a dictionary
+    of frequencies for different bins of reuse-distance ie. bins are keys and
     frequencies are values.
+    freq_v_cap: RowTable, keys are intervals and value is the cdf of
+    frequencies vs capacities.
+    total_freq: ValueTable, keys are intervals and value is the total
+    frequency, misses included.
+    The tables store numpy arrays, see profile_table.py.
     """
-    pass
+    __slots__ = ('miss_rate_all_intervals', 'rd_profiles', 'freq_v_cap',
+                 'total_freq')
+    tables = (('rd_profiles', pt.ProfileTable), ('freq_v_cap', pt.RowTable),
+              ('total_freq', pt.ValueTable))
+
+    def __init__(self):
+        self.miss_rate_all_intervals = dict()
+        self.rd_profiles = pt.ProfileTable()
+        self.freq_v_cap = pt.RowTable()
+        self.total_freq = pt.ValueTable()
 
 
 class Benchmark(object):
@@ -44,11 +108,6 @@ class Benchmark(object):
         self.capacities.append(int(_MAGIC_MISS_DISTANCE))  # infinite capacity
         self.__thread_data = [_ThreadData() for 
             dummy in xrange(self.num_threads)]
-        for thread_data in self.__thread_data:
-            thread_data.miss_rate_all_intervals = dict()
-            thread_data.rd_profiles = dict()
-            thread_data.freq_v_cap = dict()
-            thread_data.total_freq = dict()
     
     def set_rd_profile(self, thread, profile_id, rd_profile, tot_freq):
         """Store the list of reuse-distance frequencies for an id for a
@@ -56,6 +115,15 @@ class Benchmark(object):
         """
         self.__thread_data[thread].rd_profiles[profile_id] = rd_profile
         self.__thread_data[thread].total_freq[profile_id] = tot_freq
+
+    def set_rd_arrays(self, thread, profile_id, distances, frequencies,
+                      tot_freq):
+        """Store the reuse-distance profile for an id for a thread from
+        arrays, as get_rd_arrays returns them. The distances are sorted.
+        """
+        self.__thread_data[thread].rd_profiles.set_arrays(profile_id,
+            distances, frequencies)
+        self.__thread_data[thread].total_freq[profile_id] = tot_freq
     
     def set_freq_cdf(self, thread, profile_id, freq_cdf):
         """Store the cdf for frequencies with capacities for an id for a
@@ -68,9 +136,101 @@ class Benchmark(object):
         thread.
         """
         return self.__thread_data[thread].freq_v_cap[profile_id]
-    
+
+    def get_rd_profile(self, thread, profile_id):
+        """Return the reuse-distance profile for an id for a thread.
+
+        The profile is a new dictionary of the '%.2f' formatted distances to
+        the frequencies as strings (lists of strings for hit types).
+        get_rd_arrays is cheaper.
+        """
+        return self.__thread_data[thread].rd_profiles[profile_id]
+
+    def get_total_freq(self, thread, profile_id):
+        """Return the total frequency for an id for a thread."""
+        return self.__thread_data[thread].total_freq[profile_id]
+
+    def get_profile_ids(self, thread=0):
+        """Return the sorted profile ids for a thread."""
+        return self.__thread_data[thread].rd_profiles.keys()
+
+    def get_cdf_ids(self, thread=0):
+        """Return the sorted profile ids with a cdf for a thread."""
+        return self.__thread_data[thread].freq_v_cap.keys()
+
+    def get_rd_arrays(self, thread, profile_id):
+        """Return the reuse-distance profile for an id for a thread as arrays.
+
+        Returns a sorted array of distances and an array of integer
+        frequencies (int32 while they fit). For profiles grouped by hit type
+        the frequencies have one column per hit type. The frequencies are
+        those stored, they should not be modified.
+        """
+        return self.__thread_data[thread].rd_profiles.arrays(profile_id)
+
+    def get_rd_concatenated(self, thread, profile_ids=None):
+        """Return the reuse-distance profiles for ids (by default all,
+        ascending) for a thread one after the other.
+
+        Returns the length of every profile, the distances and the
+        frequencies, as arrays.
+        """
+        return self.__thread_data[thread].rd_profiles.concatenated(
+            profile_ids)
+
+    def get_total_freqs(self, thread, profile_ids=None):
+        """Return the total frequencies for ids (by default all, ascending)
+        for a thread as an array."""
+        return self.__thread_data[thread].total_freq.array(profile_ids)
+
+    def set_freq_cdfs(self, thread, profile_ids, freq_cdfs):
+        """Store the cdfs for ids for a thread, one row of a matrix per
+        id."""
+        self.__thread_data[thread].freq_v_cap.set_rows(profile_ids, freq_cdfs)
+
+    def get_freq_cdfs(self, thread, profile_ids=None):
+        """Return the cdfs for ids (by default all, ascending) for a thread
+        as a matrix, one row per id."""
+        return self.__thread_data[thread].freq_v_cap.array(profile_ids)
+
+    def nbytes(self):
+        """Return the bytes taken by the arrays of the profiles and cdfs."""
+        return sum(data.rd_profiles.nbytes() + data.freq_v_cap.nbytes() +
+                   data.total_freq.nbytes() for data in self.__thread_data)
+
+    def compact(self):
+        """Release the memory kept for appending profiles, the readers do it
+        once they are done."""
+        for data in self.__thread_data:
+            data.rd_profiles.compact()
+            data.freq_v_cap.compact()
+            data.total_freq.compact()
+
+    def clear(self):
+        """Drop the profiles, total frequencies, cdfs and miss rates of all
+        threads."""
+        self.__thread_data = [_ThreadData() for
+            dummy in xrange(self.num_threads)]
+
+    def table_arrays(self):
+        """Return the arrays of the profiles, total frequencies and cdfs: per
+        thread, a dict of table name to the arrays of the table. See
+        shared.py."""
+        self.compact()
+        return [dict((name, getattr(data, name).to_arrays())
+                     for name, dummy in _ThreadData.tables)
+                for data in self.__thread_data]
+
+    def set_table_arrays(self, table_arrays):
+        """Replace the profiles, total frequencies and cdfs with the arrays
+        of table_arrays, without copying them."""
+        for data, arrays in zip(self.__thread_data, table_arrays):
+            for name, table in _ThreadData.tables:
+                setattr(data, name, table.from_arrays(arrays[name]))
+
+    @instrument.instrumented()
     def plot_rd_profiles(self, new_style=False, filter_distance=0.0,
-                         file_suffix=None):
+                         file_suffix=None, profile_ids=None, processes=None):
         """Plot reuse-distance profile for all ids for all threads.
         
         A separate file for each thread. Each subplot is for an interval.
@@ -83,131 +243,257 @@ class Benchmark(object):
         hit. Of course this does not take into account of the effect filtering
         has on the distance values of the references which pass through the
         filter, which can increase, decrease, or stay the same depending on
-        the sequence of references.
+        the sequence of references. Use read_trace_from_file to simulate the
+        filter on the trace instead, and plot with filter_distance = 0.
+        If profile_ids is supplied only those ids are plotted, such as the
+        representative intervals of a clustering.
+        The files are rendered in parallel by processes worker processes,
+        see render.py. Only the files of the threads whose data changed are
+        rendered again.
         """
-        for data in self.__thread_data:
-            plot_id = str(self.__thread_data.index(data))
-            if not(file_suffix):
-                suffix = dt.datetime.now().strftime("%y_%m_%d_%H:%M:%S")
-            else:
-                suffix = file_suffix + dt.datetime.now().strftime("%y_%m_%d_%H:%M:%S")
-            filename = self.name + "/" + self.name + "_t" + plot_id + "_rdp" + suffix
-            subplots = len(data.rd_profiles)
-            #if subplots > 6: subplots = 6
-            print "subplot: ", subplots
-            subplots_per_page = subplots if subplots < 2 else 2
-            figure = fig.Figure(filename,
-                                figformat='pdf',
-                                title="RD Profile for thread " + plot_id,
-                                total_subplots=subplots,
-                                subplots_per_page=subplots_per_page,
-                                font_size=3)
-            for profile_id in data.rd_profiles:
-                print "profile id: ", profile_id
-                # Sort the rd_profile on distance
-                # Distances in string, but sort on their values
-                sorted_bins =  data.rd_profiles[profile_id].keys()
-                sorted_bins.sort(key=lambda x:float(x))
-                bins_list = list()
-                freq_list = list()
-                x_index = 0
-                for dist in sorted_bins:
-                    if float(dist) < filter_distance:
-                        continue
-                    bins_list.append(x_index)
-                    x_index = x_index + 1
-                    freq_list.append(int(data.rd_profiles[profile_id][dist]))
-                bins = np.array(bins_list)
-                rd_freq = np.array(freq_list)
-                plot_data = [bins, rd_freq]
-                if (filter_distance > 0):
-                    dist_labels = [x for x in sorted_bins 
-                        if float(x) >= filter_distance]
-                else:
-                    dist_labels = sorted_bins
-                legend_labels = ['Profile Id ' + str(profile_id)]
-                sp = figure.add_plot(new_style, legend_labels, 'reuse distance',
-                                     'frequency', 
-                                     'Profile Id ' + str(profile_id), dist_labels,
-                                     *plot_data)    
-                if profile_id >= subplots:
-                    break
+        cache = rc.RenderCache(self.name)
+        targets = list()
+        for t in xrange(self.num_threads):
+            base = (self.name + "/" + self.name + "_t" + str(t) + "_rdp" +
+                    (file_suffix or ''))
+            key = self._plot_key('rdp', [t], new_style, filter_distance,
+                                 profile_ids)
+            if not cache.is_fresh(base, key):
+                targets.append((t, base, key))
+        jobs = [(self._plot_rd_profiles_thread,
+                 (t, cache.filename(base, key), new_style, filter_distance,
+                  profile_ids), {})
+            for t, base, key in targets]
+        render.run_jobs(jobs, processes)
+        for t, base, key in targets:
+            cache.record(base, key)
 
-            figure.save_and_close()
+    def _plot_rd_profiles_thread(self, t, filename, new_style,
+                                 filter_distance, profile_ids):
+        """Plot the file for one thread, see plot_rd_profiles."""
+        data = self.__thread_data[t]
+        plot_id = str(t)
+        to_plot = data.rd_profiles if profile_ids is None else profile_ids
+        subplots = len(to_plot)
+        #if subplots > 6: subplots = 6
+        progress.log.debug("subplots: %d", subplots)
+        subplots_per_page = subplots if subplots < 2 else 2
+        import figure as fig
+        figure = fig.Figure(filename,
+                            figformat='pdf',
+                            title="RD Profile for thread " + plot_id,
+                            total_subplots=subplots,
+                            subplots_per_page=subplots_per_page,
+                            font_size=3)
+        debug = progress.debug_enabled()
+        done = progress.Progress("rd profiles of thread " + plot_id,
+                                 subplots, 'subplots')
+        for profile_id in to_plot:
+            if debug: progress.log.debug("profile id: %d", profile_id)
+            done.update()
+            # The distances are sorted in the profile table
+            distances, rd_freq = data.rd_profiles.arrays(profile_id)
+            if (filter_distance > 0):
+                kept = distances >= filter_distance
+                distances, rd_freq = distances[kept], rd_freq[kept]
+            bins = np.arange(len(distances))
+            plot_data = [bins, rd_freq]
+            dist_labels = ['%.2f' % x for x in distances.tolist()]
+            legend_labels = ['Profile Id ' + str(profile_id)]
+            sp = figure.add_plot(new_style, legend_labels, 'reuse distance',
+                                 'frequency', 
+                                 'Profile Id ' + str(profile_id), dist_labels,
+                                 *plot_data)    
+            if profile_ids is None and profile_id >= subplots:
+                break
+
+        figure.save_and_close()
+        done.done()
     
+    def _plot_key(self, kind, threads, *params):
+        """Return the digest of everything a plot is drawn from: its kind,
+        its parameters, the render quality and the profiles and cdfs of the
+        threads. See render_cache.py."""
+        def parts():
+            yield kind, params, rc.get_default_quality()
+            yield self.num_sets, self.num_ways
+            for t in threads:
+                data = self.__thread_data[t]
+                yield t
+                profile_ids = data.rd_profiles.ids()
+                yield profile_ids
+                yield data.total_freq.array(profile_ids)
+                for array in data.rd_profiles.concatenated(profile_ids):
+                    yield array
+                yield data.freq_v_cap.ids()
+                yield data.freq_v_cap.array()
+        return rc.digest(parts())
+
+    def get_interval_matrix(self, thread, profile_ids=None):
+        """Return the reuse-distance profiles of a thread as one matrix.
+
+        Returns the profile ids, the sorted union of the distances over those
+        ids, and a matrix of frequencies with one row per profile id and one
+        column per distance. Hit type profiles are summed over the hit types.
+        """
+        if profile_ids is None:
+            profile_ids = self.get_profile_ids(thread)
+        rows = list()
+        distances = list()
+        frequencies = list()
+        for row, profile_id in enumerate(profile_ids):
+            dist, freq = self.get_rd_arrays(thread, profile_id)
+            if freq.ndim == 2:
+                freq = freq.sum(axis=1)
+            rows.append(np.repeat(row, len(dist)))
+            distances.append(dist)
+            frequencies.append(freq)
+        if not rows:
+            return list(profile_ids), np.zeros(0), np.zeros((0, 0), np.int64)
+        distances = np.concatenate(distances)
+        all_distances, columns = np.unique(distances, return_inverse=True)
+        matrix = np.zeros((len(profile_ids), len(all_distances)), np.int64)
+        np.add.at(matrix, (np.concatenate(rows), columns),
+                  np.concatenate(frequencies))
+        return list(profile_ids), all_distances, matrix
+
+    def get_aligned_profiles(self, profile_id, threads=None):
+        """Return the reuse-distance profiles of an id for threads (by
+        default all) aligned on the union of their distances.
+
+        Returns the sorted union of the distances and a matrix of
+        frequencies with one row per thread and one column per distance.
+        Hit type profiles are summed over the hit types.
+        """
+        if threads is None:
+            threads = xrange(self.num_threads)
+        profiles = list()
+        for t in threads:
+            dist, freq = self.get_rd_arrays(t, profile_id)
+            if freq.ndim == 2:
+                freq = freq.sum(axis=1)
+            profiles.append((dist, freq))
+        all_distances = reduce(np.union1d, [dist for dist, freq in profiles],
+                               np.zeros(0))
+        matrix = np.zeros((len(profiles), len(all_distances)), np.int64)
+        for row, (dist, freq) in zip(matrix, profiles):
+            row[np.searchsorted(all_distances, dist)] = freq
+        return all_distances, matrix
+
+    def get_aligned_miss_rates(self, profile_id, threads=None):
+        """Return the miss rates of an id for threads (by default all) vs
+        the union of their distances, see get_aligned_profiles.
+
+        Element k of the row of a thread is the fraction of its references,
+        misses included, with a reuse distance larger than distance k.
+        """
+        if threads is None:
+            threads = xrange(self.num_threads)
+        threads = list(threads)
+        all_distances, matrix = self.get_aligned_profiles(profile_id, threads)
+        totals = np.array([self.get_total_freq(t, profile_id)
+                           for t in threads], np.float64)
+        misses = totals[:, np.newaxis] - matrix.cumsum(axis=1)
+        # no references, no misses
+        return all_distances, misses / np.maximum(totals, 1)[:, np.newaxis]
+
+    @instrument.instrumented()
+    def plot_rd_heatmap(self, decimate=None, file_suffix=None, max_rows=2000):
+        """Plot reuse-distance profiles of all intervals as heatmaps.
+
+        One file for all threads, with one subplot per thread. Each subplot
+        is a single image: X-axis denotes the reuse-distance bins, Y-axis
+        denotes the intervals and the color (log scale) denotes the frequency
+        of accesses. Every decimate consecutive intervals are summed into one
+        row; by default enough to keep at most max_rows rows.
+        """
+        cache = rc.RenderCache(self.name)
+        base = self.name + "/" + self.name + "_rd_heatmap" + (file_suffix or '')
+        key = self._plot_key('rd_heatmap', xrange(self.num_threads), decimate,
+                             max_rows)
+        if cache.is_fresh(base, key):
+            return
+        import figure as fig
+        figure = fig.Figure(cache.filename(base, key),
+                            figformat='pdf',
+                            total_subplots=self.num_threads,
+                            subplots_per_page=self.num_threads,
+                            font_size=6)
+        for t in xrange(self.num_threads):
+            profile_ids, distances, matrix = self.get_interval_matrix(t)
+            step = decimate
+            if step is None:
+                step = max(1, int(np.ceil(len(profile_ids) / float(max_rows))))
+            starts = np.arange(0, len(profile_ids), step)
+            if len(starts):
+                matrix = np.add.reduceat(matrix, starts, axis=0)
+            xticks = np.unique(np.linspace(0, len(distances) - 1,
+                min(16, len(distances))).astype(int))
+            yticks = np.unique(np.linspace(0, len(starts) - 1,
+                min(8, len(starts))).astype(int))
+            figure.add_heatmap(matrix,
+                               'Reuse Distance',
+                               'Interval',
+                               'Thread ' + str(t),
+                               list(xticks),
+                               ['%d' % distances[x] for x in xticks],
+                               list(yticks),
+                               [str(profile_ids[starts[y]]) for y in yticks],
+                               'References')
+        figure.save_and_close()
+        cache.record(base, key)
+
+    @instrument.instrumented()
     def plot_rd_profiles_1_file(self, new_style=False, file_suffix=None):
         """Plot reuse-distance profile for all ids for all threads.
         
         One file for all threads. Each subplot is for an interval. Each subplot
         contains the lines for all threads together.
         X-axis denotes the number of reuse-distance bins and Y-axis denotes the
-        frequency of accesses.
+        frequency of accesses. The bins are the union of the distances of the
+        threads, see get_aligned_miss_rates.
         """
         subplots = len(self.__thread_data[0].rd_profiles)
         #if subplots > 6: subplots = 6
-        print "subplot: ", subplots
+        progress.log.debug("subplots: %d", subplots)
         subplots_per_page = subplots if subplots < 2 else 2
-        if not(file_suffix):
-            suffix = dt.datetime.now().strftime("%y_%m_%d_%H:%M:%S")
-        else:
-            suffix = file_suffix + dt.datetime.now().strftime("%y_%m_%d_%H:%M:%S")
-        filename = self.name + "/" + self.name + "_all_rdp" + suffix
-        figure = fig.Figure(filename,
+        cache = rc.RenderCache(self.name)
+        base = self.name + "/" + self.name + "_all_rdp" + (file_suffix or '')
+        key = self._plot_key('all_rdp', xrange(self.num_threads), new_style)
+        if cache.is_fresh(base, key):
+            return
+        import figure as fig
+        figure = fig.Figure(cache.filename(base, key),
                             figformat='pdf',
                             #title="RD Profile for all threads ",
                             total_subplots=subplots,
                             subplots_per_page=subplots_per_page,
                             font_size=6)
+        debug = progress.debug_enabled()
+        done = progress.Progress("rd profiles of all threads", subplots,
+                                 'subplots')
         for profile_id in self.__thread_data[0].rd_profiles:
-            print "profile id: ", profile_id
+            if debug: progress.log.debug("profile id: %d", profile_id)
+            done.update()
+            all_distances, miss_rates = self.get_aligned_miss_rates(profile_id)
+            bins = np.arange(len(all_distances))
             plot_data = list()
             legend_labels = list()
-            all_keys = set()
-            for data in self.__thread_data:
-                all_keys.update(data.rd_profiles[profile_id].keys())
-            all_keys_list = list(all_keys)    
-            all_keys_list.sort(key=lambda x:float(x))
-            for data in self.__thread_data:
-                # Sort the rd_profile on distance
-                # Distances in string, but sort on their values
-                #sorted_bins =  data.rd_profiles[profile_id].keys()
-                #sorted_bins.sort(key=lambda x:float(x))
-                bins_list = list()
-                freq_list = list()
-                x_index = 0
-                cum_freq = 0.0
-                #cum_freq = 0
-                tot_freq = data.total_freq[profile_id]
-                for dist in all_keys_list:
-                    bins_list.append(x_index)
-                    x_index = x_index + 1
-                    if dist in data.rd_profiles[profile_id]:
-                        cum_freq += int(data.rd_profiles[profile_id][dist])
-                        #freq_list.append(int(data.rd_profiles[profile_id][dist]))
-                    else:
-                       pass
-                        #freq_list.append(0)
-                    freq_list.append((tot_freq - cum_freq) / tot_freq)
-                    #freq_list.append((tot_freq - cum_freq))
-                bins = np.array(bins_list)
-                rd_freq = np.array(freq_list)
+            for t, rd_freq in enumerate(miss_rates):
                 plot_data.append(bins)
                 plot_data.append(rd_freq)
-                plot_id = str(self.__thread_data.index(data))
-                legend_labels.append("Thread " + plot_id)
+                legend_labels.append("Thread " + str(t))
             dist_labels = list()
             idx = 0
-            for l in all_keys_list:
-                val = float(l)
+            for val in all_distances.tolist():
                 if val == pow(2.00,idx):
                     if idx == 1:
                         dist_labels.append(' ')
                     else:
-                        dist_labels.append(l)
+                        dist_labels.append('%.2f' % val)
                     idx += 1
                 else:
                     dist_labels.append(' ')
-            #dist_labels = all_keys_list    
             #legend_labels = ['Profile Id ' + str(profile_id)]
             sp = figure.add_plot(new_style, 
                                  legend_labels, 
@@ -216,12 +502,15 @@ class Benchmark(object):
                                  ' ',
                                  #'Profile Id ' + str(profile_id), 
                                  dist_labels,
-                                 *plot_data)    
+                                 *plot_data, ylimits=[0, 1])
             if profile_id >= subplots:
                 break
         figure.save_and_close()
+        done.done()
+        cache.record(base, key)
 
-    def plot_rd_profiles_by_hit_type(self, file_suffix=None):
+    @instrument.instrumented()
+    def plot_rd_profiles_by_hit_type(self, file_suffix=None, processes=None):
         """Plot reuse-distance profile for all ids for all threads.
         
         A separate file for each thread. Each subplot is for an interval.
@@ -229,72 +518,82 @@ class Benchmark(object):
         frequency of accesses. The frequency of accesses are further broken
         into accesses due to misses, local and foreign private hits, and local
         and foreign shared hits.
+        The files are rendered in parallel by processes worker processes,
+        see render.py. Only the files of the threads whose data changed are
+        rendered again.
         """
-        for data in self.__thread_data:
-            plot_id = str(self.__thread_data.index(data))
-            if not(file_suffix):
-                suffix = dt.datetime.now().strftime("%y_%m_%d_%H:%M:%S")
-            else:
-                suffix = file_suffix + dt.datetime.now().strftime("%y_%m_%d_%H:%M:%S")
-            filename = self.name + "/" + self.name + "_t" + plot_id + "_rdp_by_hits" + suffix
-            subplots = len(data.rd_profiles)
-            #if subplots > 2: subplots = 2
-            print "subplot: ", subplots
-            #subplots_per_page = subplots if subplots < 2 else 2
-            subplots_per_page = 1
-            figure = fig.Figure(filename,
-                                figformat='pdf',
-                                #title="RD Profile by Hit Status for thread " + plot_id,
-                                total_subplots=subplots,
-                                subplots_per_page=subplots_per_page,
-                                font_size=6)
-            for profile_id in data.rd_profiles:
-                print "profile id: ", profile_id
-                # Sort the rd_profile on distance
-                # Distances in string, but sort on their values
-                sorted_bins =  data.rd_profiles[profile_id].keys()
-                sorted_bins.sort(key=lambda x:float(x))
-                bins_list = list()
-                freq_list_m = list()
-                freq_list_p_l_h = list()
-                freq_list_p_f_h = list()
-                freq_list_s_l_h = list()
-                freq_list_s_f_h = list()
-                x_index = 0
-                for dist in sorted_bins:
-                    bins_list.append(x_index)
-                    x_index += 1
-                    freq_list_m.append(int(data.rd_profiles[profile_id][dist][0]))
-                    freq_list_p_l_h.append(int(data.rd_profiles[profile_id][dist][1]))
-                    freq_list_p_f_h.append(int(data.rd_profiles[profile_id][dist][2]))
-                    freq_list_s_l_h.append(int(data.rd_profiles[profile_id][dist][3]))
-                    freq_list_s_f_h.append(int(data.rd_profiles[profile_id][dist][4]))
-                bins = np.array(bins_list)
-                rd_freq_m = np.array(freq_list_m)
-                rd_freq_p_l_h = np.array(freq_list_p_l_h)
-                rd_freq_p_f_h = np.array(freq_list_p_f_h)
-                rd_freq_s_l_h = np.array(freq_list_s_l_h)
-                rd_freq_s_f_h = np.array(freq_list_s_f_h)
-                plot_data = [bins, rd_freq_m, rd_freq_p_l_h, rd_freq_p_f_h,
-                    rd_freq_s_l_h, rd_freq_s_f_h]
-                dist_labels = sorted_bins
-                legend_labels = ['Miss', 'Private Self-Hit',
-                                 'Private Foreign Hit', 'Shared Self-Hit',
-                                 'Shared Foreign Hit']
-                sp = figure.add_stackedbar(legend_labels,
-                                           'Reuse Distance',
-                                           'References', 
-                                           #'Profile Id ' + str(profile_id),
-                                           '',
-                                           dist_labels,
-                                           *plot_data)    
-                if profile_id >= subplots:
-                    break
+        cache = rc.RenderCache(self.name)
+        targets = list()
+        for t in xrange(self.num_threads):
+            base = (self.name + "/" + self.name + "_t" + str(t) +
+                    "_rdp_by_hits" + (file_suffix or ''))
+            key = self._plot_key('rdp_by_hits', [t])
+            if not cache.is_fresh(base, key):
+                targets.append((t, base, key))
+        jobs = [(self._plot_rd_profiles_by_hit_type_thread,
+                 (t, cache.filename(base, key)), {})
+            for t, base, key in targets]
+        render.run_jobs(jobs, processes)
+        for t, base, key in targets:
+            cache.record(base, key)
 
-            figure.save_and_close()
+    def _plot_rd_profiles_by_hit_type_thread(self, t, filename):
+        """Plot the file for one thread, see plot_rd_profiles_by_hit_type."""
+        data = self.__thread_data[t]
+        plot_id = str(t)
+        subplots = len(data.rd_profiles)
+        #if subplots > 2: subplots = 2
+        progress.log.debug("subplots: %d", subplots)
+        #subplots_per_page = subplots if subplots < 2 else 2
+        subplots_per_page = 1
+        import figure as fig
+        figure = fig.Figure(filename,
+                            figformat='pdf',
+                            #title="RD Profile by Hit Status for thread " + plot_id,
+                            total_subplots=subplots,
+                            subplots_per_page=subplots_per_page,
+                            font_size=6)
+        debug = progress.debug_enabled()
+        done = progress.Progress("rd profiles by hit type of thread " +
+                                 plot_id, subplots, 'subplots')
+        for profile_id in data.rd_profiles:
+            if debug: progress.log.debug("profile id: %d", profile_id)
+            done.update()
+            # The distances are sorted in the profile table, with one
+            # column of frequencies per hit type
+            distances, frequencies = data.rd_profiles.arrays(profile_id)
+            bins = np.arange(len(distances))
+            plot_data = [bins] + [frequencies[:, i] for i in xrange(5)]
+            dist_labels = ['%.2f' % x for x in distances.tolist()]
+            legend_labels = ['Miss', 'Private Self-Hit',
+                             'Private Foreign Hit', 'Shared Self-Hit',
+                             'Shared Foreign Hit']
+            sp = figure.add_stackedbar(legend_labels,
+                                       'Reuse Distance',
+                                       'References', 
+                                       #'Profile Id ' + str(profile_id),
+                                       '',
+                                       dist_labels,
+                                       *plot_data)    
+            if profile_id >= subplots:
+                break
+
+        figure.save_and_close()
+        done.done()
     
-    def read_rddata_from_file(self, bmfile, num_threads, offset=0, quantum_size=1):
-        """Read reuse distance profile data from file."""
+    @instrument.instrumented()
+    def read_rddata_from_file(self, bmfile, num_threads, offset=0,
+                              quantum_size=1, chunk_intervals=None,
+                              on_chunk=None):
+        """Read reuse distance profile data from file.
+
+        If on_chunk is given, it is called with the benchmark every time
+        chunk_intervals profile ids have been read for every thread, and the
+        profiles are cleared after it: the file is read in bounded memory.
+        The profiles of the last chunk are left to the caller. See
+        chunked.py. To group the intervals by other offsets and quantum
+        sizes without reading the file again, see interval_index.py.
+        """
         IsInterval = lambda line: line.startswith("Interval")
         IsThread = lambda line: line.startswith("thread")
         IsHistogram = lambda line: line.startswith("histogram")
@@ -308,10 +607,25 @@ class Benchmark(object):
         stack_type = None
         rd_profiles = [dict() for dummy in xrange(num_threads)]
         total_freq = [0 for dummy in xrange(num_threads)]
+        num_lines = num_tokens = num_bytes = 0
+        debug = progress.debug_enabled()
+        done = progress.Progress("read " + bmfile, os.path.getsize(bmfile),
+                                 'bytes')
         with open(bmfile, 'r') as src:
             for line in src:
+                num_lines += 1
+                num_bytes += len(line)
                 if IsInterval(line):
                     current_interval = current_interval + 1
+                    done.set(num_bytes, intervals=current_interval,
+                             tokens=num_tokens)
+                    if on_chunk is not None and min(
+                            len(data.rd_profiles)
+                            for data in self.__thread_data) >= \
+                            chunk_intervals:
+                        self.compact()
+                        on_chunk(self)
+                        self.clear()
                 
                 elif IsThread(line):
                     current_thrd = int(line.split(':', 1)[1])
@@ -331,31 +645,29 @@ class Benchmark(object):
                         continue
                     histo_line = line[11:-2]
                     token_list = histo_line.split()
+                    num_tokens += len(token_list)
+                    # distances as floats and frequencies as ints, the
+                    # profile table rounds the distances as '%.2f'
+                    rd_profile = rd_profiles[current_thrd]
                     for token in token_list:
-                        token = token.rstrip(',')
-                        subtokens = token.split(':')
-                        distance = '%.2f' %float(subtokens[0])
+                        subtokens = token.rstrip(',').split(':')
+                        distance = float(subtokens[0])
                         if len(subtokens) == 2:
-                            frequency = subtokens[1]
-                            total_freq[current_thrd] += int(frequency)
+                            frequency = int(subtokens[1])
+                            total_freq[current_thrd] += frequency
                         else:
-                            frequency = [subtokens[i] 
-                                for i in xrange(1, len(subtokens))]
-                            for f in frequency:
-                                total_freq[current_thrd] += int(f)
-                        if float(distance) < _MAGIC_MISS_DISTANCE:
-                            if distance in rd_profiles[current_thrd]:
-                                old_freq = rd_profiles[current_thrd][distance]
+                            frequency = map(int, subtokens[1:])
+                            total_freq[current_thrd] += sum(frequency)
+                        if distance < _MAGIC_MISS_DISTANCE:
+                            if distance in rd_profile:
+                                old_freq = rd_profile[distance]
                                 if isinstance(old_freq, list):
-                                    rd_profiles[current_thrd][distance] = [str(int(x) + int(y))
-                                        for x,y in zip(old_freq, frequency)]
+                                    rd_profile[distance] = [x + y for x, y in
+                                        zip(old_freq, frequency)]
                                 else:
-                                    rd_profiles[current_thrd][distance] = str(int(frequency) +
-                                        int(old_freq))
+                                    rd_profile[distance] = old_freq + frequency
                             else:
-                                rd_profiles[current_thrd][distance] = frequency
-                            #sum_f += int(frequency)
-                    #print "freq sum for thread", current_thrd, sum_f
+                                rd_profile[distance] = frequency
                     if current_interval < offset: continue
                     if quantum_size == 1:
                         to_save = 0
@@ -363,7 +675,9 @@ class Benchmark(object):
                         to_save = (current_interval - offset) % quantum_size
                     if to_save == 0:
                         profile_id = ((current_interval - offset) / quantum_size) + profile_id_offset
-                        print 'to save', current_interval, profile_id
+                        if debug: progress.log.debug("to save %d %d",
+                                                     current_interval,
+                                                     profile_id)
                         self.set_rd_profile(current_thrd, profile_id,
                                         rd_profiles[current_thrd], total_freq[current_thrd])
                         rd_profiles[current_thrd] = dict()
@@ -374,10 +688,63 @@ class Benchmark(object):
             for i in xrange(num_threads):
                 if rd_profiles[i]:
                     profile_id = ((current_interval - offset) / quantum_size) + profile_id_offset + 1
-                    print 'to save', current_interval, profile_id
+                    progress.log.debug("to save %d %d", current_interval,
+                                       profile_id)
                     self.set_rd_profile(i, profile_id,
                                     rd_profiles[i], total_freq[i])
-    
+        self.compact()
+        done.set(num_bytes, intervals=current_interval, tokens=num_tokens)
+        done.done()
+        instrument.count('lines', num_lines)
+        instrument.count('tokens', num_tokens)
+        instrument.count('intervals', current_interval)
+
+    @instrument.instrumented()
+    def read_trace_from_file(self, tracefile, num_threads, filter_capacity,
+                             filter_ways=0, offset=0, quantum_size=1):
+        """Read reuse distance profile data from an address trace, after
+        filtering it through a cache.
+
+        The trace is run through a modeled LRU filter cache per thread of
+        filter_capacity blocks and filter_ways ways (0 = fully associative),
+        and reuse distances are recomputed for the references which miss in
+        the filter. The profiles are grouped into profile ids the same way as
+        read_rddata_from_file. Only private stacks can be read from a trace,
+        a Benchmark with the shared stack type raises ValueError.
+        """
+        profile_id_offset = 0 if offset == 0 else 1;
+        current_interval = profile_id = 0
+        rd_profiles = [dict() for dummy in xrange(num_threads)]
+        total_freq = [0 for dummy in xrange(num_threads)]
+        for current_interval, current_thrd, rd_profile, tot_freq in \
+                fc.filtered_histograms(tracefile, num_threads, filter_capacity,
+                                       filter_ways, self.stack_type):
+            # distances as floats and frequencies as ints, as
+            # read_rddata_from_file
+            profile = rd_profiles[current_thrd]
+            for distance, frequency in rd_profile.iteritems():
+                profile[distance] = profile.get(distance, 0) + frequency
+            total_freq[current_thrd] += tot_freq
+            if current_interval < offset: continue
+            if quantum_size == 1:
+                to_save = 0
+            else:
+                to_save = (current_interval - offset) % quantum_size
+            if to_save == 0:
+                profile_id = ((current_interval - offset) / quantum_size) + profile_id_offset
+                self.set_rd_profile(current_thrd, profile_id,
+                                rd_profiles[current_thrd], total_freq[current_thrd])
+                rd_profiles[current_thrd] = dict()
+                total_freq[current_thrd] = 0
+        for i in xrange(num_threads):
+            if rd_profiles[i]:
+                profile_id = ((current_interval - offset) / quantum_size) + profile_id_offset + 1
+                self.set_rd_profile(i, profile_id,
+                                rd_profiles[i], total_freq[i])
+        self.compact()
+        instrument.count('intervals', current_interval)
+
+    @instrument.instrumented()
     def read_rddata_from_file_2phase(self, bmfile, num_threads, offset=0, quantum_size=1, start_thread=0):
         """Read reuse distance profile data from file."""
         IsInterval = lambda line: line.startswith("Interval")
@@ -398,7 +765,7 @@ class Benchmark(object):
             if (i > 0) and (i % quantum_size == 0):
                 p_thread = (p_thread + 1) % num_threads
             preferred_threads.append(p_thread)
-        print 'preferred threads', preferred_threads
+        progress.log.debug("preferred threads %s", preferred_threads)
         rd_profiles_p = [dict() for dummy in xrange(num_threads)]
         rd_profiles_u = [dict() for dummy in xrange(num_threads)]
         with open(bmfile, 'r') as src:
@@ -476,42 +843,29 @@ class Benchmark(object):
                 self.set_rd_profile(i, profile_id, rd_profiles_p[i], 0)
                 profile_id = 2 
                 self.set_rd_profile(i, profile_id, rd_profiles_u[i], 0)
+        self.compact()
 
+    @instrument.instrumented()
     def build_freq_vs_ways_profile(self):
         """For each thread & interval build cdf of freq vs number of ways."""
-        for t, tdata in enumerate(self.__thread_data):
-            for profile_id, rd_profile in tdata.rd_profiles.iteritems():
-                freq_cdf = [0 for dummy in xrange(len(self.ways))]
-                running_total = running_idx = 0
-                sorted_keys = sorted(rd_profile.iterkeys(), key=lambda x: float(x))
-                for dist in sorted_keys:
-                    freq = rd_profile[dist]
-                    while (float(dist) >= self.ways[running_idx]):
-                        freq_cdf[running_idx] = running_total
-                        running_idx += 1
-                    running_total += int(freq)
-                while running_idx < len(self.ways):
-                    freq_cdf[running_idx] = running_total
-                    running_idx += 1
-                self.set_freq_cdf(t, profile_id, freq_cdf)
+        self._build_cdfs(self.ways)
     
+    @instrument.instrumented()
     def build_freq_vs_capacity_profile(self):
         """For each thread & interval build cdf of freq vs capacity."""
-        for t, tdata in enumerate(self.__thread_data):
-            for profile_id, rd_profile in tdata.rd_profiles.iteritems():
-                freq_cdf = [0 for dummy in xrange(len(self.capacities))]
-                running_total = running_idx = 0
-                sorted_keys = sorted(rd_profile.iterkeys(), key=lambda x: float(x))
-                for dist in sorted_keys:
-                    freq = rd_profile[dist]
-                    while (float(dist) >= self.capacities[running_idx]):
-                        freq_cdf[running_idx] = running_total
-                        running_idx += 1
-                    running_total += int(freq)
-                while running_idx < len(self.capacities):
-                    freq_cdf[running_idx] = running_total
-                    running_idx += 1
-                self.set_freq_cdf(t, profile_id, freq_cdf)
+        self._build_cdfs(self.capacities)
+
+    def _build_cdfs(self, limits):
+        """For each thread & interval build the cdf of the frequencies vs the
+        limits: element k of a cdf is the total frequency of the distances
+        smaller than limits[k]. All the intervals of a thread are done at
+        once on the concatenated profiles, hit types are summed."""
+        limits = np.array(limits, dtype=np.float64)
+        for tdata in self.__thread_data:
+            profile_ids = tdata.rd_profiles.ids()
+            tdata.freq_v_cap.set_rows(profile_ids, _cdf_rows(
+                *tdata.rd_profiles.concatenated(profile_ids), limits=limits))
+            instrument.count('cdfs', len(profile_ids))
 
     def all_possible_partitions(self):
         """Create a list of all possible partitions so that each partition
@@ -547,160 +901,306 @@ class Benchmark(object):
             #partitions.append(new_p)
         return partitions, partition_labels
 
-    def plot_partition_v_misses(self, new_style=False, file_suffix=None):
+    @instrument.instrumented()
+    def plot_partition_v_misses(self, new_style=False, file_suffix=None,
+                                out=sys.stdout):
         """For each interval for each thread as preferred thread, plot the
-        misses for all possible partitions.
+        misses for all possible partitions. The best partitions are written
+        to out by write_best_partition.
         """
         partitions, partition_labels = self.all_possible_partitions()
         subplots = num_profiles = len(self.__thread_data[0].freq_v_cap)
         #if subplots > 6: subplots = 6
-        print "subplot: ", subplots
+        progress.log.debug("subplots: %d", subplots)
         subplots_per_page = subplots if subplots < 2 else 2
-        if not(file_suffix):
-            suffix = dt.datetime.now().strftime("%y_%m_%d_%H:%M:%S")
-        else:
-            suffix = file_suffix + '_' + dt.datetime.now().strftime("%y_%m_%d_%H:%M:%S")
-        filename = self.name + "/" + self.name + suffix
-        figure = fig.Figure(filename,
-                            figformat='pdf',
-                            #title="RD Profile for all threads ",
-                            total_subplots=subplots,
-                            subplots_per_page=subplots_per_page,
-                            font_size=6)
+        cache = rc.RenderCache(self.name)
+        base = self.name + "/" + self.name + (file_suffix or '')
+        key = self._plot_key('partition_v_misses', xrange(self.num_threads),
+                             new_style, partitions)
+        figure = None
+        if not cache.is_fresh(base, key):
+            import figure as fig
+            figure = fig.Figure(cache.filename(base, key),
+                                figformat='pdf',
+                                #title="RD Profile for all threads ",
+                                total_subplots=subplots,
+                                subplots_per_page=subplots_per_page,
+                                font_size=6)
         best_allocations = list()
-        for profile_id in xrange(1, num_profiles + 1):
-            print "profile id: ", profile_id
+        profile_ids = range(1, num_profiles + 1)
+        misses = self.partition_misses(partitions, profile_ids)
+        x_array = np.arange(len(partitions))
+        debug = progress.debug_enabled()
+        done = progress.Progress("partition vs misses", num_profiles)
+        for profile_id in profile_ids:
+            if debug: progress.log.debug("profile id: %d", profile_id)
+            done.update()
             plot_data = list()
             legend_labels = list()
-            all_keys = set()
             best_allocations_per_profile = list()
             for preferred_t in xrange(self.num_threads):
-                sys.stdout.write("Preferred thread: %d\n" % preferred_t)
-                min_misses = 4611686018427387904
-                best_alloc = []
-                x_list = list()
-                y_list = list()
-                x_index = 0
-                for alloc in partitions:
-                    x_list.append(x_index)
-                    x_index += 1
-                    total_misses = 0
-                    index = 0
-                    for x in alloc:
-                        current_t = (preferred_t + index) % self.num_threads
-                        total_misses += self.get_misses(current_t, profile_id, x)
-                        index += 1
-                    y_list.append(total_misses)    
-                    if total_misses < min_misses:
-                        min_misses = total_misses
-                        best_alloc = alloc
-                x_array = np.array(x_list)
-                y_array = np.array(y_list)
+                y_array = misses[profile_id - 1, preferred_t]
+                best_alloc = partitions[y_array.argmin()]
                 plot_data.append(x_array)
                 plot_data.append(y_array)
                 plot_id = str(preferred_t)
                 legend_labels.append("Thread " + plot_id)
                 best_allocations_per_profile.append(best_alloc)
-                sys.stdout.write("Best Alloc for Interval %d: %s\n" % 
-                    (profile_id, str(best_alloc)))
-                print 'misses: ', y_array
-            sp = figure.add_plot(new_style,
-                                 legend_labels, 
-                                 'Allocations',
-                                 'Misses',
-                                 ' ',
-                                 #'Profile Id ' + str(profile_id), 
-                                 partition_labels,
-                                 *plot_data)    
+                if debug: progress.log.debug("misses: %s", y_array)
+            if figure is not None:
+                sp = figure.add_plot(new_style,
+                                     legend_labels, 
+                                     'Allocations',
+                                     'Misses',
+                                     ' ',
+                                     #'Profile Id ' + str(profile_id), 
+                                     partition_labels,
+                                     *plot_data)    
+            best_allocations.append(best_allocations_per_profile)
             if profile_id >= subplots:
                 break
-            best_allocations.append(best_allocations_per_profile)
-        figure.save_and_close()
+        if figure is not None:
+            figure.save_and_close()
+            cache.record(base, key)
+        done.done()
+        # the best partitions are a result, written even when the plot is
+        # fresh
+        by_thread = [[per_profile[t] for per_profile in best_allocations]
+                     for t in xrange(self.num_threads)]
+        self.write_best_partition(by_thread, out=out)
         return best_allocations
     
+    @instrument.instrumented()
+    def partition_misses(self, partitions, profile_ids=None):
+        """Return the misses of all partitions for all intervals.
+
+        A partition gives its first number of ways to the preferred thread
+        and the following ones to the next threads, round robin. Returns an
+        array indexed by interval (in the order of profile_ids), preferred
+        thread and partition. See get_misses.
+        """
+        cdfs = self.cdf_tensor(profile_ids)
+        # misses[t, profile, ways], with 0 ways missing every reference
+        misses = cdfs[:, :, -1:] - np.concatenate(
+            (np.zeros_like(cdfs[:, :, :1]), cdfs), axis=2)
+        partitions = np.array(partitions, dtype=np.int64)
+        result = np.zeros((len(profile_ids), self.num_threads,
+                           len(partitions)), dtype=np.int64)
+        for preferred_t in xrange(self.num_threads):
+            for index in xrange(partitions.shape[1]):
+                current_t = (preferred_t + index) % self.num_threads
+                result[:, preferred_t] += misses[current_t][:,
+                    partitions[:, index]]
+        return result
+
     def get_misses(self, thread, profile_id, ways):
         "Return the hits for a particular way"""
-        ret_val = self.__thread_data[thread].freq_v_cap[profile_id][len(self.ways) - 1]
+        freq_v_cap = self.__thread_data[thread].freq_v_cap
+        ret_val = freq_v_cap.value(profile_id, len(self.ways) - 1)
         if ways > 0:
-            ret_val = ret_val - self.__thread_data[thread].freq_v_cap[
-                profile_id][ways - 1]
+            ret_val = ret_val - freq_v_cap.value(profile_id, ways - 1)
         return ret_val
      
-    def find_best_partition(self,shared_profile=None):
+    @instrument.instrumented()
+    def find_best_partition(self, shared_profile=None, profile_ids=None,
+                            phase_boundaries=None, memo=None):
         """For each interval for each thread as preferred thread, find the
         best possible partition. If a shared profile is supplied, use that
-        to find the best partition for the hybrid case."""
-        default_alloc = self.num_ways / self.num_threads
-        max_alloc = self.num_ways - (self.num_threads - 1)
-        num_profiles = len(self.__thread_data[0].freq_v_cap)
+        to find the best partition for the hybrid case. If profile_ids is
+        supplied, only those intervals are solved. If phase_boundaries (the
+        profile ids starting a phase, see phase.py) is supplied, the partition
+        is only recomputed at the boundaries and reused inside a phase. If a
+        memo (see partition_memo.py) is supplied, the partition of an
+        interval similar to an already solved one is reused."""
+        if profile_ids is None:
+            num_profiles = len(self.__thread_data[0].freq_v_cap)
+            profile_ids = xrange(1, num_profiles + 1)
+        if phase_boundaries is not None:
+            phase_boundaries = set(phase_boundaries)
         best_allocations = list()
+        debug = progress.debug_enabled()
+        done = progress.Progress("best partition",
+            self.num_threads * len(profile_ids)
+            if hasattr(profile_ids, '__len__') else None)
         for preferred_t in xrange(self.num_threads):
-            sys.stdout.write("Preferred thread: %d\n" % preferred_t)
+            if debug: progress.log.debug("Preferred thread: %d", preferred_t)
             best_allocations_per_thread = list()
-            for profile_id in xrange(num_profiles):
-                max_gain = 0
-                best_alloc = default_alloc
-                preferred_alloc = default_alloc + (self.num_threads - 1)
-                other_alloc = default_alloc - 1
-                while (preferred_alloc <= max_alloc):
-                    pos_gain = self.gain(preferred_t, profile_id + 1, 
-                                         default_alloc, preferred_alloc)
-                    neg_gain = sum(self.gain(t, profile_id + 1,
-                                   default_alloc, other_alloc)
-                        for t in xrange(self.num_threads) if t != preferred_t)
-                    ave_neg_gain = float(neg_gain) / (self.num_threads - 1)
-                    #print "ave ng:", ave_neg_gain
-                    gain = pos_gain + ave_neg_gain
-                    if gain > max_gain:
-                        max_gain = gain
-                        best_alloc = preferred_alloc
-                    preferred_alloc += (self.num_threads - 1)
-                    other_alloc -= 1
-                # check for the final best_allocation cosidering shared RD
-                new_best_alloc = best_alloc
-                #print "private best alloc: ", new_best_alloc
-                if shared_profile != None:
-                    max_gain = 0
-                    preferred_alloc = best_alloc + (self.num_threads - 1)
-                    other_alloc = ((self.num_ways - best_alloc) /
-                        (self.num_threads - 1))
-                    print "other alloc: ", other_alloc
-                    new_other_alloc = other_alloc - 1
-                    while (preferred_alloc <= max_alloc):
-                        shared_gain= sum(shared_profile.gain(t, profile_id + 1,
-                                         0, preferred_alloc - best_alloc)
-                            for t in xrange(self.num_threads))
-                        print "shared_gain ", shared_gain
-                        pos_gain = shared_gain
-                        neg_gain = sum(self.gain(t, profile_id + 1,
-                                       other_alloc, new_other_alloc)
-                            for t in xrange(self.num_threads) if t != preferred_t)
-                        ave_neg_gain = float(neg_gain) / (self.num_threads - 1)
-                        print "ave ng:", ave_neg_gain
-                        gain = pos_gain + ave_neg_gain
-                        print "gain:", gain
-                        if gain > max_gain:
-                            max_gain = gain
-                            new_best_alloc = preferred_alloc
-                        preferred_alloc += (self.num_threads - 1)
-                        new_other_alloc -= 1
+            for profile_id in profile_ids:
+                if (phase_boundaries is not None and
+                        profile_id not in phase_boundaries and
+                        best_allocations_per_thread):
+                    new_best_alloc = best_allocations_per_thread[-1]
+                elif memo is not None:
+                    new_best_alloc = self.memoized_alloc_for_profile(memo,
+                        preferred_t, profile_id, shared_profile)
+                else:
+                    new_best_alloc = self.best_alloc_for_profile(preferred_t,
+                        profile_id, shared_profile)
                 best_allocations_per_thread.append(new_best_alloc)
-                sys.stdout.write("Best Alloc for Interval %d: %d\n" % 
-                    (profile_id + 1, new_best_alloc))
+                if debug: progress.log.debug("Best Alloc for Interval %d: %d",
+                                             profile_id, new_best_alloc)
+                done.update()
             best_allocations.append(best_allocations_per_thread)
+        done.done()
+        instrument.count('partitions', sum(len(allocs)
+                                           for allocs in best_allocations))
         return best_allocations
 
+    def write_best_partition(self, best_allocations, profile_ids=None,
+                             out=sys.stdout):
+        """Write the result of find_best_partition as lines
+        "Preferred thread: t" and "Best Alloc for Interval i: a", in one
+        write. profile_ids are those passed to find_best_partition. An
+        allocation may also be a partition of all threads, as found by
+        plot_partition_v_misses."""
+        if profile_ids is None and best_allocations:
+            profile_ids = range(1, len(best_allocations[0]) + 1)
+        lines = list()
+        for preferred_t, allocations in enumerate(best_allocations):
+            lines.append("Preferred thread: %d\n" % preferred_t)
+            lines.extend("Best Alloc for Interval %d: %s\n" % pair
+                         for pair in zip(profile_ids, allocations))
+        out.write(''.join(lines))
+
+    def best_alloc_for_profile(self, preferred_t, profile_id,
+                               shared_profile=None):
+        """Find the best allocation of the preferred thread for one interval.
+        See find_best_partition."""
+        default_alloc = self.num_ways / self.num_threads
+        max_alloc = self.num_ways - (self.num_threads - 1)
+        max_gain = 0
+        best_alloc = default_alloc
+        preferred_alloc = default_alloc + (self.num_threads - 1)
+        other_alloc = default_alloc - 1
+        # the cdfs of the interval as lists, cheaper to index than the table
+        cdfs = [self.get_freq_cdf(t, profile_id)
+                for t in xrange(self.num_threads)]
+        while (preferred_alloc <= max_alloc):
+            pos_gain = _gain(cdfs[preferred_t], default_alloc, preferred_alloc)
+            neg_gain = sum(_gain(cdfs[t], default_alloc, other_alloc)
+                for t in xrange(self.num_threads) if t != preferred_t)
+            ave_neg_gain = float(neg_gain) / (self.num_threads - 1)
+            #print "ave ng:", ave_neg_gain
+            gain = pos_gain + ave_neg_gain
+            if gain > max_gain:
+                max_gain = gain
+                best_alloc = preferred_alloc
+            preferred_alloc += (self.num_threads - 1)
+            other_alloc -= 1
+        # check for the final best_allocation cosidering shared RD
+        new_best_alloc = best_alloc
+        #print "private best alloc: ", new_best_alloc
+        if shared_profile != None:
+            debug = progress.debug_enabled()
+            max_gain = 0
+            preferred_alloc = best_alloc + (self.num_threads - 1)
+            other_alloc = ((self.num_ways - best_alloc) /
+                (self.num_threads - 1))
+            if debug: progress.log.debug("other alloc: %d", other_alloc)
+            new_other_alloc = other_alloc - 1
+            shared_cdfs = [shared_profile.get_freq_cdf(t, profile_id)
+                           for t in xrange(self.num_threads)]
+            while (preferred_alloc <= max_alloc):
+                shared_gain= sum(_gain(shared_cdfs[t],
+                                       0, preferred_alloc - best_alloc)
+                    for t in xrange(self.num_threads))
+                if debug: progress.log.debug("shared_gain %s", shared_gain)
+                pos_gain = shared_gain
+                neg_gain = sum(_gain(cdfs[t], other_alloc, new_other_alloc)
+                    for t in xrange(self.num_threads) if t != preferred_t)
+                ave_neg_gain = float(neg_gain) / (self.num_threads - 1)
+                gain = pos_gain + ave_neg_gain
+                if debug: progress.log.debug("ave ng: %s gain: %s",
+                                             ave_neg_gain, gain)
+                if gain > max_gain:
+                    max_gain = gain
+                    new_best_alloc = preferred_alloc
+                preferred_alloc += (self.num_threads - 1)
+                new_other_alloc -= 1
+        return new_best_alloc
+
+    def memoized_alloc_for_profile(self, memo, preferred_t, profile_id,
+                                   shared_profile=None):
+        """Find the best allocation of the preferred thread for one interval,
+        reusing the allocation of a similar interval from the memo if any."""
+        signature = memo.signature(self, profile_id, shared_profile)
+        cached = memo.lookup(signature, preferred_t)
+        if cached is not None and not memo.verify:
+            return cached
+        solved = self.best_alloc_for_profile(preferred_t, profile_id,
+                                             shared_profile)
+        if cached is None:
+            memo.insert(signature, preferred_t, solved)
+            return solved
+        memo.record(self, preferred_t, profile_id, cached, solved)
+        return cached
+
+    def allocation_misses(self, preferred_t, profile_id, alloc):
+        """Return the misses of an interval when the preferred thread gets
+        alloc ways and the other threads share the rest equally."""
+        other_alloc = (self.num_ways - alloc) / (self.num_threads - 1)
+        return sum(self.get_misses(t, profile_id,
+                                   alloc if t == preferred_t else other_alloc)
+            for t in xrange(self.num_threads))
+
+    def cdf_tensor(self, profile_ids=None):
+        """Return the cdfs of all threads as an array indexed by thread,
+        interval (in the order of profile_ids, by default get_cdf_ids) and
+        capacity."""
+        if profile_ids is None:
+            profile_ids = self.get_cdf_ids()
+        profile_ids = list(profile_ids)
+        cdfs = np.array([data.freq_v_cap.array(profile_ids)
+                         for data in self.__thread_data], dtype=np.int64)
+        return cdfs.reshape(self.num_threads, len(profile_ids), -1)
+
+    @instrument.instrumented()
+    def best_alloc_table(self, num_ways=None, profile_ids=None, cdfs=None):
+        """Return the best allocation of every preferred thread for every
+        interval, as best_alloc_for_profile finds it without a shared
+        profile, as an array indexed by preferred thread and interval.
+
+        All the candidate allocations of all intervals are evaluated at once
+        on the cdf tensor (see cdf_tensor, computed unless given). num_ways
+        can be smaller than the number of ways of the benchmark, for a cache
+        with fewer ways of the same number of sets.
+        """
+        if num_ways is None:
+            num_ways = self.num_ways
+        assert num_ways % self.num_threads == 0 and num_ways <= self.num_ways, \
+            "Number of ways should be a multiple of number of threads"
+        if cdfs is None:
+            cdfs = self.cdf_tensor(profile_ids)
+        # hits[t, profile, ways]
+        hits = np.concatenate((np.zeros_like(cdfs[:, :, :1]),
+                               cdfs[:, :, :num_ways]), axis=2)
+        default_alloc = num_ways / self.num_threads
+        max_alloc = num_ways - (self.num_threads - 1)
+        preferred_allocs = np.arange(default_alloc + self.num_threads - 1,
+                                     max_alloc + 1, self.num_threads - 1)
+        other_allocs = default_alloc - 1 - np.arange(len(preferred_allocs))
+        default_hits = hits[:, :, default_alloc:default_alloc + 1]
+        pos_gains = hits[:, :, preferred_allocs] - default_hits
+        neg_gains = hits[:, :, other_allocs] - default_hits
+        all_neg_gains = neg_gains.sum(axis=0)
+        best_allocs = np.empty(cdfs.shape[:2], dtype=np.int64)
+        best_allocs[:] = default_alloc
+        if not len(preferred_allocs):
+            return best_allocs
+        for preferred_t in xrange(self.num_threads):
+            gains = pos_gains[preferred_t] + (all_neg_gains -
+                neg_gains[preferred_t]) / float(self.num_threads - 1)
+            best = gains.argmax(axis=1)
+            improved = gains[np.arange(len(best)), best] > 0
+            best_allocs[preferred_t, improved] = preferred_allocs[best[improved]]
+        return best_allocs
+
     def gain(self, thread, profile_id, from_alloc, to_alloc):
         "Return the gain obtained between two allocations"""
-        value_for_from_alloc = value_for_to_alloc = 0
-        if from_alloc > 0:
-            value_for_from_alloc = self.__thread_data[thread].freq_v_cap[
-                profile_id][from_alloc - 1]
-        if to_alloc > 0:
-            value_for_to_alloc = self.__thread_data[thread].freq_v_cap[
-                profile_id][to_alloc - 1]
-        return value_for_to_alloc - value_for_from_alloc
+        return _gain(self.get_freq_cdf(thread, profile_id), from_alloc,
+                     to_alloc)
 
+    @instrument.instrumented()
     def read_cluster_rddata_from_file(self, bmfile):
         """Read cluster reuse distance profile data from file."""
         IsCluster = lambda line: line.startswith("cluster")
@@ -713,7 +1213,7 @@ class Benchmark(object):
 
         with open(bmfile, 'r') as src:
             for line in src:
-                if IsInterval(line):
+                if IsCluster(line):
                     current_interval = current_interval + 1
                 
                 elif IsThread(line):
@@ -733,6 +1233,7 @@ class Benchmark(object):
                                         rd_profile, 0)
                 else:
                     pass  # other cases are not relevant
+        self.compact()
 
     def set_miss_rate_all_interval(self, thread, cache_capacity,
                                    miss_rate_all_intervals):
@@ -742,32 +1243,93 @@ class Benchmark(object):
         self.__thread_data[thread].miss_rate_all_intervals[cache_capacity] = \
                 miss_rate_all_intervals
     
-    def plot_mr_v_interval(self, new_style=False):
+    def miss_rate_tensor(self, capacities=None, profile_ids=None):
+        """Return the miss rates of all threads as an array indexed by
+        thread, interval (in the order of profile_ids, by default
+        get_profile_ids) and capacity.
+
+        The miss rate of an interval at a capacity is the fraction of its
+        references, misses included, with a reuse distance not smaller than
+        the capacity. The capacities are numbers of blocks or strings such
+        as "64K", by default those of read_mrdata_from_file. The profiles of
+        all threads are binned by one searchsorted and summed by one cumsum.
+        """
+        if capacities is None:
+            capacities = _cache_capacities
+        limits = np.array([_capacity(c) for c in capacities])
+        order = limits.argsort(kind='mergesort')
+        if profile_ids is None:
+            profile_ids = self.get_profile_ids()
+        profile_ids = np.array(list(profile_ids), np.int64)
+        # the profiles of all threads one after the other
+        parts = [data.rd_profiles.concatenated(profile_ids)
+                 for data in self.__thread_data]
+        lengths = np.concatenate([part[0] for part in parts])
+        distances = np.concatenate([part[1] for part in parts])
+        frequencies = np.concatenate([part[2].sum(axis=1)
+                                      if part[2].ndim == 2 else part[2]
+                                      for part in parts])
+        hits = np.empty((len(lengths), len(limits)))
+        hits[:, order] = _cdf_rows(lengths, distances, frequencies,
+                                   limits[order])
+        hits = hits.reshape(self.num_threads, len(profile_ids), len(limits))
+        totals = np.array([data.total_freq.array(profile_ids)
+                           for data in self.__thread_data], dtype=np.float64)
+        totals = totals.reshape(self.num_threads, len(profile_ids), 1)
+        return np.where(totals > 0, 1 - hits / np.maximum(totals, 1), 0.0)
+
+    def miss_rates(self, capacities=None):
+        """Return the profile ids and the miss rates vs interval of all
+        threads, see miss_rate_tensor. Without profiles, the miss rates are
+        those read by read_mrdata_from_file, for its capacities only."""
+        if capacities is None:
+            capacities = _cache_capacities
+        if self.get_profile_ids():
+            return (np.array(self.get_profile_ids()),
+                    self.miss_rate_tensor(capacities))
+        miss_rates = np.array([[data.miss_rate_all_intervals[c]
+                                for c in capacities]
+                               for data in self.__thread_data]) / 100.0
+        return (np.arange(1, miss_rates.shape[2] + 1),
+                miss_rates.transpose(0, 2, 1))
+
+    @instrument.instrumented()
+    def plot_mr_v_interval(self, new_style=False, capacities=None,
+                           file_suffix=None):
         """ Plot miss rate vs interval for all the threads.
         
         Each subplot is for a particular cache capacity. X-axis denotes the
-        number of intervals and Y-axis denotes the miss-rate. All threads are
-        plotted in one sub-plot.
+        intervals and Y-axis denotes the miss-rate. All threads are plotted
+        in one sub-plot. The miss rates are computed from the profiles, see
+        miss_rates.
         """
-        filename = self.name + "_mr_i.eps"
-        subplots = len(_cache_capacities)
-        figure = fig.Figure(filename, title="Miss Rate vs Intervals",
-                        num_subplots=subplots)
-
-        for c in _cache_capacities:
+        if capacities is None:
+            capacities = _cache_capacities
+        profile_ids, miss_rates = self.miss_rates(capacities)
+        cache = rc.RenderCache(self.name)
+        base = self.name + "/" + self.name + "_mr_i" + (file_suffix or '')
+        key = rc.digest([self._plot_key('mr_v_interval', [], new_style,
+                                        capacities),
+                         profile_ids, miss_rates])
+        if cache.is_fresh(base, key):
+            return
+        import figure as fig
+        figure = fig.Figure(cache.filename(base, key),
+                            title="Miss Rate vs Intervals",
+                            figformat='pdf',
+                            total_subplots=len(capacities),
+                            subplots_per_page=min(2, len(capacities)),
+                            font_size=6)
+        labels = ['Thread ' + str(t) for t in xrange(self.num_threads)]
+        for k, c in enumerate(capacities):
             plot_data = list()
-            labels = list()
-            for data in self.__thread_data:
-                intervals = np.arange(0, len(data.miss_rate_all_intervals[c]), 1)
-                miss_rates = np.array(data.miss_rate_all_intervals[c])
-                #label = "label=" + "Thread " + str(self.__thread_data.index(data))
-                plot_data.extend([intervals, miss_rates])
-                labels.append('Thread ' + str(self.__thread_data.index(data)))
-            sp = figure.add_plot(new_style, labels, *plot_data)    
-            figure.set_plot_param(sp, "intervals", "missrate", "Capacity: " + c)
-
-        figure.save()
-        figure.close()
+            for t in xrange(self.num_threads):
+                plot_data.extend([profile_ids, 100 * miss_rates[t, :, k]])
+            figure.add_plot(new_style, labels, 'Interval', 'Miss rate (%)',
+                            'Capacity: ' + str(c), None, *plot_data,
+                            line_plot=True)
+        figure.save_and_close()
+        cache.record(base, key)
     
     def read_mrdata_from_file(self, bmfile):
         """Read miss-rate vs interval data from file."""
@@ -777,7 +1339,8 @@ class Benchmark(object):
     
         # Initialization
         total_threads = 0
-        sys.stderr.write("reading file " + bmfile + " for benchmark " + self.name + "\n")
+        progress.log.info("reading file %s for benchmark %s", bmfile,
+                          self.name)
         with open(bmfile, 'r') as src:
             for line in src:
                 if IsThread(line):                
@@ -6,7 +6,7 @@ NAME
 
 SYNOPSYS
     ./best_partition.py benchmark input_file num_threads set_bits total_ways
-    is hybrid
+    is hybrid [num_clusters [compare_full]]
 
 DESCRIPTION
     Given the reuse-distance signatures of each thread for each interval for
@@ -32,6 +32,13 @@ DESCRIPTION
     are allocated to the preferred thread beyond its normal allocation, the
     references with distance less than 3 in the shared profile are also
     considered in the gain obtained.
+
+    If the number of clusters is given, the intervals are clustered on their
+    reuse distance signatures and the best partition is found only for the
+    representative interval of each cluster. Every interval gets the
+    allocation of its representative. Optionally, every interval is
+    partitioned as well and the error in total misses of the representative
+    allocations is reported.
  
 OPTIONS
     benchmark
@@ -54,11 +61,24 @@ OPTIONS
     is_hybrid
         Are we processing hybrid reuse distance. That would require 2 stacks.
         0 = no, 1 = yes.
+
+    num_clusters
+        Number of clusters of intervals to partition on. Optional.
+
+    compare_full
+        Report the error against partitioning every interval, which costs
+        more than partitioning without clusters. 0 = no (default), 1 = yes.
                        
 EXAMPLES
     ./best_partition.py  blackscholes inter_rda_blackscholes_large_4_5mil.out 4
     9 32 0
 
+    ./best_partition.py  blackscholes inter_rda_blackscholes_large_4_5mil.out 4
+    9 32 0 16
+
+    ./best_partition.py  blackscholes inter_rda_blackscholes_large_4_5mil.out 4
+    9 32 0 16 1
+
 NOTES
 
 AUTHOR
@@ -78,13 +98,14 @@ VERSION
 
 import sys
 import benchmark as bm
+import cluster
 
 def best_partition():
     """See script description."""
     #=======================================================================
     # command line processing
     #=======================================================================
-    if len(sys.argv) != 7:
+    if not(7 <= len(sys.argv) <= 9):
         sys.stdout.write("Incorrect number of arguments. Program description:\n" 
                          + __doc__)
         sys.exit(1)
@@ -94,13 +115,38 @@ def best_partition():
     num_sets = 2 ** int(sys.argv[4])
     num_ways = int(sys.argv[5])
     is_hybrid = int(sys.argv[6])
+    num_clusters = compare_full = 0
+    if len(sys.argv) >= 8: num_clusters = int(sys.argv[7])
+    if len(sys.argv) == 9: compare_full = int(sys.argv[8])
+
+    def partition(new_bm, shared_profile=None):
+        if not(num_clusters):
+            allocations = new_bm.find_best_partition(
+                shared_profile=shared_profile)
+            new_bm.write_best_partition(allocations)
+            return allocations
+        clustering = cluster.cluster_intervals(new_bm, num_clusters)
+        if not(compare_full):
+            allocations = cluster.representative_partition(new_bm,
+                clustering, shared_profile)
+            new_bm.write_best_partition(allocations, clustering.profile_ids)
+            return allocations
+        allocations, report = cluster.partition_error(new_bm, clustering,
+                                                      shared_profile)
+        sys.stdout.write("Misses full run: %d representatives: %d "
+                         "error: %.4f\n" % (report['full_misses'],
+                         report['representative_misses'],
+                         report['relative_error']))
+        new_bm.write_best_partition(allocations, clustering.profile_ids)
+        return allocations
+
     if not(is_hybrid):
         stack_type = None
         new_bm = bm.Benchmark(benchmark, num_threads, stack_type,
                               num_sets, num_ways)
         new_bm.read_rddata_from_file(input_file, num_threads)
         new_bm.build_freq_vs_capacity_profile()
-        _ = new_bm.find_best_partition()
+        _ = partition(new_bm)
     else:
         stack_type = 'private'
         new_bm_p = bm.Benchmark(benchmark, num_threads, stack_type,
@@ -113,7 +159,7 @@ def best_partition():
                               num_sets, num_ways)
         new_bm_s.read_rddata_from_file(input_file, num_threads)
         new_bm_s.build_freq_vs_capacity_profile()
-        _ = new_bm_p.find_best_partition(shared_profile=new_bm_s)
+        _ = partition(new_bm_p, shared_profile=new_bm_s)
     sys.stderr.write("my work is done here\n")
 
 
@@ -0,0 +1,162 @@
+"""
+Out-of-core storage of the profiles of a Benchmark larger than memory.
+
+A chunked store is a store of export.py written one chunk of intervals at a
+time: chunk k of every table (profiles, totals, cdfs, partitions) holds the
+profile ids of interval chunk k for all threads, and the metadata indexes the
+first and last profile id of every chunk. ingest() reads the output of the
+Pin tool into a store, chunk_intervals profile ids at a time, so only one
+chunk of profiles is ever in memory. The cdf builder and the partition
+solver of a ChunkedStore then go through the store chunk by chunk, every
+chunk loaded back as a Benchmark of its own, and write_csv and write_jsonl
+of export.py read a table one chunk at a time too. Peak memory is bounded by
+the chunk size, not by the number of intervals.
+
+A chunked store is also an ordinary store of export.py, load_benchmark
+loads it whole when it fits in memory.
+"""
+import benchmark as bm
+import export
+import numpy as np
+import progress
+import sys
+
+
+_index = 'interval_chunks'
+
+
+def _profile_id_range(benchmark):
+    """Return the first and last profile ids of a benchmark, all threads
+    together, or None if it has none."""
+    ids = [benchmark.get_profile_ids(t) for t in
+           xrange(benchmark.num_threads)]
+    ids = [x for x in ids if x]
+    if not ids:
+        return None
+    return [min(x[0] for x in ids), max(x[-1] for x in ids)]
+
+
+def ingest(bmfile, directory, name, num_threads, stack_type=None, num_sets=0,
+           num_ways=0, offset=0, quantum_size=1, chunk_intervals=4096,
+           build_cdfs=True):
+    """Read the output of the Pin tool into a chunked store, return the
+    ChunkedStore.
+
+    @param bmfile: output of the Pin tool
+    @param directory: directory of the store
+    @param name, num_threads, stack_type, num_sets, num_ways: see Benchmark
+    @param offset, quantum_size: see Benchmark.read_rddata_from_file
+    @param chunk_intervals: profile ids per chunk
+    @param build_cdfs: build the cdfs of every chunk while it is in memory
+    """
+    writer = export.ColumnarWriter(directory, {
+        'name': name, 'num_threads': num_threads, 'stack_type': stack_type,
+        'num_sets': num_sets, 'num_ways': num_ways,
+        'chunk_intervals': chunk_intervals, _index: list()})
+
+    def write_chunk(benchmark):
+        if build_cdfs:
+            benchmark.build_freq_vs_capacity_profile()
+        export.append_benchmark(writer, benchmark)
+        writer.metadata[_index].append(_profile_id_range(benchmark))
+        progress.log.debug("chunk %d: profile ids %d to %d",
+                           len(writer.metadata[_index]) - 1,
+                           *writer.metadata[_index][-1])
+
+    benchmark = bm.Benchmark(name, num_threads, stack_type, num_sets,
+                             num_ways)
+    benchmark.read_rddata_from_file(bmfile, num_threads, offset, quantum_size,
+                                    chunk_intervals, write_chunk)
+    if _profile_id_range(benchmark) is not None:
+        write_chunk(benchmark)
+    writer.close()
+    return ChunkedStore(directory)
+
+
+class ChunkedStore(object):
+    """A store of export.py written one chunk of intervals at a time."""
+
+    def __init__(self, directory):
+        """Constructor
+
+        @param directory: directory written by ingest
+        """
+        self.directory = directory
+        self.metadata = export.read_metadata(directory)
+        assert _index in self.metadata, directory + " is not a chunked store"
+
+    def num_chunks(self):
+        """Return the number of chunks of intervals."""
+        return len(self.metadata[_index])
+
+    def profile_id_range(self, chunk):
+        """Return the first and last profile ids of a chunk."""
+        return tuple(self.metadata[_index][chunk])
+
+    def chunk(self, chunk):
+        """Return a Benchmark with the profiles, totals and cdfs of a
+        chunk."""
+        return export.load_benchmark(self.directory, [chunk])
+
+    def __iter__(self):
+        for chunk in xrange(self.num_chunks()):
+            yield self.chunk(chunk)
+
+    def build_freq_vs_capacity_profile(self):
+        """Build the cdfs of all the chunks, one chunk at a time, see
+        Benchmark.build_freq_vs_capacity_profile."""
+        writer = export.ColumnarWriter.reopen(self.directory)
+        writer.drop('cdfs')
+        done = progress.Progress("cdfs", self.num_chunks(), 'chunks')
+        for benchmark in self:
+            benchmark.build_freq_vs_capacity_profile()
+            export.append_benchmark(writer, benchmark, tables=('cdfs',))
+            done.update()
+        done.done()
+        writer.close()
+        self.metadata = writer.metadata
+
+    def find_best_partition(self, shared_store=None):
+        """Find the best partitions of all the intervals, one chunk at a
+        time, and write them to the partitions table, see
+        Benchmark.find_best_partition. The cdfs must have been built.
+
+        @param shared_store: chunked store of the shared profile for the
+        hybrid case, ingested with the same chunk_intervals
+        """
+        writer = export.ColumnarWriter.reopen(self.directory)
+        writer.drop('partitions')
+        done = progress.Progress("chunked partition", self.num_chunks(),
+                                 'chunks')
+        for chunk, benchmark in enumerate(self):
+            shared_profile = None
+            if shared_store is not None:
+                assert (shared_store.profile_id_range(chunk) ==
+                        self.profile_id_range(chunk)), \
+                    "the private and shared stores have different chunks"
+                shared_profile = shared_store.chunk(chunk)
+            profile_ids = np.array(benchmark.get_cdf_ids(), np.int64)
+            allocs = np.array(benchmark.find_best_partition(
+                shared_profile=shared_profile, profile_ids=profile_ids),
+                np.int64).reshape(benchmark.num_threads, len(profile_ids))
+            writer.append('partitions',
+                preferred_thread=np.repeat(
+                    np.arange(len(allocs), dtype=np.int32), len(profile_ids)),
+                profile_id=np.tile(profile_ids, len(allocs)),
+                alloc=allocs.ravel())
+            done.update()
+        done.done()
+        writer.close()
+        self.metadata = writer.metadata
+
+    def write_best_partition(self, out=sys.stdout):
+        """Write the partitions found by find_best_partition as
+        Benchmark.write_best_partition does, one chunk at a time."""
+        for preferred_t in xrange(self.metadata['num_threads']):
+            out.write("Preferred thread: %d\n" % preferred_t)
+            for chunk in export.read_table(self.directory, 'partitions',
+                                           mmap_mode='r'):
+                rows = chunk['preferred_thread'] == preferred_t
+                out.write(''.join("Best Alloc for Interval %d: %d\n" % pair
+                    for pair in zip(chunk['profile_id'][rows].tolist(),
+                                    chunk['alloc'][rows].tolist())))
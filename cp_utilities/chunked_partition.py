@@ -0,0 +1,75 @@
+#! /usr/bin/env python
+"""Finds the best partition of each interval, out of core.
+
+NAME
+    chunked_partition.py
+
+SYNOPSYS
+    ./chunked_partition.py benchmark input_file num_threads set_bits
+    total_ways is_hybrid store_directory [chunk_intervals]
+
+DESCRIPTION
+    Does what best_partition.py does, for inputs whose profiles do not fit
+    in memory. The input is read into a chunked store (see chunked.py) one
+    chunk of intervals at a time, the cdfs of a chunk are built while it is
+    in memory, then the best partitions are found one chunk at a time and
+    written to the partitions table of the store and to the output. Peak
+    memory is bounded by the chunk size. For the hybrid scheme the shared
+    profiles are stored in store_directory/shared.
+
+    The store can be read by cp_utils.py --store or converted with
+    export.write_csv and export.write_jsonl.
+
+OPTIONS
+    benchmark, input_file, num_threads, set_bits, total_ways, is_hybrid
+        See best_partition.py.
+
+    store_directory
+        Directory of the chunked store, created.
+
+    chunk_intervals
+        Number of intervals per chunk. Default 4096.
+
+EXAMPLES
+    ./chunked_partition.py blackscholes inter_rda_blackscholes_large.out 64
+    9 128 0 blackscholes_store 8192
+"""
+
+import os
+import sys
+import chunked
+
+
+def chunked_partition():
+    """See script description."""
+    if not(8 <= len(sys.argv) <= 9):
+        sys.stdout.write("Incorrect number of arguments. Program description:\n"
+                         + __doc__)
+        sys.exit(1)
+    benchmark = sys.argv[1]
+    input_file = sys.argv[2]
+    num_threads = int(sys.argv[3])
+    num_sets = 2 ** int(sys.argv[4])
+    num_ways = int(sys.argv[5])
+    is_hybrid = int(sys.argv[6])
+    directory = sys.argv[7]
+    chunk_intervals = 4096
+    if len(sys.argv) == 9: chunk_intervals = int(sys.argv[8])
+
+    store = chunked.ingest(input_file, directory, benchmark, num_threads,
+                           'private' if is_hybrid else None, num_sets,
+                           num_ways, chunk_intervals=chunk_intervals)
+    shared_store = None
+    if is_hybrid:
+        shared_store = chunked.ingest(input_file,
+                                      os.path.join(directory, 'shared'),
+                                      benchmark, num_threads, 'shared',
+                                      num_sets, num_ways,
+                                      chunk_intervals=chunk_intervals)
+    store.find_best_partition(shared_store)
+    store.write_best_partition()
+    sys.stderr.write("my work is done here\n")
+
+
+if __name__ == '__main__':
+    chunked_partition()
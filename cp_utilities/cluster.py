@@ -0,0 +1,214 @@
+"""
+Clusters the intervals of a benchmark on their reuse-distance signatures.
+
+Consecutive intervals of a run usually look alike, so the analysis can be
+done on one representative interval per cluster instead of every interval,
+the same idea as the BBVClustering tool used by cluster_rd_plot.py, but on
+the profiles already held in a Benchmark.
+
+The signature of an interval is the concatenation over threads of the
+reuse-distance histogram binned on log2(distance + 1) and normalized to a sum
+of 1. The signatures are clustered with k-means (k-means++ seeding), or
+mini-batch k-means for large runs.
+"""
+import numpy as np
+
+
+class Clustering(object):
+    """Result of clustering the intervals of a benchmark.
+
+    Members:
+    profile_ids: list of the clustered profile ids.
+    assignments: array, cluster of each profile id.
+    weights: array, fraction of the intervals in each cluster.
+    representatives: list, for each cluster the profile id closest to its
+    centroid, None for an empty cluster.
+    centroids: array, the cluster centroids, one row per cluster.
+    """
+
+    def __init__(self, profile_ids, assignments, centroids, signatures):
+        """Constructor"""
+        self.profile_ids = list(profile_ids)
+        self._rows = dict((profile_id, row)
+            for row, profile_id in enumerate(self.profile_ids))
+        self.assignments = assignments
+        self.centroids = centroids
+        num_clusters = len(centroids)
+        counts = np.bincount(assignments, minlength=num_clusters)
+        self.weights = counts / float(len(assignments))
+        distances = _squared_distances(signatures, centroids)
+        self.representatives = list()
+        for c in xrange(num_clusters):
+            members = np.flatnonzero(assignments == c)
+            if len(members) == 0:
+                self.representatives.append(None)
+                continue
+            closest = members[np.argmin(distances[members, c])]
+            self.representatives.append(self.profile_ids[closest])
+
+    def representative_of(self, profile_id):
+        """Return the representative profile id for a profile id."""
+        cluster = self.assignments[self._rows[profile_id]]
+        return self.representatives[cluster]
+
+
+def log_binned_signatures(benchmark, profile_ids=None):
+    """Return the signature matrix of a benchmark, one row per profile id.
+
+    Hit type profiles are summed over the hit types.
+    """
+    if profile_ids is None:
+        profile_ids = benchmark.get_profile_ids()
+    binned = list()
+    num_bins = 1
+    for profile_id in profile_ids:
+        row = list()
+        for t in xrange(benchmark.num_threads):
+            distances, frequencies = benchmark.get_rd_arrays(t, profile_id)
+            if frequencies.ndim == 2:
+                frequencies = frequencies.sum(axis=1)
+            bins = np.floor(np.log2(distances + 1)).astype(np.int64)
+            histogram = np.bincount(bins, weights=frequencies)
+            num_bins = max(num_bins, len(histogram))
+            row.append(histogram)
+        binned.append(row)
+    signatures = np.zeros((len(binned), benchmark.num_threads * num_bins))
+    for i, row in enumerate(binned):
+        for t, histogram in enumerate(row):
+            total = histogram.sum()
+            if total > 0:
+                start = t * num_bins
+                signatures[i, start:start + len(histogram)] = histogram / total
+    return signatures
+
+
+def _squared_distances(data, centroids):
+    """Squared euclidean distance of every row of data to every centroid."""
+    distances = ((data ** 2).sum(axis=1)[:, np.newaxis]
+                 - 2.0 * np.dot(data, centroids.T)
+                 + (centroids ** 2).sum(axis=1)[np.newaxis, :])
+    return np.maximum(distances, 0.0)
+
+
+def _seed_centroids(data, k, rng):
+    """Choose the initial centroids with k-means++."""
+    centroids = np.empty((k, data.shape[1]))
+    centroids[0] = data[rng.randint(len(data))]
+    closest = _squared_distances(data, centroids[:1])[:, 0]
+    for c in xrange(1, k):
+        total = closest.sum()
+        if total > 0:
+            chosen = rng.choice(len(data), p=closest / total)
+        else:
+            chosen = rng.randint(len(data))
+        centroids[c] = data[chosen]
+        closest = np.minimum(closest,
+            _squared_distances(data, centroids[c:c + 1])[:, 0])
+    return centroids
+
+
+def kmeans(data, k, max_iter=100, batch_size=None, seed=0):
+    """Cluster the rows of data in k clusters.
+
+    Returns the centroids and the cluster of each row. With a batch_size,
+    mini-batch k-means is used: every iteration updates the centroids from a
+    random sample of batch_size rows only.
+    """
+    assert 0 < k <= len(data), "number of clusters should be in [1, rows]"
+    rng = np.random.RandomState(seed)
+    centroids = _seed_centroids(data, k, rng)
+    if batch_size is None:
+        assignments = None
+        for dummy in xrange(max_iter):
+            distances = _squared_distances(data, centroids)
+            new_assignments = np.argmin(distances, axis=1)
+            if (assignments is not None and
+                    np.array_equal(assignments, new_assignments)):
+                break
+            assignments = new_assignments
+            counts = np.bincount(assignments, minlength=k)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, data)
+            for c in np.flatnonzero(counts == 0):
+                # Re-seed an empty cluster with the worst fitted row.
+                farthest = np.argmax(distances[np.arange(len(data)),
+                                               assignments])
+                sums[c] = data[farthest]
+                counts[c] = 1
+                distances[farthest] = 0.0
+            centroids = sums / counts[:, np.newaxis]
+    else:
+        counts = np.zeros(k)
+        for dummy in xrange(max_iter):
+            batch = data[rng.randint(len(data), size=batch_size)]
+            nearest = np.argmin(_squared_distances(batch, centroids), axis=1)
+            batch_counts = np.bincount(nearest, minlength=k)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, batch)
+            counts += batch_counts
+            # every centroid moves to the mean of all the rows it was given,
+            # the learning rate of a cluster is batch_counts / counts
+            moved = batch_counts > 0
+            means = sums[moved] / batch_counts[moved, np.newaxis]
+            centroids[moved] += ((means - centroids[moved]) *
+                (batch_counts[moved] / counts[moved])[:, np.newaxis])
+    assignments = np.argmin(_squared_distances(data, centroids), axis=1)
+    return centroids, assignments
+
+
+def cluster_intervals(benchmark, num_clusters, batch_size=None, seed=0):
+    """Cluster the intervals of a benchmark on their signatures."""
+    profile_ids = benchmark.get_profile_ids()
+    signatures = log_binned_signatures(benchmark, profile_ids)
+    centroids, assignments = kmeans(signatures, num_clusters,
+                                    batch_size=batch_size, seed=seed)
+    return Clustering(profile_ids, assignments, centroids, signatures)
+
+
+def representative_partition(benchmark, clustering, shared_profile=None):
+    """Partition on the representatives only.
+
+    The best partition is found for the representatives and every interval
+    is given the allocation of its representative. Returns the allocations
+    per preferred thread, per profile id of the clustering, as
+    find_best_partition. The frequency vs capacity cdfs should be built.
+    """
+    reps = sorted(set(r for r in clustering.representatives if r is not None))
+    rep_best = benchmark.find_best_partition(shared_profile,
+                                             profile_ids=reps)
+    allocations = list()
+    for preferred_t in xrange(benchmark.num_threads):
+        rep_alloc = dict(zip(reps, rep_best[preferred_t]))
+        allocations.append([rep_alloc[clustering.representative_of(profile_id)]
+            for profile_id in clustering.profile_ids])
+    return allocations
+
+
+def partition_error(benchmark, clustering, shared_profile=None):
+    """Compare partitioning on the representatives against the full run.
+
+    This solves every interval as well, so it costs more than partitioning
+    without clustering; use representative_partition when the error is not
+    needed. Returns the representative allocations, as
+    representative_partition, and a dictionary with the total misses for the
+    full run and for the representative allocations, and the relative error.
+    The frequency vs capacity cdfs should be built.
+    """
+    allocations = representative_partition(benchmark, clustering,
+                                           shared_profile)
+    full = benchmark.find_best_partition(shared_profile,
+                                         profile_ids=clustering.profile_ids)
+    full_misses = rep_misses = 0
+    for preferred_t in xrange(benchmark.num_threads):
+        for i, profile_id in enumerate(clustering.profile_ids):
+            full_misses += benchmark.allocation_misses(preferred_t,
+                profile_id, full[preferred_t][i])
+            rep_misses += benchmark.allocation_misses(preferred_t,
+                profile_id, allocations[preferred_t][i])
+    error = 0.0
+    if full_misses > 0:
+        error = (rep_misses - full_misses) / float(full_misses)
+    report = {'full_misses': full_misses,
+              'representative_misses': rep_misses,
+              'relative_error': error}
+    return allocations, report
@@ -5,12 +5,18 @@ NAME
     cluster_rd_plot.py
 
 SYNOPSYS
-    ./cluster_rd_plot.py benchmark input_file num_threads
+    ./cluster_rd_plot.py benchmark input_file num_threads [num_clusters]
 
 DESCRIPTION
     Given the reuse-distance signatures for each cluster for a benchmark,
     plots the reuse distance signature for each cluster in a subplot. Outputs
     one file per thread.
+
+    If the number of clusters is given, the input file is the output of the
+    reuse distance tool instead and the intervals are clustered here, on their
+    log-binned reuse distance signatures. The cluster of each interval, the
+    cluster weights and the representative intervals are printed, and the
+    signatures of the representative intervals are plotted.
  
 OPTIONS
     benchmark
@@ -18,14 +24,21 @@ OPTIONS
 
     input_file
         Input file containing reuse-distance signatures per cluster. This has
-        to be the output of the BBVCLusterting tool.
+        to be the output of the BBVCLusterting tool. With num_clusters, the
+        output of the reuse distance tool, using Pin or simics.
 
     num_threads
         Number of threads.
+
+    num_clusters
+        Number of clusters. Optional.
                        
 EXAMPLES
     ./cluster_rd_plot.py  blackscholes blackscholes_l_nohash_nocluster.cluster 4
 
+    ./cluster_rd_plot.py  blackscholes inter_rda_blackscholes_large_4_5mil.out 4
+    8
+
 NOTES
 
 AUTHOR
@@ -45,7 +58,7 @@ VERSION
 
 import sys
 import benchmark as bm
-import plot_data as pd
+import cluster
 
 
 def cluster_rd_plot():
@@ -53,16 +66,31 @@ def cluster_rd_plot():
     #=======================================================================
     # command line processing
     #=======================================================================
-    if len(sys.argv) != 4:
+    if not(4 <= len(sys.argv) <= 5):
         sys.stdout.write("Incorrect number of arguments. Program description:\n" 
                          + __doc__)
         sys.exit(1)
     benchmark = sys.argv[1]
     input_file = sys.argv[2]
     num_threads = int(sys.argv[3])
-    new_bm = bm.Benchmark(benchmark, num_threads)
-    new_bm.read_cluster_rddata_from_file(input_file)
-    new_bm.plot_rd_profiles(new_style=False, file_prefix="cluster")
+    new_bm = bm.Benchmark(benchmark, num_threads, None)
+    if len(sys.argv) == 4:
+        new_bm.read_cluster_rddata_from_file(input_file)
+        new_bm.plot_rd_profiles(new_style=False, file_suffix="cluster")
+    else:
+        num_clusters = int(sys.argv[4])
+        new_bm.read_rddata_from_file(input_file, num_threads)
+        clustering = cluster.cluster_intervals(new_bm, num_clusters)
+        for profile_id, c in zip(clustering.profile_ids,
+                                 clustering.assignments):
+            sys.stdout.write("Cluster for Interval %d: %d\n" % (profile_id, c))
+        for c, rep in enumerate(clustering.representatives):
+            sys.stdout.write("Cluster %d: weight %.4f representative %s\n" %
+                (c, clustering.weights[c], rep))
+        reps = sorted(set(r for r in clustering.representatives
+                          if r is not None))
+        new_bm.plot_rd_profiles(new_style=False, file_suffix="cluster",
+                                profile_ids=reps)
     sys.stderr.write("my work is done here\n")
 
 
@@ -0,0 +1,438 @@
+#! /usr/bin/env python
+"""Runs a chain of analysis stages on the reuse distance data of a benchmark.
+
+NAME
+    cp_utils.py
+
+SYNOPSYS
+    ./cp_utils.py [options] benchmark input_file num_threads stage
+    [stage options] [stage [stage options] ...]
+
+    ./cp_utils.py batch manifest_file
+
+DESCRIPTION
+    Parses the input once and runs the stages on it in order, in a single
+    process. Every stage name starts a new stage, so the stages and their
+    options read left to right. Stages:
+
+    plot [--kind rdp|all|hits|heatmap|mr] [--filter-distance D]
+         [--decimate N] [--capacities C]
+        Plots the reuse distance signatures: one file per thread (rdp, the
+        default, like rda_plot.py), all threads in one file (all, like
+        rda_plot_1_file.py), grouped by hit type (hits, like
+        rda_by_hit_plot.py) or as one heatmap per thread (heatmap). After a
+        cluster stage, rdp only plots the representative intervals. mr plots
+        the miss rate vs interval of every thread for the comma separated
+        capacities C, like analyze.py.
+
+    cluster num_clusters
+        Clusters the intervals on their log-binned reuse distance signatures
+        and prints the cluster of each interval, the weights and the
+        representatives, like cluster_rd_plot.py. The following plot and
+        partition stages work on the representatives.
+
+    partition [--phases] [--phase-metric l1|js] [--phase-threshold T]
+              [--memo] [--memo-tolerance T] [--verify-memo] [--misses-plot]
+              [--cluster-error]
+        Finds the best partition of each interval for each preferred thread,
+        like best_partition.py. Needs --set-bits and --ways. With --phases
+        the partition is only recomputed at phase changes, with --memo it is
+        reused for similar intervals. After a cluster stage only the
+        representatives are solved, --cluster-error also solves every
+        interval and prints the error against the full run. --misses-plot
+        also plots the misses of all partitions.
+
+    export directory [--partition-misses]
+        Writes the profiles, cdfs and the partitions of a previous partition
+        stage to a columnar store, see export.py. It can be read back with
+        --store instead of parsing the input again.
+
+    In batch mode every line of the manifest file is the command line of one
+    run, without the program name; empty lines and lines starting with # are
+    skipped. The runs share the parsed data, an input which is used by
+    several runs with the same parsing options is parsed once, and dropped
+    after the last of these runs.
+
+OPTIONS
+    benchmark
+        Benchmark name, also the output directory of the plots.
+
+    input_file
+        Output of the reuse distance tool, using Pin or simics. An address
+        trace with --filter-capacity, the output of the BBVClustering tool
+        with --cluster-input, a store directory with --store.
+
+    num_threads
+        Number of threads.
+
+    --hybrid
+        Process hybrid reuse distance: private and shared stacks.
+    --offset, --quantum-size
+        Offset and quantum size of round robin partitioning, see rda_plot.py.
+    --first-preferred-thread
+        Split the intervals of each thread in preferred and unpreferred
+        phases, see rda_by_hit_plot_2phase.py.
+    --filter-capacity, --filter-ways
+        Run an address trace through a filter cache, see rda_trace_plot.py.
+    --cluster-input
+        The input is the output of the BBVClustering tool.
+    --store
+        The input is a directory written by the export stage.
+    --set-bits, --ways
+        Cache geometry for partitioning, see best_partition.py.
+    --draft
+        Render plots in draft quality, without LaTeX. Otherwise the plots are
+        rendered in publication quality, also in a batch after a draft run.
+    --processes
+        Number of processes rendering the per-thread plot files, and solving
+        the partitions (without --phases and --memo): the solvers share the
+        profiles through shared memory, see shared.py.
+    --instrument report_file
+        Record the time, CPU time, peak memory and counters of every stage
+        and write them to report_file as JSON at the end of the run, with a
+        one line summary to stderr, see instrument.py.
+    --profile-dir directory
+        Run every stage under cProfile and write its statistics to the
+        directory, see instrument.py. In a batch, the runs without these
+        options are not instrumented.
+
+EXAMPLES
+    ./cp_utils.py --draft --set-bits 9 --ways 32 blackscholes
+    inter_rda_blackscholes_large_4_5mil.out 4 plot --kind heatmap partition
+    --phases export blackscholes/store
+
+    ./cp_utils.py --set-bits 9 --ways 32 blackscholes
+    inter_rda_blackscholes_large_4_5mil.out 4 cluster 16 plot partition
+
+    ./cp_utils.py batch runs.txt
+
+NOTES
+    The progress of the long loops is reported on stderr every few seconds.
+    CP_UTILS_LOG=debug adds the per-interval messages, CP_UTILS_LOG=warning
+    silences the progress, see progress.py.
+
+AUTHOR
+    Abhisek Pan, pana@purdue.edu
+
+LICENSE
+    Copyright (C) 2012  Abhisek Pan, Purdue University. All rights reserved.
+
+    This file is distributed under the University of Illinois/NCSA Open Source
+    License.
+    You can obtain a soft copy of the license either by visiting
+    http://otm.illinois.edu/uiuc_openSource, or by mailing pana@purdue.edu.
+
+VERSION
+    1.0
+"""
+
+import argparse
+import os
+import shlex
+import sys
+import benchmark as bm
+import cluster
+import export
+import instrument
+import partition_memo
+import phase
+import render_cache
+import shared
+
+
+_parse_cache = dict()
+
+
+def _main_parser():
+    parser = argparse.ArgumentParser(prog='cp_utils.py', add_help=False)
+    parser.add_argument('--hybrid', action='store_true')
+    parser.add_argument('--offset', type=int, default=0)
+    parser.add_argument('--quantum-size', type=int, default=1)
+    parser.add_argument('--first-preferred-thread', type=int)
+    parser.add_argument('--filter-capacity', type=int, default=0)
+    parser.add_argument('--filter-ways', type=int, default=0)
+    parser.add_argument('--cluster-input', action='store_true')
+    parser.add_argument('--store', action='store_true')
+    parser.add_argument('--set-bits', type=int)
+    parser.add_argument('--ways', type=int, default=0)
+    parser.add_argument('--draft', action='store_true')
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--instrument')
+    parser.add_argument('--profile-dir')
+    parser.add_argument('benchmark')
+    parser.add_argument('input_file')
+    parser.add_argument('num_threads', type=int)
+    parser.add_argument('stages', nargs=argparse.REMAINDER)
+    return parser
+
+
+def _stage_parsers():
+    parsers = dict()
+    plot = parsers['plot'] = argparse.ArgumentParser(prog='plot',
+                                                     add_help=False)
+    plot.add_argument('--kind', choices=['rdp', 'all', 'hits', 'heatmap',
+                                         'mr'], default='rdp')
+    plot.add_argument('--filter-distance', type=float, default=0.0)
+    plot.add_argument('--decimate', type=int)
+    plot.add_argument('--capacities', type=lambda x: x.split(','))
+    clusters = parsers['cluster'] = argparse.ArgumentParser(prog='cluster',
+                                                            add_help=False)
+    clusters.add_argument('num_clusters', type=int)
+    part = parsers['partition'] = argparse.ArgumentParser(prog='partition',
+                                                          add_help=False)
+    part.add_argument('--phases', action='store_true')
+    part.add_argument('--phase-metric', choices=['l1', 'js'], default='l1')
+    part.add_argument('--phase-threshold', type=float)
+    part.add_argument('--memo', action='store_true')
+    part.add_argument('--memo-tolerance', type=float, default=0.02)
+    part.add_argument('--verify-memo', action='store_true')
+    part.add_argument('--misses-plot', action='store_true')
+    part.add_argument('--cluster-error', action='store_true')
+    exp = parsers['export'] = argparse.ArgumentParser(prog='export',
+                                                      add_help=False)
+    exp.add_argument('directory')
+    exp.add_argument('--partition-misses', action='store_true')
+    return parsers
+
+
+def _split_stages(tokens, names):
+    """Split the tokens into (stage name, stage tokens), a stage name starts
+    a new stage."""
+    stages = list()
+    for token in tokens:
+        if token in names:
+            stages.append((token, list()))
+        elif stages:
+            stages[-1][1].append(token)
+        else:
+            raise ValueError("expected a stage, got " + token)
+    return stages
+
+
+def _read(args, stack_type, suffix):
+    """Return a Benchmark with the input read as the options tell."""
+    if args.store:
+        path = args.input_file
+        if suffix: path = os.path.join(path, suffix)
+        return export.load_benchmark(path)
+    num_sets = 2 ** args.set_bits if args.set_bits is not None else 0
+    new_bm = bm.Benchmark(args.benchmark, args.num_threads, stack_type,
+                          num_sets, args.ways)
+    if args.cluster_input:
+        new_bm.read_cluster_rddata_from_file(args.input_file)
+    elif args.filter_capacity:
+        new_bm.read_trace_from_file(args.input_file, args.num_threads,
+                                    args.filter_capacity, args.filter_ways,
+                                    args.offset, args.quantum_size)
+    elif args.first_preferred_thread is not None:
+        new_bm.read_rddata_from_file_2phase(args.input_file, args.num_threads,
+            args.offset, args.quantum_size, args.first_preferred_thread)
+    else:
+        new_bm.read_rddata_from_file(args.input_file, args.num_threads,
+                                     args.offset, args.quantum_size)
+    return new_bm
+
+
+def _parse_key(args):
+    """Return the input file and the parsing options of a run."""
+    return (os.path.abspath(args.input_file), args.benchmark,
+            args.num_threads, args.hybrid, args.offset, args.quantum_size,
+            args.first_preferred_thread, args.filter_capacity,
+            args.filter_ways, args.cluster_input, args.store, args.set_bits,
+            args.ways)
+
+
+def load(args):
+    """Return the benchmarks of a run as a list of (file suffix, Benchmark):
+    one with no suffix, or the private and the shared ones for hybrid. The
+    benchmarks are parsed once per input file and parsing options, and again
+    when the file changed."""
+    stat = os.stat(args.input_file)
+    version = (stat.st_mtime, stat.st_size)
+    key = _parse_key(args)
+    if _parse_cache.get(key, (None,))[0] != version:
+        # drop the old version before parsing the new one
+        _parse_cache.pop(key, None)
+        if args.hybrid:
+            benchmarks = [(stack_type, _read(args, stack_type, stack_type))
+                for stack_type in ['private', 'shared']]
+        else:
+            benchmarks = [(None, _read(args, None, None))]
+        _parse_cache[key] = (version, benchmarks)
+    return _parse_cache[key][1]
+
+
+def plot_stage(args, options, benchmarks, state):
+    """See script description."""
+    for suffix, new_bm in benchmarks:
+        if options.kind == 'rdp':
+            profile_ids = state.get('representatives')
+            if profile_ids is not None:
+                suffix = 'cluster' + (suffix or '')
+            new_bm.plot_rd_profiles(new_style=False,
+                                    filter_distance=options.filter_distance,
+                                    file_suffix=suffix,
+                                    profile_ids=profile_ids,
+                                    processes=args.processes)
+        elif options.kind == 'all':
+            new_bm.plot_rd_profiles_1_file(new_style=False,
+                                           file_suffix=suffix)
+        elif options.kind == 'hits':
+            new_bm.plot_rd_profiles_by_hit_type(file_suffix=suffix,
+                                                processes=args.processes)
+        elif options.kind == 'mr':
+            new_bm.plot_mr_v_interval(capacities=options.capacities,
+                                      file_suffix=suffix)
+        else:
+            new_bm.plot_rd_heatmap(decimate=options.decimate,
+                                   file_suffix=suffix)
+
+
+def cluster_stage(args, options, benchmarks, state):
+    """See script description."""
+    new_bm = benchmarks[0][1]
+    clustering = cluster.cluster_intervals(new_bm, options.num_clusters)
+    for profile_id, c in zip(clustering.profile_ids, clustering.assignments):
+        sys.stdout.write("Cluster for Interval %d: %d\n" % (profile_id, c))
+    for c, rep in enumerate(clustering.representatives):
+        sys.stdout.write("Cluster %d: weight %.4f representative %s\n" %
+            (c, clustering.weights[c], rep))
+    state['clustering'] = clustering
+    state['representatives'] = sorted(set(r for r in
+        clustering.representatives if r is not None))
+
+
+def partition_stage(args, options, benchmarks, state):
+    """See script description."""
+    assert args.set_bits is not None and args.ways, \
+        "partitioning needs --set-bits and --ways"
+    for dummy, new_bm in benchmarks:
+        if not new_bm.get_cdf_ids():
+            new_bm.build_freq_vs_capacity_profile()
+    new_bm = benchmarks[0][1]
+    shared_profile = benchmarks[1][1] if len(benchmarks) == 2 else None
+    if options.misses_plot:
+        new_bm.plot_partition_v_misses(new_style=False,
+                                       file_suffix=benchmarks[0][0])
+    if 'clustering' in state:
+        if options.cluster_error:
+            allocations, report = cluster.partition_error(new_bm,
+                state['clustering'], shared_profile)
+            sys.stdout.write("Misses full run: %d representatives: %d "
+                             "error: %.4f\n" % (report['full_misses'],
+                             report['representative_misses'],
+                             report['relative_error']))
+        else:
+            allocations = cluster.representative_partition(new_bm,
+                state['clustering'], shared_profile)
+        new_bm.write_best_partition(allocations,
+                                    state['clustering'].profile_ids)
+        state['allocations'] = allocations
+        return
+    boundaries = memo = None
+    if options.phases:
+        boundaries = phase.phase_boundaries(new_bm, options.phase_threshold,
+                                            options.phase_metric)
+        sys.stdout.write("Phases: %d\n" % len(boundaries))
+    if options.memo:
+        memo = partition_memo.PartitionMemo(options.memo_tolerance,
+                                            verify=options.verify_memo)
+    if (args.processes or 1) > 1 and boundaries is None and memo is None:
+        handles = [shared.share(b) for dummy, b in benchmarks]
+        try:
+            state['allocations'] = shared.find_best_partition(*handles,
+                processes=args.processes)
+        finally:
+            for handle in handles:
+                handle.release()
+    else:
+        state['allocations'] = new_bm.find_best_partition(
+            shared_profile=shared_profile, phase_boundaries=boundaries,
+            memo=memo)
+    new_bm.write_best_partition(state['allocations'])
+    if memo is not None:
+        sys.stdout.write("Memo: %s\n" % memo.report())
+
+
+def export_stage(args, options, benchmarks, state):
+    """See script description."""
+    for suffix, new_bm in benchmarks:
+        directory = options.directory
+        if suffix: directory = os.path.join(directory, suffix)
+        allocations = state.get('allocations') if suffix != 'shared' else None
+        export.export_benchmark(new_bm, directory, allocations,
+                                partition_misses=options.partition_misses)
+
+
+_stages = {'plot': plot_stage,
+           'cluster': cluster_stage,
+           'partition': partition_stage,
+           'export': export_stage}
+
+
+def run(argv):
+    """Run the stages of one command line, without the program name."""
+    args = _main_parser().parse_args(argv)
+    parsers = _stage_parsers()
+    stages = [(name, parsers[name].parse_args(tokens))
+              for name, tokens in _split_stages(args.stages, parsers)]
+    # the quality and the instrumentation are process-wide, they are set for
+    # this run only so that the next runs of a batch do not inherit them
+    quality = render_cache.get_default_quality()
+    instrumenting = (not instrument.enabled() and
+                     (args.instrument or args.profile_dir))
+    render_cache.set_default_quality('draft' if args.draft else 'publication')
+    if instrumenting:
+        instrument.enable(args.instrument, args.profile_dir)
+    try:
+        with instrument.stage('load'):
+            benchmarks = load(args)
+        state = dict()
+        for name, options in stages:
+            with instrument.stage(name):
+                _stages[name](args, options, benchmarks, state)
+    finally:
+        render_cache.set_default_quality(quality)
+        if instrumenting:
+            instrument.write_report()
+            instrument.disable()
+
+
+def batch(manifest_file):
+    """Run every command line of a manifest file, see script description.
+    The parsed benchmarks of an input are dropped after the last run which
+    uses them."""
+    with open(manifest_file) as manifest:
+        lines = [line.strip() for line in manifest]
+    lines = [line for line in lines if line and not line.startswith('#')]
+    keys = [_parse_key(_main_parser().parse_args(shlex.split(line)))
+            for line in lines]
+    last_use = dict((key, i) for i, key in enumerate(keys))
+    for i, line in enumerate(lines):
+        sys.stderr.write("running: %s\n" % line)
+        try:
+            run(shlex.split(line))
+        finally:
+            if last_use[keys[i]] == i:
+                _parse_cache.pop(keys[i], None)
+
+
+def cp_utils():
+    """See script description."""
+    if len(sys.argv) < 2 or sys.argv[1] in ['-h', '--help']:
+        sys.stdout.write("Program description:\n" + __doc__)
+        sys.exit(1)
+    try:
+        if sys.argv[1] == 'batch' and len(sys.argv) == 3:
+            batch(sys.argv[2])
+        else:
+            run(sys.argv[1:])
+    except ValueError as err:
+        sys.stdout.write("Incorrect arguments: %s. Program description:\n"
+                         % err + __doc__)
+        sys.exit(1)
+    sys.stderr.write("my work is done here\n")
+
+
+if __name__ == '__main__':
+    cp_utils()
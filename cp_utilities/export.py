@@ -0,0 +1,285 @@
+"""
+Exports the data of a Benchmark to machine-readable files and loads it back.
+
+The store is a directory of columnar tables. Every table is written in chunks,
+one .npy file per column per chunk (<table>.<chunk>.<column>.npy), and
+metadata.json describes the benchmark and the chunks of every table. A column
+may have more than one dimension, the first one is always the rows. Numbers
+are written as arrays, never formatted row by row. Tables:
+    profiles: thread, profile_id, distance, frequency (one column per hit
+        type for profiles grouped by hit type)
+    totals: thread, profile_id, total_freq
+    cdfs: thread, profile_id, cdf (frequency vs capacity, see
+        Benchmark.build_freq_vs_capacity_profile)
+    partition_misses: profile_id, misses (preferred thread x partition, see
+        Benchmark.partition_misses), the partitions are in the metadata
+    partitions: preferred_thread, profile_id, alloc (see
+        Benchmark.find_best_partition)
+
+load_benchmark rebuilds a Benchmark from a store, which is much faster than
+parsing the text output of the Pin tool again, or from some chunks of it.
+append_benchmark writes a Benchmark as one chunk of every table, for the
+chunked stores of chunked.py. write_csv and write_jsonl
+convert a table for tools which do not read .npy files.
+"""
+import benchmark as bm
+import json
+import numpy as np
+import os
+
+
+_metadata_file = 'metadata.json'
+
+
+class ColumnarWriter(object):
+    """Writes the chunks of columnar tables to a directory."""
+
+    def __init__(self, directory, metadata=None):
+        """Constructor
+
+        @param directory: directory of the store, created if needed
+        @param metadata: dictionary saved with the description of the tables
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.metadata = dict(metadata or {})
+        self.metadata['tables'] = dict()
+
+    @classmethod
+    def reopen(cls, directory):
+        """Return a writer adding tables to an existing store."""
+        writer = cls(directory)
+        writer.metadata = read_metadata(directory)
+        return writer
+
+    def drop(self, table):
+        """Remove a table and its chunks."""
+        info = self.metadata['tables'].pop(table, None)
+        if info is None:
+            return
+        for chunk in xrange(len(info['chunks'])):
+            for column in info['columns']:
+                os.remove(self._path(table, chunk, column))
+
+    def append(self, table, **columns):
+        """Write one chunk of a table. All columns have the same number of
+        rows."""
+        tables = self.metadata['tables']
+        info = tables.setdefault(table, {'columns': sorted(columns),
+                                         'chunks': list()})
+        assert sorted(columns) == info['columns'], \
+            "columns differ from the previous chunks of " + table
+        rows = set(len(values) for values in columns.itervalues())
+        assert len(rows) == 1, "columns have different numbers of rows"
+        chunk = len(info['chunks'])
+        for column, values in columns.iteritems():
+            np.save(self._path(table, chunk, column), np.asarray(values))
+        info['chunks'].append(rows.pop())
+
+    def close(self):
+        """Write the metadata, the store is complete."""
+        with open(os.path.join(self.directory, _metadata_file), 'w') as f:
+            json.dump(self.metadata, f, indent=1, sort_keys=True)
+
+    def _path(self, table, chunk, column):
+        return os.path.join(self.directory,
+                            '%s.%05d.%s.npy' % (table, chunk, column))
+
+
+def read_metadata(directory):
+    """Return the metadata of a store."""
+    with open(os.path.join(directory, _metadata_file)) as f:
+        return json.load(f)
+
+
+def read_table(directory, table, mmap_mode=None, chunks=None):
+    """Generate the chunks of a table as dictionaries of arrays, all of them
+    or those of the chunk numbers given."""
+    info = read_metadata(directory)['tables'].get(table)
+    if info is None:
+        return
+    if chunks is None:
+        chunks = xrange(len(info['chunks']))
+    for chunk in chunks:
+        yield dict((column, np.load(os.path.join(directory,
+            '%s.%05d.%s.npy' % (table, chunk, column)), mmap_mode=mmap_mode))
+            for column in info['columns'])
+
+
+def export_benchmark(benchmark, directory, best_allocations=None,
+                     profile_ids=None, partition_misses=False,
+                     chunk_profiles=256):
+    """Export the profiles and cdfs of a benchmark.
+
+    @param benchmark: the Benchmark
+    @param directory: directory of the store
+    @param best_allocations: result of find_best_partition, optional
+    @param profile_ids: the profile ids passed to find_best_partition, by
+    default 1..number of cdfs as there
+    @param partition_misses: export the misses of all the partitions of
+    all_possible_partitions too, needs the cdfs
+    @param chunk_profiles: number of profile ids of a thread per chunk
+    """
+    writer = ColumnarWriter(directory, {'name': benchmark.name,
+                                        'num_threads': benchmark.num_threads,
+                                        'stack_type': benchmark.stack_type,
+                                        'num_sets': benchmark.num_sets,
+                                        'num_ways': benchmark.num_ways})
+    for t in xrange(benchmark.num_threads):
+        ids = np.array(benchmark.get_profile_ids(t), np.int64)
+        for start in xrange(0, len(ids), chunk_profiles):
+            chunk_ids = ids[start:start + chunk_profiles]
+            lengths, distances, frequencies = \
+                benchmark.get_rd_concatenated(t, chunk_ids)
+            # written even when empty, so that chunk k of profiles and of
+            # totals hold the same profile ids
+            writer.append('profiles',
+                thread=np.repeat(np.int32(t), len(distances)),
+                profile_id=np.repeat(chunk_ids, lengths),
+                distance=distances,
+                frequency=frequencies.astype(np.int64))
+            writer.append('totals',
+                thread=np.repeat(np.int32(t), len(chunk_ids)),
+                profile_id=chunk_ids,
+                total_freq=benchmark.get_total_freqs(t, chunk_ids))
+        ids = np.array(benchmark.get_cdf_ids(t), np.int64)
+        for start in xrange(0, len(ids), chunk_profiles):
+            chunk_ids = ids[start:start + chunk_profiles]
+            writer.append('cdfs',
+                thread=np.repeat(np.int32(t), len(chunk_ids)),
+                profile_id=chunk_ids,
+                cdf=benchmark.get_freq_cdfs(t, chunk_ids))
+    if profile_ids is None:
+        profile_ids = range(1, len(benchmark.get_cdf_ids()) + 1)
+    profile_ids = list(profile_ids)
+    if partition_misses:
+        partitions, labels = benchmark.all_possible_partitions()
+        writer.metadata['partitions'] = partitions
+        writer.metadata['partition_labels'] = labels
+        for start in xrange(0, len(profile_ids), chunk_profiles):
+            chunk_ids = profile_ids[start:start + chunk_profiles]
+            writer.append('partition_misses',
+                profile_id=np.array(chunk_ids, np.int64),
+                misses=benchmark.partition_misses(partitions, chunk_ids))
+    if best_allocations is not None:
+        allocs = np.array(best_allocations, np.int64)
+        writer.append('partitions',
+            preferred_thread=np.repeat(np.arange(len(allocs), dtype=np.int32),
+                                       len(profile_ids)),
+            profile_id=np.tile(np.array(profile_ids, np.int64), len(allocs)),
+            alloc=allocs.ravel())
+    writer.close()
+
+
+def append_benchmark(writer, benchmark, tables=('profiles', 'totals',
+                                                'cdfs')):
+    """Write the profiles, totals and cdfs (if built) of all threads of a
+    benchmark as one chunk of each of the tables, see chunked.py."""
+    columns = dict()
+    for t in xrange(benchmark.num_threads):
+        ids = np.array(benchmark.get_profile_ids(t), np.int64)
+        if 'profiles' in tables:
+            lengths, distances, frequencies = \
+                benchmark.get_rd_concatenated(t, ids)
+            columns.setdefault('profiles', list()).append({
+                'thread': np.repeat(np.int32(t), len(distances)),
+                'profile_id': np.repeat(ids, lengths),
+                'distance': distances,
+                'frequency': frequencies.astype(np.int64)})
+        if 'totals' in tables:
+            columns.setdefault('totals', list()).append({
+                'thread': np.repeat(np.int32(t), len(ids)),
+                'profile_id': ids,
+                'total_freq': benchmark.get_total_freqs(t, ids)})
+        ids = np.array(benchmark.get_cdf_ids(t), np.int64)
+        if 'cdfs' in tables and len(ids):
+            columns.setdefault('cdfs', list()).append({
+                'thread': np.repeat(np.int32(t), len(ids)),
+                'profile_id': ids,
+                'cdf': benchmark.get_freq_cdfs(t, ids)})
+    for table, parts in sorted(columns.iteritems()):
+        # the empty profiles of threads without hit types have 1-D
+        # frequencies
+        parts = [part for part in parts if len(part['profile_id'])] or \
+            parts[:1]
+        writer.append(table, **dict((column, np.concatenate(
+            [part[column] for part in parts])) for column in parts[0]))
+
+
+def load_benchmark(directory, chunks=None):
+    """Rebuild a Benchmark from a store written by export_benchmark, from
+    all the chunks of its tables or from the chunk numbers given."""
+    meta = read_metadata(directory)
+    benchmark = bm.Benchmark(meta['name'], meta['num_threads'],
+                             meta['stack_type'], meta['num_sets'],
+                             meta['num_ways'])
+    totals = dict()
+    for chunk in read_table(directory, 'totals', chunks=chunks):
+        totals.update(zip(zip(chunk['thread'].tolist(),
+                              chunk['profile_id'].tolist()),
+                          chunk['total_freq'].tolist()))
+    for chunk in read_table(directory, 'profiles', chunks=chunks):
+        if not len(chunk['thread']):
+            continue
+        rows = chunk['thread'].astype(np.int64) << 32 | chunk['profile_id']
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        ends = np.r_[starts[1:], len(rows)]
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            t = int(chunk['thread'][start])
+            profile_id = int(chunk['profile_id'][start])
+            benchmark.set_rd_arrays(t, profile_id,
+                                    chunk['distance'][start:end],
+                                    chunk['frequency'][start:end],
+                                    totals.pop((t, profile_id)))
+    for (t, profile_id), total in totals.iteritems():
+        benchmark.set_rd_profile(t, profile_id, dict(), total)
+    for chunk in read_table(directory, 'cdfs', chunks=chunks):
+        for t in np.unique(chunk['thread']).tolist():
+            rows = chunk['thread'] == t
+            benchmark.set_freq_cdfs(t, chunk['profile_id'][rows],
+                                    chunk['cdf'][rows])
+    return benchmark
+
+
+def _flat_columns(chunk):
+    """Return the column names and the columns of a chunk, with the columns
+    of more than one dimension split in one column per element."""
+    names = list()
+    columns = list()
+    for column in sorted(chunk):
+        values = chunk[column].reshape(len(chunk[column]), -1)
+        if chunk[column].ndim == 1:
+            names.append(column)
+        else:
+            names.extend('%s_%d' % (column, i)
+                         for i in xrange(values.shape[1]))
+        columns.append(values)
+    return names, columns
+
+
+def write_csv(directory, table, out):
+    """Write a table of a store as CSV with a header line to a file object."""
+    header = False
+    for chunk in read_table(directory, table):
+        if not len(next(chunk.itervalues())):
+            continue
+        names, columns = _flat_columns(chunk)
+        if not header:
+            out.write(','.join(names) + '\n')
+            header = True
+        fmt = ','.join('%.17g' if c.dtype.kind == 'f' else '%d'
+                       for c in columns for dummy in xrange(c.shape[1]))
+        np.savetxt(out, np.hstack([c.astype(object) for c in columns]),
+                   fmt=fmt)
+
+
+def write_jsonl(directory, table, out):
+    """Write a table of a store as JSON Lines, one object per row, to a file
+    object."""
+    for chunk in read_table(directory, table):
+        columns = sorted(chunk)
+        values = [chunk[column].tolist() for column in columns]
+        for row in zip(*values):
+            out.write(json.dumps(dict(zip(columns, row)), sort_keys=True))
+            out.write('\n')
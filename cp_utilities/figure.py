@@ -8,9 +8,14 @@ import math
 import matplotlib.pyplot as pl
 from itertools import cycle
 from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import LogNorm
 from matplotlib.ticker import MultipleLocator, AutoLocator
 import numpy as np
+import re
 import sys
+import instrument
+import render_cache as rc
 
 
 _inches_per_pt = 1.0 / 72.27               # Convert pt to inch
@@ -20,6 +25,93 @@ _markers = ['3', 'x', '2', '+']
 _linecycler = cycle(_lines)
 _colors = ['r', 'BurlyWood', 'b', 'g', 'k', 'c', 'm', 'y']
 _patterns = ('//', '*', 'o', '\\', 'O', '.')
+_decimations = ['lttb', 'minmax', None]
+
+
+def set_default_quality(quality):
+    """
+    Set the render quality of figures which do not specify one.
+
+    publication: all text is typeset by LaTeX (text.usetex), slow.
+    draft: text is rendered by matplotlib's mathtext with its cached glyphs,
+    no external LaTeX run. Much faster for figures with many subplots.
+
+    """
+    rc.set_default_quality(quality)
+
+
+def get_default_quality():
+    """Return the render quality of figures which do not specify one."""
+    return rc.get_default_quality()
+
+
+def lttb(x, y, threshold):
+    """
+    Return the indices of the points kept by largest-triangle-three-buckets.
+
+    The first and the last points are always kept. The other points are split
+    in threshold - 2 buckets and from each bucket the point forming the largest
+    triangle with the point kept from the previous bucket and the average of
+    the next bucket is kept. This keeps the peaks and the visual shape of the
+    series.
+
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    kept = np.zeros(threshold, dtype=np.int64)
+    kept[-1] = n - 1
+    for i in xrange(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        prev_x, prev_y = x[kept[i]], y[kept[i]]
+        areas = np.abs((prev_x - avg_x) * (y[start:end] - prev_y) -
+                       (prev_x - x[start:end]) * (avg_y - prev_y))
+        kept[i + 1] = start + areas.argmax()
+    return kept
+
+
+def minmax(y, buckets):
+    """
+    Return the indices of the minimum and the maximum of each bucket.
+
+    The points are split in buckets of consecutive points, about one per
+    pixel, so the envelope of the series is drawn exactly. The indices are
+    in increasing order.
+
+    """
+    n = len(y)
+    if 2 * buckets >= n or buckets < 1:
+        return np.arange(n)
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    bucket = np.repeat(np.arange(buckets), np.diff(edges))
+    order = np.lexsort((y, bucket))
+    return np.unique(np.concatenate((order[edges[:-1]], order[edges[1:] - 1])))
+
+
+def thin_ticks(ticks, tick_labels=None, max_ticks=16):
+    """
+    Return at most max_ticks evenly spaced ticks and their labels.
+
+    Ticks with blank labels are dropped first.
+
+    """
+    ticks = np.asarray(ticks)
+    keep = np.arange(len(ticks))
+    if tick_labels is not None:
+        keep = np.array([i for i in keep if str(tick_labels[i]).strip()],
+                        dtype=np.int64)
+    if len(keep) > max_ticks:
+        keep = keep[np.unique(np.linspace(0, len(keep) - 1,
+                                          max_ticks).astype(int))]
+    if tick_labels is None:
+        return ticks[keep], None
+    return ticks[keep], [tick_labels[i] for i in keep]
 
 
 class Figure(object):
@@ -36,7 +128,8 @@ class Figure(object):
     
     def __init__(self, filename, title=None, columns=1,
                  total_subplots=1, subplots_per_page=1, column_width_pt=175.0,
-                 font_size=6, title_font_size=6):
+                 font_size=6, title_font_size=6, figformat='pdf',
+                 quality=None, decimation='lttb'):
         """
         Initialize the plotting environment. 
         
@@ -48,6 +141,10 @@ class Figure(object):
         @param column_width_pt: width of one column in pixels, 
         @param font_size: font size for everything except title
         @param title_font_size: font size for title
+        @param figformat: file format, only pdf is supported
+        @param quality: publication or draft, see set_default_quality
+        @param decimation: lttb, minmax or None, how add_plot downsamples
+        series with more points than the subplot can show
         
         This sets some common parameters for the figure, such as font and figure
         sizes. The size of one sub-plot is determined from the parameters. 
@@ -58,9 +155,17 @@ class Figure(object):
 
         We can create a multi-page file, hence we can control the number of 
         subplots per page.
+
+        A sub-plot shows at most 2 points per pt of column width and one tick
+        label per 2 font sizes, so the size of the output is bounded by the
+        size of the figure and not by the size of the data.
         
         """
         self.figformat = 'PDF'
+        self.quality = (quality if quality is not None
+                        else rc.get_default_quality())
+        assert self.quality in rc.qualities, \
+            "quality has to be publication or draft"
         self.filename = PdfPages(filename + '.' + figformat)
         self.subplots_per_page = subplots_per_page
         self.total_subplots = total_subplots
@@ -79,27 +184,41 @@ class Figure(object):
                'legend.labelspacing': 0.05,
                'xtick.labelsize': font_size,
                'ytick.labelsize': font_size,
-               'text.usetex': True,
+               'text.usetex': self.quality == 'publication',
+               'mathtext.fontset': 'dejavusans',
                'figure.figsize': fig_size}
         pl.rcParams.update(self.plot_params)
         self.title = title
         self.title_font_size = title_font_size
+        self.figure = None
+        assert decimation in _decimations, \
+            "decimation has to be lttb, minmax or None"
+        self.decimation = decimation
+        self.max_points = int(2 * column_width_pt)
+        self.max_ticks = max(2, int(column_width_pt / (2.0 * font_size)))
 
     def create_new_figure(self, print_title=False):
         """
-        Create a new figure.
+        Create a new figure, or clear the figure of the previous page.
         
         Title is printed only for the first page. Hence the flag.
 
+        The same matplotlib figure is reused for all the pages: the artists of
+        a page are dropped once it is written, so memory does not grow with
+        the number of pages.
+
         """
-        self.figure = pl.figure()
+        if self.figure is None:
+            self.figure = pl.figure()
+        else:
+            self.figure.clf()
         if (print_title == True) and (self.title is not None):
             self.figure.suptitle(self.title, fontsize=self.title_font_size)
 
     def handle_page_break(self):
         """
         Handle page breaks based on the number of subplots added.
-        Save the figure at the end of each page. Create a new figure
+        Write the page to the file at the end of each page. Clear the figure
         at the start of each page.
         Return plot id in page.
 
@@ -112,13 +231,30 @@ class Figure(object):
             if self.current_page == 0:
                 self.create_new_figure(print_title=True)
             else:
-                self.figure.savefig(self.filename, format=self.figformat,
-                                    bbox_inches='tight')
+                with instrument.stage('savefig'):
+                    self.figure.savefig(self.filename, format=self.figformat,
+                                        bbox_inches='tight')
                 self.create_new_figure()
             self.current_page += 1
+            instrument.count('pages')
         self.current_plot += 1
+        instrument.count('subplots')
         return plot_id_in_page
 
+    def axis_label(self, label):
+        """
+        Return the text and the text properties for an italic axis label.
+
+        LaTeX sets the label in italics in publication quality, in draft
+        quality the font style is set instead. A % which is not escaped
+        would start a LaTeX comment, it is escaped for LaTeX.
+
+        """
+        if self.quality == 'publication':
+            label = re.sub(r'(?<!\\)%', r'\\%', label)
+            return r'\textit{' + label + '}', {}
+        return label, {'style': 'italic'}
+
     def set_legend_format(self, sp, legend_loc=0, legend_ncol=1,
                           bbox_to_anchor=None, **kwargs):
         """
@@ -213,20 +349,24 @@ class Figure(object):
         assert axis in ['x', 'y'], "axis has to be x or y"
         if axis == 'x':
             sp.xaxis.set_ticks_position('bottom')
-            if label: sp.set_xlabel(r'\textit{' + label + '}')
-            if ticks: sp.set_xticks(ticks)
-            if limits: sp.set_xlim([0,1])
+            if label:
+                text, properties = self.axis_label(label)
+                sp.set_xlabel(text, **properties)
+            if ticks is not None: sp.set_xticks(ticks)
+            if limits: sp.set_xlim(limits)
             if tick_labels: sp.set_xticklabels(tick_labels, rotation=70)
             if scientific:
-                subplot.ticklabel_format(style='sci',scilimits=(-3,4),axis='x')
+                sp.ticklabel_format(style='sci',scilimits=(-3,4),axis='x')
         else:
             sp.yaxis.set_ticks_position('left')
-            if label: sp.set_ylabel(r'\textit{' + label + '}')
-            if ticks: sp.set_yticks(ticks)
-            if limits: sp.set_ylim([0,1])
+            if label:
+                text, properties = self.axis_label(label)
+                sp.set_ylabel(text, **properties)
+            if ticks is not None: sp.set_yticks(ticks)
+            if limits: sp.set_ylim(limits)
             if tick_labels: sp.set_yticklabels(tick_labels, rotation=70)
             if scientific:
-                subplot.ticklabel_format(style='sci',scilimits=(-3,4),axis='y')
+                sp.ticklabel_format(style='sci',scilimits=(-3,4),axis='y')
     
     def set_subplot_title(self, sp, title):
         """
@@ -253,16 +393,27 @@ class Figure(object):
         for direction in ['right','top']:
             sp.spines[direction].set_color('none')
 
-    def add_plot(self, line_plot=False, new_style=False, labels=None,
-                 xlabel=None, ylabel=None, title=None, xtick_labels=None,
-                 legend=True, *args, **kwargs):
+    def add_plot(self, new_style=False, labels=None, xlabel=None, ylabel=None,
+                 title=None, xtick_labels=None, *args, **kwargs):
         """
         Add a new sub-plot to the figure.
 
+        args are the x and y arrays passed on to matplotlib. Keyword arguments
+        line_plot (default False), legend (default True), ylimits (default
+        None) and decimation (default of the figure) control the plot, the
+        rest are passed on to matplotlib. The x ticks are the x values of the
+        first series, thinned along with xtick_labels.
+
         """
+        line_plot = kwargs.pop('line_plot', False)
+        legend = kwargs.pop('legend', True)
+        ylimits = kwargs.pop('ylimits', None)
+        decimation = kwargs.pop('decimation', self.decimation)
+        ticks, xtick_labels = thin_ticks(args[0], xtick_labels, self.max_ticks)
+        args = self.decimate(decimation, *args)
         if line_plot == True:
             if new_style == True: kwargs['linestyle'] = next(_linecycler)
-            else: kwargs['linestyle'] = lines[0]  # Solid line by default.
+            else: kwargs['linestyle'] = _lines[0]  # Solid line by default.
         else:
                 kwargs['linestyle'] = '' # No lines, only points.
         kwargs['markersize'] = 4.0
@@ -272,46 +423,113 @@ class Figure(object):
         if labels:
             dummy = [line.set_label(label) for line, label in zip(lines, labels)]
         dummy = [line.set_marker(marker) for line, marker in zip(lines, _markers)]
-        self.set_axis_format(sp, 'x', label=xlabel, ticks=args[0],
+        self.set_axis_format(sp, 'x', label=xlabel, ticks=ticks,
                              tick_labels=xtick_labels)
-        self.set_axis_format(sp, 'y', label=ylabel, limits=[0,1])
-        if title: self.set_subplot_title(title)
+        self.set_axis_format(sp, 'y', label=ylabel, limits=ylimits)
+        if title: self.set_subplot_title(sp, title)
         if legend: self.set_legend_format(sp)
         return sp
     
+    def decimate(self, decimation, *args):
+        """
+        Downsample the (x, y) pairs of args to at most max_points points.
+
+        Series with a 2-D y are left as they are.
+
+        """
+        if decimation is None:
+            return args
+        args = list(args)
+        for i in xrange(0, len(args) - 1, 2):
+            x, y = np.asarray(args[i]), np.asarray(args[i + 1])
+            if x.ndim != 1 or y.ndim != 1 or len(x) <= self.max_points:
+                continue
+            if decimation == 'lttb':
+                kept = lttb(x, y, self.max_points)
+            else:
+                kept = minmax(y, self.max_points // 2)
+            args[i], args[i + 1] = x[kept], y[kept]
+        return args
+
+    def add_heatmap(self, matrix, xlabel=None, ylabel=None, title=None,
+                    xticks=None, xtick_labels=None, yticks=None,
+                    ytick_labels=None, colorbar_label=None):
+        """
+        Add a new heatmap sub-plot to the figure.
+
+        The matrix is drawn as one rasterized image with a logarithmic color
+        scale, rows along the y axis from the bottom. Cells <= 0 are left
+        blank.
+
+        """
+        plot_id_in_page = self.handle_page_break()
+        sp = self.figure.add_subplot(self.rows, self.columns, plot_id_in_page)
+        cells = np.ma.masked_less_equal(matrix, 0)
+        norm = None
+        if cells.count():
+            norm = LogNorm(vmin=cells.min(), vmax=max(cells.max(),
+                                                      cells.min() + 1))
+        image = sp.imshow(cells, aspect='auto', interpolation='nearest',
+                          origin='lower', norm=norm, rasterized=True)
+        colorbar = self.figure.colorbar(image, ax=sp)
+        if colorbar_label: colorbar.set_label(colorbar_label)
+        self.set_axis_format(sp, 'x', label=xlabel, ticks=xticks,
+                             tick_labels=xtick_labels)
+        self.set_axis_format(sp, 'y', label=ylabel, ticks=yticks)
+        if ytick_labels: sp.set_yticklabels(ytick_labels)
+        if title: self.set_subplot_title(sp, title)
+        return sp
+
     def add_stackedbar(self, labels=None, xlabel=None, ylabel=None,
-                title=None, xtick_labels=None, legend=True, *args, **kwargs):
+                title=None, xtick_labels=None, *args, **kwargs):
         """
         Add a new stacked bar sub-plot to the figure.
 
+        args are the x array followed by one array per stack. Keyword argument
+        legend (default True) controls the legend.
+
+        The bottoms of all stacks come from one cumulative sum and each stack
+        is drawn as a single PolyCollection of bars centered on x, rather than
+        one Rectangle patch per bar.
+
         """
-        kwargs['align'] = 'center'
-        kwargs['linewidth'] = 0.1
-        kwargs['width'] = 0.35
+        legend = kwargs.pop('legend', True)
+        width = 0.35
         colorcycler = cycle(_colors)
-        patterncycler = cycle(_patterns)
-        ind_axis = args[0]
-        num_stacks = len(args) - 1
+        ind_axis = np.asarray(args[0], dtype=float)
+        heights = np.array(args[1:], dtype=float).reshape(len(args) - 1, -1)
+        tops = np.cumsum(heights, axis=0)
+        bottoms = tops - heights
+        left = ind_axis - width / 2.0
+        right = ind_axis + width / 2.0
         plot_id_in_page = self.handle_page_break()
         sp = self.figure.add_subplot(self.rows, self.columns, plot_id_in_page)
-        for i in xrange(1, num_stacks + 1):
-            lower_stacks = np.sum([args[j] for j in xrange(1,i)], axis=0)
-            kwargs['color'] = next(colorcycler)
-            kwargs['edgecolor'] = 'black'
-            rectangles = sp.bar(ind_axis, args[i], bottom=lower_stacks, **kwargs)
-            if labels: rectangles[0].set_label(labels[i-1])
+        for i in xrange(len(heights)):
+            verts = np.empty((len(ind_axis), 4, 2))
+            verts[:, 0, 0] = verts[:, 1, 0] = left
+            verts[:, 2, 0] = verts[:, 3, 0] = right
+            verts[:, 0, 1] = verts[:, 3, 1] = bottoms[i]
+            verts[:, 1, 1] = verts[:, 2, 1] = tops[i]
+            bars = PolyCollection(verts, facecolors=next(colorcycler),
+                                  edgecolors='black', linewidths=0.1, **kwargs)
+            bars.sticky_edges.y.append(0)
+            if labels: bars.set_label(labels[i])
+            sp.add_collection(bars)
+        sp.autoscale_view()
         self.set_spine_format(sp)
-        self.set_axis_format(sp, 'x', label=xlabel, ticks=args[0],
+        ticks, xtick_labels = thin_ticks(args[0], xtick_labels, self.max_ticks)
+        self.set_axis_format(sp, 'x', label=xlabel, ticks=ticks,
                              tick_labels=xtick_labels)
         self.set_axis_format(sp, 'y', label=ylabel)
-        if title: self.set_subplot_title(title)
+        if title: self.set_subplot_title(sp, title)
         if legend: self.set_legend_format(sp)
         return sp
     
     def save_and_close(self):
         """Save & close the figure and free resources."""
-        self.figure.savefig(self.filename, format=self.figformat, 
-                            bbox_inches='tight')
-        self.filename.close()
+        with instrument.stage('savefig'):
+            self.figure.savefig(self.filename, format=self.figformat,
+                                bbox_inches='tight')
+            self.filename.close()
         pl.close(self.figure)
          
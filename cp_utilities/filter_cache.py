@@ -0,0 +1,187 @@
+"""
+Simulates a filtering cache (such as a private L1 in front of the L2 being
+studied) on an address trace and recomputes the reuse distances of the
+references that survive the filter.
+
+Dropping every reuse-distance bin below the filter capacity is only a rough
+approximation: filtering also changes the distances seen by the references
+which miss in the filter. Here the trace itself is run through a modeled LRU
+cache and the stack distances are computed on the filtered stream, in a single
+streaming pass over the trace.
+
+The trace format follows the output of the RD tool:
+    Interval:<n>                start of a new interval
+    thread:<t>                  following accesses belong to thread t
+    Shared / Private            (optional) ignored, the stack type is chosen
+                                when the trace is read
+    access:<a0> <a1> ...        block addresses accessed, decimal or hex
+
+The accesses of an interval are grouped by thread, so only private stacks can
+be computed from it.
+"""
+
+
+_MAGIC_MISS_DISTANCE = 4611686018427387904.0  #2^62
+
+
+class FilterCache(object):
+    """A set-associative cache with LRU replacement.
+
+    Capacity is in blocks. ways = 0 means fully associative. Addresses are
+    block addresses, the set is chosen by the low order bits.
+    """
+
+    def __init__(self, capacity, ways=0):
+        """Constructor"""
+        assert capacity > 0, "filter capacity should be positive"
+        if ways == 0:
+            ways = capacity
+        assert (capacity % ways == 0), \
+            "Filter capacity should be multiple of number of ways"
+        self.capacity = capacity
+        self.ways = ways
+        self.num_sets = capacity / ways
+        # Each set is a list of addresses, most recently used at the end.
+        self.sets = [list() for dummy in xrange(self.num_sets)]
+
+    def access(self, address):
+        """Access an address, return True on a hit. Updates the LRU state."""
+        cache_set = self.sets[address % self.num_sets]
+        try:
+            cache_set.remove(address)
+            hit = True
+        except ValueError:
+            hit = False
+            if len(cache_set) == self.ways:
+                del cache_set[0]
+        cache_set.append(address)
+        return hit
+
+
+class ReuseDistanceStack(object):
+    """Computes LRU stack distances for a stream of addresses.
+
+    The distance of a reference is the number of distinct addresses accessed
+    since the previous access to the same address. The first access to an
+    address gets _MAGIC_MISS_DISTANCE, same as the RD tool.
+    A Fenwick tree over access timestamps marks the last access of every
+    address, so each reference costs O(log n). Timestamps are compacted when
+    the tree fills up, so memory is bounded by the number of distinct
+    addresses rather than the length of the trace.
+    """
+
+    def __init__(self, initial_size=1024):
+        """Constructor"""
+        self.size = initial_size
+        self.tree = [0] * (self.size + 1)
+        self.last_access = dict()
+        self.now = 0
+
+    def _add(self, pos, value):
+        while pos <= self.size:
+            self.tree[pos] += value
+            pos += pos & -pos
+
+    def _prefix(self, pos):
+        total = 0
+        while pos > 0:
+            total += self.tree[pos]
+            pos -= pos & -pos
+        return total
+
+    def _rebuild(self):
+        """Renumber the live timestamps in order and grow if needed."""
+        live = sorted(self.last_access.iteritems(), key=lambda x: x[1])
+        if 2 * len(live) > self.size:
+            self.size *= 2
+        self.tree = [0] * (self.size + 1)
+        for new_time, (address, dummy) in enumerate(live, 1):
+            self.last_access[address] = new_time
+            self.tree[new_time] = 1
+        for pos in xrange(1, self.size + 1):
+            parent = pos + (pos & -pos)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[pos]
+        self.now = len(live)
+
+    def access(self, address):
+        """Access an address, return its reuse distance."""
+        if self.now == self.size:
+            self._rebuild()
+        self.now += 1
+        previous = self.last_access.get(address)
+        if previous is None:
+            distance = _MAGIC_MISS_DISTANCE
+        else:
+            distance = self._prefix(self.now - 1) - self._prefix(previous)
+            self._add(previous, -1)
+        self._add(self.now, 1)
+        self.last_access[address] = self.now
+        return distance
+
+
+def filtered_histograms(tracefile, num_threads, filter_capacity, filter_ways=0,
+                        stack_type=None):
+    """Stream a trace through per-thread filter caches.
+
+    Yields (interval, thread, rd_profile, total_freq) for every thread that
+    appeared in an interval, at the end of that interval. rd_profile maps
+    float distances to int frequencies, as read_rddata_from_file builds
+    them from the RD tool output; cold misses are counted in total_freq
+    only. Each thread
+    has a private filter cache and its own stack.
+
+    A shared stack_type is rejected: the trace lists the accesses thread by
+    thread, so the real interleaving of the threads, which the shared
+    distances depend on, is not known.
+    """
+    if stack_type == "shared":
+        raise ValueError("shared reuse distances need an interleaved trace")
+    IsInterval = lambda line: line.startswith("Interval")
+    IsThread = lambda line: line.startswith("thread")
+    IsAccess = lambda line: line.startswith("access")
+
+    filters = [FilterCache(filter_capacity, filter_ways)
+        for dummy in xrange(num_threads)]
+    stacks = [ReuseDistanceStack() for dummy in xrange(num_threads)]
+    current_interval = current_thrd = 0
+    rd_profiles = [dict() for dummy in xrange(num_threads)]
+    total_freq = [0 for dummy in xrange(num_threads)]
+    active_threads = set()
+
+    def end_of_interval():
+        for t in sorted(active_threads):
+            yield current_interval, t, rd_profiles[t], total_freq[t]
+            rd_profiles[t] = dict()
+            total_freq[t] = 0
+        active_threads.clear()
+
+    with open(tracefile, 'r') as src:
+        for line in src:
+            if IsInterval(line):
+                for result in end_of_interval():
+                    yield result
+                current_interval = current_interval + 1
+
+            elif IsThread(line):
+                current_thrd = int(line.split(':', 1)[1])
+                active_threads.add(current_thrd)
+
+            elif IsAccess(line):
+                cache = filters[current_thrd]
+                stack = stacks[current_thrd]
+                profile = rd_profiles[current_thrd]
+                for token in line.split(':', 1)[1].split():
+                    address = int(token.rstrip(','), 0)
+                    if cache.access(address):
+                        continue  # filtered, never reaches the next level
+                    total_freq[current_thrd] += 1
+                    distance = stack.access(address)
+                    if distance < _MAGIC_MISS_DISTANCE:
+                        distance = float(distance)
+                        profile[distance] = profile.get(distance, 0) + 1
+
+            else:
+                pass  # other cases are not relevant
+        for result in end_of_interval():
+            yield result
@@ -0,0 +1,250 @@
+"""
+Opt-in instrumentation of the analysis stages.
+
+The readers, cdf builders and solvers of Benchmark, its plotting methods and
+figure.Figure are stages: when instrumentation is enabled, the calls, wall
+time, CPU time (including the reaped child processes, such as the render
+workers) and peak resident memory of every stage are recorded, along with
+counters (lines, tokens, intervals, subplots, pages) attributed to the
+innermost running stage. A stage called from itself is timed once.
+Optionally every outermost stage is run under cProfile and its statistics
+dumped to a directory, to be read with pstats.
+
+Instrumentation is off by default and then costs one test per stage call.
+It is enabled by enable(), or for any script by the environment:
+    CP_UTILS_INSTRUMENT=report.json  JSON report written at exit
+    CP_UTILS_PROFILE=directory       cProfile statistics of the stages
+At exit the report is written and a one line summary printed to stderr.
+
+The render workers of render.py send the records of their jobs back to the
+parent, so the report covers the figures rendered in parallel too.
+"""
+import atexit
+import cProfile
+import functools
+import json
+import os
+import resource
+import sys
+import time
+
+
+_stats = None
+_counters = None
+_stack = list()
+_report_path = None
+_profile_dir = None
+_profiling = False
+_start = None
+_registered = False
+
+
+def _cpu_time():
+    """Return the CPU time of the process and of its reaped children."""
+    times = os.times()
+    return times[0] + times[1] + times[2] + times[3]
+
+
+def peak_rss():
+    """Return the peak resident memory of the process in KB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def enable(report_path=None, profile_dir=None):
+    """Start recording. The report is written to report_path at exit, the
+    cProfile statistics of the stages to profile_dir if given."""
+    global _report_path, _profile_dir, _start, _registered
+    if _stats is None:
+        reset()
+        _start = (time.time(), _cpu_time())
+    if not _registered:
+        atexit.register(write_report)
+        _registered = True
+    _report_path = report_path
+    _profile_dir = profile_dir
+    if profile_dir is not None and not os.path.isdir(profile_dir):
+        os.makedirs(profile_dir)
+
+
+def disable():
+    """Stop recording and drop the records."""
+    global _stats, _counters
+    _stats = _counters = None
+    del _stack[:]
+
+
+def enabled():
+    """Return True if instrumentation is on."""
+    return _stats is not None
+
+
+def reset():
+    """Drop the records, keep recording."""
+    global _stats, _counters
+    _stats = dict()
+    _counters = dict()
+    del _stack[:]
+
+
+class _Stage(object):
+    """Context recording a stage."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        global _profiling
+        self.timed = self.name not in _stack
+        _stack.append(self.name)
+        if not self.timed:
+            return self
+        self.profiler = None
+        if _profile_dir is not None and not _profiling:
+            _profiling = True
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.rss = peak_rss()
+        self.start = (time.time(), _cpu_time())
+        return self
+
+    def __exit__(self, *exc_info):
+        global _profiling
+        _stack.pop()
+        if not self.timed or _stats is None:
+            return
+        wall = time.time() - self.start[0]
+        cpu = _cpu_time() - self.start[1]
+        rss = peak_rss()
+        record = _stats.setdefault(self.name, _new_record())
+        record['calls'] += 1
+        record['wall'] += wall
+        record['cpu'] += cpu
+        record['peak_rss_kb'] = max(record['peak_rss_kb'], rss)
+        record['rss_growth_kb'] += rss - self.rss
+        if self.profiler is not None:
+            self.profiler.disable()
+            _profiling = False
+            self.profiler.dump_stats(os.path.join(_profile_dir,
+                '%s.%d.%d.prof' % (self.name, os.getpid(), record['calls'])))
+
+
+class _NoStage(object):
+    """Context doing nothing, when instrumentation is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_no_stage = _NoStage()
+
+
+def _new_record():
+    return {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak_rss_kb': 0,
+            'rss_growth_kb': 0, 'counters': dict()}
+
+
+def stage(name):
+    """Return a context recording a stage:
+        with instrument.stage('parse'):
+            ...
+    """
+    if _stats is None:
+        return _no_stage
+    return _Stage(name)
+
+
+def instrumented(name=None):
+    """Decorator recording every call of a function as a stage, named after
+    the function by default."""
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _stats is None:
+                return func(*args, **kwargs)
+            with _Stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    """Add n to a counter, of the innermost running stage too."""
+    if _stats is None:
+        return
+    _counters[name] = _counters.get(name, 0) + n
+    if _stack:
+        counters = _stats.setdefault(_stack[-1], _new_record())['counters']
+        counters[name] = counters.get(name, 0) + n
+
+
+def snapshot():
+    """Return the records as a dictionary, None when off."""
+    if _stats is None:
+        return None
+    return {'stages': _stats, 'counters': _counters}
+
+
+def merge(records):
+    """Add the records of another process, see snapshot."""
+    if _stats is None or records is None:
+        return
+    for name, other in records['stages'].iteritems():
+        record = _stats.setdefault(name, _new_record())
+        for key in ['calls', 'wall', 'cpu', 'rss_growth_kb']:
+            record[key] += other[key]
+        record['peak_rss_kb'] = max(record['peak_rss_kb'],
+                                    other['peak_rss_kb'])
+        for counter, n in other['counters'].iteritems():
+            record['counters'][counter] = record['counters'].get(counter,
+                                                                 0) + n
+    for counter, n in records['counters'].iteritems():
+        _counters[counter] = _counters.get(counter, 0) + n
+
+
+def report():
+    """Return the report: the whole run and the records."""
+    records = snapshot()
+    if records is None:
+        return None
+    records['argv'] = sys.argv
+    records['wall'] = time.time() - _start[0]
+    records['cpu'] = _cpu_time() - _start[1]
+    records['peak_rss_kb'] = peak_rss()
+    return records
+
+
+def summary(records):
+    """Return the one line summary of a report."""
+    stages = sorted(records['stages'].iteritems(),
+                    key=lambda item: -item[1]['wall'])
+    parts = ['%.2f s wall, %.2f s cpu, peak %.0f MB' %
+             (records['wall'], records['cpu'], records['peak_rss_kb'] / 1024.)]
+    if stages:
+        parts.append(', '.join('%s %.2f s' % (name, record['wall'])
+                               for name, record in stages[:4]))
+    if records['counters']:
+        parts.append(', '.join('%d %s' % (n, name) for name, n in
+                               sorted(records['counters'].iteritems())))
+    return 'instrument: ' + '; '.join(parts)
+
+
+def write_report():
+    """Write the report to the report path, if any, and print the one line
+    summary to stderr. Done at exit."""
+    records = report()
+    if records is None:
+        return
+    if _report_path is not None:
+        with open(_report_path, 'w') as f:
+            json.dump(records, f, indent=1, sort_keys=True)
+    sys.stderr.write(summary(records) + '\n')
+
+
+if os.environ.get('CP_UTILS_INSTRUMENT') or os.environ.get('CP_UTILS_PROFILE'):
+    enable(os.environ.get('CP_UTILS_INSTRUMENT') or None,
+           os.environ.get('CP_UTILS_PROFILE') or None)
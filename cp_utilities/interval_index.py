@@ -0,0 +1,133 @@
+"""
+Prefix sums of the reuse-distance profiles of a benchmark along the intervals.
+
+read_rddata_from_file sums the profiles of the intervals into profile ids
+while it parses, by offset and quantum_size, so another grouping meant
+parsing the file again. An IntervalIndex is built once from a Benchmark read
+with offset 0 and quantum_size 1, where profile id i is interval i. It keeps,
+for every thread, the cumulative frequencies of the intervals 1 to i for
+every distance of the thread, so the profile of any range of intervals is the
+difference of two rows, whatever the length of the range. regroup() returns
+the Benchmark that read_rddata_from_file returns for any offset and
+quantum_size, without reading the file.
+
+The rows are dense over the distances of the thread, a few tens for the bins
+of the Pin tool, so an index takes 8 bytes per interval, distance and hit
+type.
+"""
+import benchmark as bm
+import numpy as np
+
+
+class IntervalIndex(object):
+    """Cumulative profiles and total frequencies of all threads along the
+    intervals."""
+
+    def __init__(self, benchmark):
+        """Constructor
+
+        @param benchmark: Benchmark read with offset 0 and quantum_size 1
+        """
+        self.name = benchmark.name
+        self.num_threads = benchmark.num_threads
+        self.stack_type = benchmark.stack_type
+        self.num_sets = benchmark.num_sets
+        self.num_ways = benchmark.num_ways
+        profile_ids = [np.array(benchmark.get_profile_ids(t), np.int64)
+                       for t in xrange(self.num_threads)]
+        self.num_intervals = max([ids[-1] for ids in profile_ids if len(ids)]
+                                 or [0])
+        # per thread: the sorted distances, the intervals with a profile,
+        # and the cumulative frequencies, number of profiles in which every
+        # distance appears and total frequencies of the intervals 1 to i in
+        # row i
+        self.distances = list()
+        self.present = list()
+        self.frequencies = list()
+        self.appearances = list()
+        self.totals = list()
+        for t, ids in enumerate(profile_ids):
+            lengths, distances, frequencies = \
+                benchmark.get_rd_concatenated(t, ids)
+            all_distances, columns = np.unique(distances, return_inverse=True)
+            rows = np.repeat(ids, lengths)
+            shape = (self.num_intervals + 1, len(all_distances))
+            pdf = np.zeros(shape + frequencies.shape[1:], np.int64)
+            np.add.at(pdf, (rows, columns), frequencies)
+            appearances = np.zeros(shape, np.int32)
+            np.add.at(appearances, (rows, columns), 1)
+            totals = np.zeros(self.num_intervals + 1, np.int64)
+            totals[ids] = benchmark.get_total_freqs(t, ids)
+            present = np.zeros(self.num_intervals + 1, bool)
+            present[ids] = True
+            self.distances.append(all_distances)
+            self.present.append(present)
+            self.frequencies.append(pdf.cumsum(axis=0))
+            self.appearances.append(appearances.cumsum(axis=0))
+            self.totals.append(totals.cumsum())
+
+    def range_profiles(self, thread, firsts, lasts):
+        """Return the profiles of ranges of intervals of a thread.
+
+        Returns the distances of the thread, the frequencies of every range
+        as a matrix with one row per range and one column per distance, a
+        matrix of the distances which appear in every range and the total
+        frequencies of the ranges.
+
+        @param firsts, lasts: first and last intervals of the ranges
+        """
+        firsts = np.asarray(firsts, np.int64) - 1
+        lasts = np.asarray(lasts, np.int64)
+        frequencies = self.frequencies[thread]
+        appearances = self.appearances[thread]
+        totals = self.totals[thread]
+        return (self.distances[thread],
+                frequencies[lasts] - frequencies[firsts],
+                appearances[lasts] > appearances[firsts],
+                totals[lasts] - totals[firsts])
+
+    def range_profile(self, thread, first, last):
+        """Return the sorted distances and the frequencies of the profile of
+        intervals first to last of a thread, and its total frequency."""
+        distances, frequencies, appear, totals = \
+            self.range_profiles(thread, [first], [last])
+        return (distances[appear[0]], frequencies[0][appear[0]],
+                totals.item(0))
+
+    def group_ends(self, offset=0, quantum_size=1):
+        """Return the last intervals of the profile ids of
+        read_rddata_from_file: 1 to offset, then every quantum_size
+        intervals (every quantum_size intervals from 1 for offset 0). The
+        intervals after the last one are the last profile id."""
+        first = offset if offset > 0 else quantum_size
+        return np.arange(first, self.num_intervals + 1, quantum_size)
+
+    def regroup(self, offset=0, quantum_size=1):
+        """Return a Benchmark with the profiles read_rddata_from_file reads
+        for offset and quantum_size.
+
+        A thread without a profile at the end of a group carries the group
+        over to the next one, as read_rddata_from_file does.
+        """
+        benchmark = bm.Benchmark(self.name, self.num_threads,
+                                 self.stack_type, self.num_sets,
+                                 self.num_ways)
+        ends = self.group_ends(offset, quantum_size)
+        for t in xrange(self.num_threads):
+            saved = self.present[t][ends]
+            profile_ids = np.flatnonzero(saved) + 1
+            lasts = ends[saved]
+            if not len(lasts) or lasts[-1] < self.num_intervals:
+                profile_ids = np.append(profile_ids, len(ends) + 1)
+                lasts = np.append(lasts, self.num_intervals)
+            firsts = np.concatenate(([1], lasts[:-1] + 1))
+            distances, frequencies, appear, totals = \
+                self.range_profiles(t, firsts, lasts)
+            for k, profile_id in enumerate(profile_ids.tolist()):
+                if profile_id > len(ends) and not appear[k].any():
+                    continue  # the rest has no profile
+                benchmark.set_rd_arrays(t, profile_id, distances[appear[k]],
+                                        frequencies[k][appear[k]],
+                                        totals.item(k))
+        benchmark.compact()
+        return benchmark
@@ -0,0 +1,124 @@
+"""
+Memoizes partition decisions over intervals with similar miss curves.
+
+When an interval's frequency vs capacity cdfs look like ones which have
+already been solved, the best partition found for those can be reused. The
+signature of an interval is the concatenation of the per-thread cdfs (and the
+shared cdfs for the hybrid case), all divided by the total of the interval
+over the threads and quantized. The solver weighs the gain of one thread
+against the loss of the others, so the signature keeps the relative volume of
+the threads, only a common scale is dropped. A
+locality-sensitive hash (random projections on a reduced number of capacity
+points per thread) finds the candidates, and a candidate is accepted if no
+point of its signature differs by more than the tolerance.
+
+With verify set, the solver is still run on every hit to measure how much
+the reused decisions lose, the number of mismatched allocations and the
+extra misses they cause.
+"""
+import numpy as np
+
+
+class PartitionMemo(object):
+    """Nearest-neighbor index of solved intervals."""
+
+    def __init__(self, tolerance=0.02, dims=8, num_tables=8,
+                 hashes_per_table=4, verify=False, seed=0):
+        """Constructor
+
+        @param tolerance: max difference of any normalized cdf point, as a
+        fraction of the references of the interval
+        @param dims: capacity points per thread used for hashing
+        @param num_tables: number of hash tables
+        @param hashes_per_table: projections per hash table
+        @param verify: solve hits too, to measure the accuracy loss
+        @param seed: seed for the random projections
+        """
+        self.tolerance = tolerance
+        self.dims = dims
+        self.num_tables = num_tables
+        self.hashes_per_table = hashes_per_table
+        self.verify = verify
+        self.seed = seed
+        self.projections = None
+        self.buckets = dict()
+        self.lookups = self.hits = 0
+        self.verified = self.mismatches = self.extra_misses = 0
+
+    def signature(self, benchmark, profile_id, shared_profile=None):
+        """Return the quantized signature of an interval."""
+        profiles = [benchmark]
+        if shared_profile is not None:
+            profiles.append(shared_profile)
+        rows = np.array([profile.get_freq_cdf(t, profile_id)
+            for profile in profiles for t in xrange(profile.num_threads)],
+            dtype=float)
+        total = rows[:, -1].sum()
+        if total > 0:
+            rows /= total
+        quantum = self.tolerance / 2.0
+        return np.round(rows / quantum) * quantum
+
+    def _hashes(self, signature):
+        """Return the bucket keys of a signature, one per table."""
+        points = signature.shape[1]
+        reduced = signature[:, np.linspace(0, points - 1,
+            min(self.dims, points)).astype(int)].ravel()
+        if self.projections is None:
+            rng = np.random.RandomState(self.seed)
+            size = self.num_tables * self.hashes_per_table
+            self.projections = rng.normal(size=(size, len(reduced)))
+            self.width = 4.0 * self.tolerance * np.sqrt(len(reduced))
+            self.offsets = rng.uniform(0, self.width, size=size)
+        hashes = np.floor((np.dot(self.projections, reduced) + self.offsets)
+                          / self.width).astype(np.int64)
+        hashes = hashes.reshape(self.num_tables, self.hashes_per_table)
+        return [(table,) + tuple(h) for table, h in enumerate(hashes)]
+
+    def lookup(self, signature, preferred_t):
+        """Return the cached allocation for the preferred thread of the
+        nearest signature within tolerance, or None."""
+        self.lookups += 1
+        best = None
+        best_distance = self.tolerance
+        for key in self._hashes(signature):
+            for cached, allocs in self.buckets.get(key, ()):
+                if preferred_t not in allocs:
+                    continue
+                distance = np.abs(cached - signature).max()
+                if distance <= best_distance:
+                    best, best_distance = allocs[preferred_t], distance
+        if best is not None:
+            self.hits += 1
+        return best
+
+    def insert(self, signature, preferred_t, alloc):
+        """Cache the allocation of the preferred thread for a signature."""
+        keys = self._hashes(signature)
+        for cached, allocs in self.buckets.get(keys[0], ()):
+            if np.array_equal(cached, signature):
+                allocs[preferred_t] = alloc
+                return
+        entry = (signature, {preferred_t: alloc})
+        for key in keys:
+            self.buckets.setdefault(key, list()).append(entry)
+
+    def record(self, benchmark, preferred_t, profile_id, cached, solved):
+        """Record the accuracy of a cached allocation against the solved
+        one."""
+        self.verified += 1
+        if cached != solved:
+            self.mismatches += 1
+            self.extra_misses += (
+                benchmark.allocation_misses(preferred_t, profile_id, cached) -
+                benchmark.allocation_misses(preferred_t, profile_id, solved))
+
+    def report(self):
+        """Return the hit rate and the accuracy loss."""
+        hit_rate = self.hits / float(self.lookups) if self.lookups else 0.0
+        return {'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': hit_rate,
+                'verified': self.verified,
+                'mismatches': self.mismatches,
+                'extra_misses': self.extra_misses}
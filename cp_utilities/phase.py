@@ -0,0 +1,103 @@
+"""
+Online detection of phase changes across the intervals of a benchmark.
+
+Most consecutive intervals have nearly identical reuse-distance signatures.
+The detector keeps the centroid of the current phase and compares every new
+interval against it; a new phase starts when the distance crosses a
+threshold. The solvers then only need to recompute at phase boundaries and can
+reuse their previous decision inside a phase.
+
+The signature of a thread is its reuse-distance cdf over log2(distance + 1)
+bins, normalized to 1. Two metrics are supported, taken as the maximum over
+threads:
+    l1: sum of the absolute differences of the cdfs, ie. the earth mover's
+        distance in log2 bins. Default threshold 0.5.
+    js: Jensen-Shannon divergence (base 2) of the distributions, in [0, 1].
+        Default threshold 0.1.
+"""
+import numpy as np
+
+
+_NUM_BINS = 64  # log2 of the largest distance is 62
+
+
+def log2_cdfs(benchmark, profile_id, num_bins=_NUM_BINS):
+    """Return the normalized cdfs of all threads for a profile id, one row
+    per thread."""
+    cdfs = np.zeros((benchmark.num_threads, num_bins))
+    for t in xrange(benchmark.num_threads):
+        distances, frequencies = benchmark.get_rd_arrays(t, profile_id)
+        if frequencies.ndim == 2:
+            frequencies = frequencies.sum(axis=1)
+        bins = np.floor(np.log2(distances + 1)).astype(np.int64)
+        cdf = np.cumsum(np.bincount(bins, weights=frequencies,
+                                    minlength=num_bins))
+        if len(cdf) and cdf[-1] > 0:
+            cdfs[t] = cdf / cdf[-1]
+    return cdfs
+
+
+def _l1(cdfs, centroid):
+    return np.abs(cdfs - centroid).sum(axis=1).max()
+
+
+def _pdfs(cdfs):
+    """Return the distributions of the cdfs, bin 0 included."""
+    zeros = np.zeros((len(cdfs), 1))
+    return np.diff(np.hstack((zeros, cdfs)), axis=1)
+
+
+def _js(cdfs, centroid):
+    p = _pdfs(cdfs)
+    q = _pdfs(centroid)
+    m = 0.5 * (p + q)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kl_p = np.where(p > 0, p * np.log2(p / m), 0.0).sum(axis=1)
+        kl_q = np.where(q > 0, q * np.log2(q / m), 0.0).sum(axis=1)
+    return (0.5 * (kl_p + kl_q)).max()
+
+
+_metrics = {'l1': _l1, 'js': _js}
+_default_thresholds = {'l1': 0.5, 'js': 0.1}
+
+
+class PhaseDetector(object):
+    """Streaming change-point detector over per-thread cdfs."""
+
+    def __init__(self, threshold=None, metric='l1'):
+        """Constructor"""
+        assert metric in _metrics, "metric has to be l1 or js"
+        if threshold is None:
+            threshold = _default_thresholds[metric]
+        self.threshold = threshold
+        self.distance = _metrics[metric]
+        self.centroid_sum = None
+        self.phase_length = 0
+
+    def update(self, cdfs):
+        """Add the cdfs (threads x bins) of the next interval.
+
+        Return True if the interval starts a new phase.
+        """
+        if self.centroid_sum is not None:
+            centroid = self.centroid_sum / self.phase_length
+            if self.distance(cdfs, centroid) <= self.threshold:
+                self.centroid_sum += cdfs
+                self.phase_length += 1
+                return False
+        self.centroid_sum = np.array(cdfs, dtype=float)
+        self.phase_length = 1
+        return True
+
+
+def phase_boundaries(benchmark, threshold=None, metric='l1',
+                     profile_ids=None):
+    """Return the profile ids that start a new phase, in order.
+
+    The first profile id always starts a phase.
+    """
+    if profile_ids is None:
+        profile_ids = benchmark.get_profile_ids()
+    detector = PhaseDetector(threshold, metric)
+    return [profile_id for profile_id in profile_ids
+            if detector.update(log2_cdfs(benchmark, profile_id))]
@@ -3,24 +3,38 @@ Created on Oct 28, 2011
 
 @author: pana
 '''
+import benchmark
 import figure as fig
-import numpy as np
 
-def plot_mr_v_interval(benchmarks, filename, same_axis=True):
-    """ Plot miss rate vs interval for benchmarks. """
-    if same_axis: 
-        subplots = 1
-        new_style = True
-    else:   
-        subplots = len(benchmarks)
-        new_style = False
+def plot_mr_v_interval(benchmarks, filename, capacities=None, same_axis=True):
+    """ Plot miss rate vs interval for benchmarks.
+
+    One subplot per capacity, see Benchmark.miss_rates. With same_axis the
+    threads of all the benchmarks share the subplot of a capacity, otherwise
+    every benchmark has its own subplot per capacity.
+    """
+    if capacities is None:
+        capacities = benchmark._cache_capacities
+    rates = [new_bm.miss_rates(capacities) for new_bm in benchmarks]
+    groups = [range(len(benchmarks))] if same_axis else \
+        [[b] for b in xrange(len(benchmarks))]
+    subplots = len(groups) * len(capacities)
     figure = fig.Figure(filename, title="Miss Rate vs Intervals",
-                        num_subplots=subplots)
-    for bm in benchmarks:
-        bm.plot_mr_v_interval(figure, new_style)
-        
-    figure.save()
-    figure.close()
+                        total_subplots=subplots,
+                        subplots_per_page=min(2, subplots))
+    for group in groups:
+        for k, c in enumerate(capacities):
+            plot_data = list()
+            labels = list()
+            for b in group:
+                profile_ids, miss_rates = rates[b]
+                for t in xrange(benchmarks[b].num_threads):
+                    plot_data.extend([profile_ids, 100 * miss_rates[t, :, k]])
+                    labels.append(benchmarks[b].name + ' thread ' + str(t))
+            figure.add_plot(same_axis, labels, 'Interval', 'Miss rate (%)',
+                            'Capacity: ' + str(c), None, *plot_data,
+                            line_plot=True)
+    figure.save_and_close()
 
 if __name__ == '__main__':
     pass
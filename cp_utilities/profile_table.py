@@ -0,0 +1,404 @@
+"""
+Compact tables of the per-interval data of a Benchmark.
+
+For every thread a Benchmark holds a reuse distance profile, a total
+frequency and a frequency vs capacity cdf per profile id. Held as dicts of
+strings and lists of Python ints, hundreds of thousands of intervals take
+gigabytes. These tables hold them in contiguous numpy arrays instead: a
+profile id indexes a row through an array which starts at the lowest profile
+id of the table, so a table of a chunk of intervals late in a run is as small
+as one of the first chunk. The arrays double their capacity when full, so
+appending is amortized O(1); compact() releases the spare capacity once a
+table is filled.
+
+    ValueTable: one number per profile id (total frequencies)
+    RowTable: one row of a fixed length per profile id (cdfs)
+    ProfileTable: one profile per profile id, the sorted distances (as
+        indexes of the distinct distances) and their frequencies concatenated
+        for all profile ids (compressed sparse rows)
+
+to_arrays and from_arrays turn a table into its arrays and back, for
+shared.py to share them between processes.
+
+The tables are mappings from profile id which iterate in ascending id
+order, so code written for the dicts keeps working, but an item is built on
+access: a ProfileTable returns the dict of '%.2f' distance strings to
+frequency strings (lists of strings for hit types) which
+Benchmark.get_rd_profile has always returned, a RowTable a list of ints and a
+ValueTable an int. Changing the returned objects does not change the table.
+The array methods return the stored numbers without conversion to Python
+objects.
+"""
+import numpy as np
+
+
+_int32_max = np.iinfo(np.int32).max
+
+
+def _grow(array, size, fill=None):
+    """Return the array, or a copy of it with room for at least size rows
+    along the first axis, the new rows set to fill if given."""
+    if size <= len(array):
+        return array
+    grown = np.empty((max(size, 2 * len(array), 16),) + array.shape[1:],
+                     array.dtype)
+    grown[:len(array)] = array
+    if fill is not None:
+        grown[len(array):] = fill
+    return grown
+
+
+def _trim(array, size):
+    """Return the array, or a copy of its first size rows if it has more."""
+    if len(array) == size:
+        return array
+    return array[:size].copy()
+
+
+class _IdTable(object):
+    """Rows indexed by non-negative profile ids: _rows[profile_id - _base] is
+    the row of a profile id, -1 for an id without one."""
+    __slots__ = ('_rows', '_num_rows', '_base')
+
+    def __init__(self):
+        self._rows = np.empty(0, np.int64)
+        self._num_rows = 0
+        self._base = 0
+
+    def _row(self, profile_id):
+        index = profile_id - self._base
+        if 0 <= index < len(self._rows):
+            row = self._rows.item(index)
+            if row >= 0:
+                return row
+        raise KeyError(profile_id)
+
+    def _new_row(self, profile_id):
+        """Return the row of a profile id, allocating it if needed."""
+        if profile_id in self:
+            return self._rows.item(profile_id - self._base)
+        assert profile_id >= 0, "profile ids are non-negative"
+        if self._num_rows == 0:
+            self._base = int(profile_id)
+            self._rows[:] = -1
+        elif profile_id < self._base:
+            # grow downwards, doubling as upwards
+            base = int(max(0, min(profile_id,
+                                  self._base - len(self._rows))))
+            rows = np.empty(self._base - base + len(self._rows), np.int64)
+            rows[:self._base - base] = -1
+            rows[self._base - base:] = self._rows
+            self._rows, self._base = rows, base
+        self._rows = _grow(self._rows, profile_id - self._base + 1, fill=-1)
+        row = self._num_rows
+        self._rows[profile_id - self._base] = row
+        self._num_rows += 1
+        return row
+
+    def rows(self, profile_ids):
+        """Return the rows of profile ids as an array."""
+        index = np.asarray(profile_ids, np.int64) - self._base
+        if len(index) and (index.min() < 0 or
+                           index.max() >= len(self._rows)):
+            raise KeyError(profile_ids)
+        rows = self._rows[index]
+        if (rows < 0).any():
+            raise KeyError(index[rows < 0] + self._base)
+        return rows
+
+    def ids(self):
+        """Return the profile ids, ascending, as an array."""
+        return np.flatnonzero(self._rows >= 0) + self._base
+
+    def __len__(self):
+        return self._num_rows
+
+    def __contains__(self, profile_id):
+        index = profile_id - self._base
+        return (0 <= index < len(self._rows) and
+                self._rows.item(index) >= 0)
+
+    def __iter__(self):
+        return iter(self.ids().tolist())
+
+    def keys(self):
+        return self.ids().tolist()
+
+    def iterkeys(self):
+        return iter(self)
+
+    def iteritems(self):
+        for profile_id in self:
+            yield profile_id, self[profile_id]
+
+    def items(self):
+        return list(self.iteritems())
+
+    def get(self, profile_id, default=None):
+        if profile_id in self:
+            return self[profile_id]
+        return default
+
+    def compact(self):
+        """Release the capacity kept for appending."""
+        ids = self.ids()
+        if not len(ids):
+            self._rows, self._base = np.empty(0, np.int64), 0
+        elif ids[0] != self._base or len(self._rows) != ids[-1] - ids[0] + 1:
+            self._rows = self._rows[ids[0] - self._base:
+                                    ids[-1] - self._base + 1].copy()
+            self._base = int(ids[0])
+
+    def _slots(self):
+        return [name for cls in type(self).__mro__
+                for name in getattr(cls, '__slots__', ())]
+
+    def to_arrays(self):
+        """Return the state of the table as a dict of arrays and ints, see
+        from_arrays."""
+        return dict((name, getattr(self, name)) for name in self._slots()
+                    if getattr(self, name) is not None)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Return a table on the arrays of to_arrays, without copying them:
+        arrays mapped from a file (mmap_mode 'c') are shared until the table
+        changes them."""
+        table = cls()
+        for name, value in arrays.iteritems():
+            if isinstance(value, np.ndarray):
+                value = np.asarray(value)
+            setattr(table, name, value)
+        return table
+
+
+class ValueTable(_IdTable):
+    """One integer per profile id."""
+    __slots__ = ('_values',)
+
+    def __init__(self):
+        _IdTable.__init__(self)
+        self._values = np.empty(0, np.int64)
+
+    def __setitem__(self, profile_id, value):
+        row = self._new_row(profile_id)
+        self._values = _grow(self._values, row + 1)
+        self._values[row] = value
+
+    def __getitem__(self, profile_id):
+        return self._values.item(self._row(profile_id))
+
+    def array(self, profile_ids=None):
+        """Return the values of profile ids, by default all ascending."""
+        if profile_ids is None:
+            profile_ids = self.ids()
+        return self._values[self.rows(profile_ids)]
+
+    def compact(self):
+        _IdTable.compact(self)
+        self._values = _trim(self._values, self._num_rows)
+
+    def nbytes(self):
+        return self._rows.nbytes + self._values.nbytes
+
+
+class RowTable(_IdTable):
+    """One row of integers of a fixed length per profile id."""
+    __slots__ = ('_data',)
+
+    def __init__(self):
+        _IdTable.__init__(self)
+        self._data = None
+
+    def __setitem__(self, profile_id, values):
+        values = np.asarray(values, np.int64)
+        if self._data is None:
+            self._data = np.empty((0, len(values)), np.int64)
+        assert values.shape == self._data.shape[1:], \
+            "rows of a table have the same length"
+        row = self._new_row(profile_id)
+        self._data = _grow(self._data, row + 1)
+        self._data[row] = values
+
+    def set_rows(self, profile_ids, matrix):
+        """Set the rows of many profile ids at once, one row of the matrix
+        per profile id."""
+        matrix = np.asarray(matrix, np.int64)
+        if self._data is None:
+            self._data = np.empty((0, matrix.shape[1]), np.int64)
+        assert matrix.shape[1:] == self._data.shape[1:], \
+            "rows of a table have the same length"
+        rows = np.array([self._new_row(profile_id)
+                         for profile_id in profile_ids], np.int64)
+        if len(rows):
+            self._data = _grow(self._data, rows.max() + 1)
+            self._data[rows] = matrix
+
+    def __getitem__(self, profile_id):
+        return self.row(profile_id).tolist()
+
+    def row(self, profile_id):
+        """Return the row of a profile id as an array."""
+        return self._data[self._row(profile_id)]
+
+    def value(self, profile_id, column):
+        """Return one element of the row of a profile id."""
+        return self._data.item(self._row(profile_id), column)
+
+    def array(self, profile_ids=None):
+        """Return the rows of profile ids, by default all ascending, as a
+        matrix."""
+        if profile_ids is None:
+            profile_ids = self.ids()
+        rows = self.rows(profile_ids)
+        if self._data is None:
+            return np.zeros((0, 0), np.int64)
+        return self._data[rows]
+
+    def compact(self):
+        _IdTable.compact(self)
+        if self._data is not None:
+            self._data = _trim(self._data, self._num_rows)
+
+    def nbytes(self):
+        return self._rows.nbytes + (0 if self._data is None else
+                                    self._data.nbytes)
+
+
+class ProfileTable(_IdTable):
+    """One reuse distance profile per profile id: sorted distances and their
+    frequencies, one column per hit type for profiles grouped by hit type.
+
+    The profiles of a program use the same few hundred distances over and
+    over, so every distinct distance is stored once and the profiles hold
+    its index. The frequencies are int32 until one does not fit.
+
+    Setting the profile of a profile id again appends the new one, the
+    space of the old one is not reused.
+    """
+    __slots__ = ('_starts', '_ends', '_distinct', '_order', '_codes',
+                 '_frequencies', '_size')
+
+    def __init__(self):
+        _IdTable.__init__(self)
+        self._starts = np.empty(0, np.int64)
+        self._ends = np.empty(0, np.int64)
+        self._distinct = np.empty(0, np.float64)
+        self._order = np.empty(0, np.int64)
+        self._codes = np.empty(0, np.int32)
+        self._frequencies = None
+        self._size = 0
+
+    def __setitem__(self, profile_id, rd_profile):
+        """Set a profile from a dict of distances to frequencies, both
+        strings or numbers. The frequencies of the distances equal to two
+        decimals are added."""
+        distances = np.array(map(float, rd_profile.iterkeys()), np.float64)
+        values = rd_profile.values()
+        if values and isinstance(values[0], list):
+            frequencies = np.array([map(int, x) for x in values], np.int64)
+        else:
+            frequencies = np.array(map(int, values), np.int64)
+        # the distances are kept to two decimals, as the '%.2f' keys
+        distances = np.round(distances, 2)
+        order = distances.argsort(kind='mergesort')
+        distances, frequencies = distances[order], frequencies[order]
+        if len(distances) > 1 and (distances[1:] == distances[:-1]).any():
+            distances, index = np.unique(distances, return_inverse=True)
+            merged = np.zeros((len(distances),) + frequencies.shape[1:],
+                              np.int64)
+            np.add.at(merged, index, frequencies)
+            frequencies = merged
+        self.set_arrays(profile_id, distances, frequencies)
+
+    def _encode(self, distances):
+        """Return the indexes of distances in the distinct distances, adding
+        the new ones."""
+        known = self._distinct[self._order]
+        position = np.searchsorted(known, distances)
+        found = position < len(known)
+        found[found] = known[position[found]] == distances[found]
+        if not found.all():
+            self._distinct = np.concatenate(
+                (self._distinct, np.unique(distances[~found])))
+            self._order = self._distinct.argsort(kind='mergesort')
+            known = self._distinct[self._order]
+            position = np.searchsorted(known, distances)
+        return self._order[position]
+
+    def set_arrays(self, profile_id, distances, frequencies):
+        """Set a profile from its sorted distances and their frequencies."""
+        length = len(distances)
+        if length:
+            frequencies = np.asarray(frequencies, np.int64)
+            if self._frequencies is None:
+                self._frequencies = np.empty((0,) + frequencies.shape[1:],
+                                             np.int32)
+            assert frequencies.shape[1:] == self._frequencies.shape[1:], \
+                "profiles of a table have the same hit types"
+            if (self._frequencies.dtype != np.int64 and
+                    np.abs(frequencies).max() > _int32_max):
+                self._frequencies = self._frequencies.astype(np.int64)
+            end = self._size + length
+            self._codes = _grow(self._codes, end)
+            self._frequencies = _grow(self._frequencies, end)
+            self._codes[self._size:end] = self._encode(
+                np.asarray(distances, np.float64))
+            self._frequencies[self._size:end] = frequencies
+        row = self._new_row(profile_id)
+        self._starts = _grow(self._starts, row + 1)
+        self._ends = _grow(self._ends, row + 1)
+        self._starts[row] = self._size
+        self._size += length
+        self._ends[row] = self._size
+
+    def arrays(self, profile_id):
+        """Return the sorted distances of a profile and their
+        frequencies."""
+        row = self._row(profile_id)
+        start, end = self._starts.item(row), self._ends.item(row)
+        if self._frequencies is None:
+            return np.zeros(0, np.float64), np.zeros(0, np.int32)
+        return (self._distinct[self._codes[start:end]],
+                self._frequencies[start:end])
+
+    def concatenated(self, profile_ids=None):
+        """Return the profiles of profile ids (by default all, ascending)
+        one after the other: the length of every profile, the distances and
+        the frequencies."""
+        if profile_ids is None:
+            profile_ids = self.ids()
+        rows = self.rows(profile_ids)
+        starts = self._starts[rows]
+        lengths = self._ends[rows] - starts
+        # index of every element: the start of its profile plus its rank in
+        # the profile
+        index = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + \
+            np.arange(lengths.sum())
+        if self._frequencies is None:
+            return lengths, np.zeros(0, np.float64), np.zeros(0, np.int32)
+        return (lengths, self._distinct[self._codes[index]],
+                self._frequencies[index])
+
+    def __getitem__(self, profile_id):
+        distances, frequencies = self.arrays(profile_id)
+        keys = ['%.2f' % x for x in distances.tolist()]
+        if frequencies.ndim == 2:
+            values = [[str(f) for f in x] for x in frequencies.tolist()]
+        else:
+            values = [str(f) for f in frequencies.tolist()]
+        return dict(zip(keys, values))
+
+    def compact(self):
+        _IdTable.compact(self)
+        self._starts = _trim(self._starts, self._num_rows)
+        self._ends = _trim(self._ends, self._num_rows)
+        self._codes = _trim(self._codes, self._size)
+        if self._frequencies is not None:
+            self._frequencies = _trim(self._frequencies, self._size)
+
+    def nbytes(self):
+        return (self._rows.nbytes + self._starts.nbytes + self._ends.nbytes +
+                self._distinct.nbytes + self._order.nbytes +
+                self._codes.nbytes +
+                (0 if self._frequencies is None else self._frequencies.nbytes))
@@ -0,0 +1,121 @@
+"""
+Leveled logging and rate-limited progress reports of the long loops.
+
+The messages go through the 'cp_utilities' logger of the logging module. If
+the application has not configured logging, they are written to stderr, at
+the level given by the CP_UTILS_LOG environment variable (debug, info,
+warning or error, default info). Per-interval messages are debug messages,
+off by default; a loop guards them with debug_enabled() so that they cost
+nothing when they are off:
+    debug = progress.debug_enabled()
+    ...
+    if debug: progress.log.debug("to save %d %d", interval, profile_id)
+
+A Progress reports the throughput of a loop and its estimated time to
+completion at the info level, at most every few seconds, and a last line
+when the loop is done. When info messages are off, update() only adds to
+the counts.
+"""
+import logging
+import os
+import sys
+import time
+
+
+log = logging.getLogger('cp_utilities')
+_period = 5.0
+
+
+def _configure():
+    """Write to stderr when the application did not configure logging."""
+    if log.handlers or logging.getLogger().handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+    log.addHandler(handler)
+    log.propagate = False
+    level = os.environ.get('CP_UTILS_LOG', 'info').upper()
+    log.setLevel(getattr(logging, level, logging.INFO))
+
+
+def debug_enabled():
+    """Return True if debug messages are written."""
+    return log.isEnabledFor(logging.DEBUG)
+
+
+def _duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return '%dh%02dm' % (hours, minutes)
+    if minutes:
+        return '%dm%02ds' % (minutes, seconds)
+    return '%ds' % seconds
+
+
+class Progress(object):
+    """Throughput and estimated time to completion of a loop."""
+
+    def __init__(self, what, total=None, unit='intervals', period=None):
+        """Constructor
+
+        @param what: name of the loop in the messages
+        @param total: number of units of the loop, if known, for the ETA
+        @param unit: name of the units counted by update
+        @param period: minimal seconds between two reports
+        """
+        self.what = what
+        self.total = total
+        self.unit = unit
+        self.period = _period if period is None else period
+        self.enabled = log.isEnabledFor(logging.INFO)
+        self.done_units = 0
+        self.counts = dict()
+        self.start = time.time()
+        self.next_report = self.start + self.period
+
+    def update(self, n=1, **counts):
+        """Count n units done, and other quantities (such as tokens=...)
+        for their throughput."""
+        self.done_units += n
+        for name, value in counts.iteritems():
+            self.counts[name] = self.counts.get(name, 0) + value
+        if self.enabled and time.time() >= self.next_report:
+            self.report()
+
+    def set(self, done_units, **counts):
+        """Set the units done and the other quantities, as totals."""
+        self.done_units = done_units
+        self.counts.update(counts)
+        if self.enabled and time.time() >= self.next_report:
+            self.report()
+
+    def report(self, final=False):
+        """Log the progress now."""
+        now = time.time()
+        self.next_report = now + self.period
+        elapsed = max(now - self.start, 1e-9)
+        parts = list()
+        if self.total and not final:
+            parts.append('%d/%d %s' % (self.done_units, self.total,
+                                        self.unit))
+        else:
+            parts.append('%d %s' % (self.done_units, self.unit))
+        parts.append('%.0f %s/s' % (self.done_units / elapsed, self.unit))
+        parts.extend('%.0f %s/s' % (value / elapsed, name)
+                     for name, value in sorted(self.counts.iteritems()))
+        if final:
+            parts.append('in %s' % _duration(elapsed))
+        elif self.total and self.done_units:
+            remaining = (self.total - self.done_units) * elapsed / \
+                self.done_units
+            parts.append('ETA %s' % _duration(remaining))
+        log.info('%s: %s', self.what, ', '.join(parts))
+
+    def done(self):
+        """Log the final throughput, if the loop reported before."""
+        if self.enabled and time.time() - self.start >= self.period:
+            self.report(final=True)
+
+
+_configure()
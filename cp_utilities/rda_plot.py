@@ -36,7 +36,9 @@ OPTIONS
         Size of intervals each quantum in round robin partitioning
 
     filter_capacity
-        Capacity of the reuse distance filter, if any. Optional
+        Capacity of the reuse distance filter, if any. Optional. All the
+        distances below it are dropped, see rda_trace_plot.py to simulate the
+        filter cache on an address trace instead.
                        
 EXAMPLES
     ./rda_plot.py  blackscholes inter_rda_blackscholes_large_4_5mil.out 4 0
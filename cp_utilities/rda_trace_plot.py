@@ -0,0 +1,95 @@
+#! /usr/bin/env python
+"""Plots reuse distance signatures for each interval of a filtered trace.
+
+NAME
+    rda_trace_plot.py
+
+SYNOPSYS
+    ./rda_trace_plot.py benchmark trace_file num_threads offset quantum_size
+    filter_capacity [filter_ways]
+
+DESCRIPTION
+    Given an address trace of a benchmark, runs it through a modeled LRU
+    filter cache per thread (such as an L1 in front of the L2 being studied),
+    computes the reuse distance signatures of the references which miss in
+    the filter and plots the signature for each interval in a subplot, like
+    rda_plot.py. Outputs one file per thread.
+
+OPTIONS
+    benchmark
+        Benchmark name
+
+    trace_file
+        Address trace of the benchmark, see filter_cache.py for the format.
+
+    num_threads
+        Number of threads.
+
+    offset
+        Offset after which partitioning started while this trace was
+        collected
+
+    quantum_size
+        Size of intervals each quantum in round robin partitioning
+
+    filter_capacity
+        Capacity of the filter cache in blocks.
+
+    filter_ways
+        Associativity of the filter cache. Optional, 0 (default) means fully
+        associative.
+
+EXAMPLES
+    ./rda_trace_plot.py blackscholes trace_blackscholes_large_4_5mil.out 4 0 1
+    512 8
+
+NOTES
+    Only private stacks are computed: the trace lists the accesses of an
+    interval thread by thread, so there is no hybrid mode.
+
+AUTHOR
+    Abhisek Pan, pana@purdue.edu
+
+LICENSE
+    Copyright (C) 2012  Abhisek Pan, Purdue University. All rights reserved.
+
+    This file is distributed under the University of Illinois/NCSA Open Source
+    License.
+    You can obtain a soft copy of the license either by visiting
+    http://otm.illinois.edu/uiuc_openSource, or by mailing pana@purdue.edu.
+
+VERSION
+    1.0
+"""
+
+import sys
+import benchmark as bm
+
+
+def rda_trace_plot():
+    """Plot the filtered rd signature for the benchmark given as input."""
+    #=======================================================================
+    # command line processing
+    #=======================================================================
+    if not(7 <= len(sys.argv) <= 8):
+        sys.stdout.write("Incorrect number of arguments. Program description:\n"
+                         + __doc__)
+        sys.exit(1)
+    benchmark = sys.argv[1]
+    trace_file = sys.argv[2]
+    num_threads = int(sys.argv[3])
+    offset = int(sys.argv[4])
+    quantum_size = int(sys.argv[5])
+    filter_capacity = int(sys.argv[6])
+    filter_ways = 0
+    if len(sys.argv) == 8: filter_ways = int(sys.argv[7])
+    stack_type = None
+    new_bm = bm.Benchmark(benchmark, num_threads, stack_type)
+    new_bm.read_trace_from_file(trace_file, num_threads, filter_capacity,
+                                filter_ways, offset, quantum_size)
+    new_bm.plot_rd_profiles(new_style=False)
+    sys.stderr.write("my work is done here\n")
+
+
+if __name__ == '__main__':
+    rda_trace_plot()
@@ -0,0 +1,69 @@
+"""
+Schedules independent rendering jobs on a pool of processes.
+
+Rendering a figure with matplotlib (and LaTeX) takes most of the time of a
+plotting script, and the files for different threads are independent. Each
+job builds and saves its own figure.Figure, so every worker process has its
+own matplotlib backend state.
+
+The workers are forked after the jobs are registered, so they inherit the
+parsed profiles of the Benchmark from the parent process: only the index of
+a job is sent to a worker and nothing large is pickled. On platforms without
+fork the jobs are run one after another.
+"""
+import instrument
+import multiprocessing as mp
+import os
+import sys
+
+
+_jobs = None
+
+
+def _init_worker():
+    """Give a worker its own font handles.
+
+    FreeType reads fonts through file handles which a forked worker shares
+    with its parent, so the cached fonts inherited from the parent are
+    dropped.
+    """
+    font_manager = sys.modules.get('matplotlib.font_manager')
+    font_cache = getattr(font_manager, '_get_font', None)
+    if hasattr(font_cache, 'cache_clear'):
+        font_cache.cache_clear()
+
+
+def _run_job(index):
+    """Run a registered job in a worker, return the instrumentation records
+    of the job (see instrument.py)."""
+    func, args, kwargs = _jobs[index]
+    if instrument.enabled():
+        instrument.reset()
+    func(*args, **kwargs)
+    return instrument.snapshot()
+
+
+def run_jobs(jobs, processes=None):
+    """Run rendering jobs, in parallel if possible.
+
+    @param jobs: list of (callable, args, kwargs)
+    @param processes: number of worker processes, default is the number of
+    cores. 1 runs the jobs in this process.
+    """
+    global _jobs
+    if processes is None:
+        processes = mp.cpu_count()
+    processes = min(processes, len(jobs))
+    if processes <= 1 or not hasattr(os, 'fork'):
+        for func, args, kwargs in jobs:
+            func(*args, **kwargs)
+        return
+    _jobs = jobs
+    pool = mp.Pool(processes, initializer=_init_worker)
+    try:
+        for records in pool.map(_run_job, xrange(len(jobs)), chunksize=1):
+            instrument.merge(records)
+    finally:
+        pool.close()
+        pool.join()
+        _jobs = None
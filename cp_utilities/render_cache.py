@@ -0,0 +1,98 @@
+"""
+Content-addressed names for rendered plots, to skip the unchanged ones.
+
+The name of a plot file ends with a digest of everything it is drawn from:
+the plotted data, the plot parameters and the render quality. A manifest in
+the output directory maps the name of every plot without the digest to the
+file last rendered for it. When a plot is requested again with the same
+digest and its file is there, rendering is skipped; when the digest changed,
+the new file replaces the old one. The granularity is a file: the pages of a
+PDF cannot be replaced one by one, so the plots which are split in one file
+per thread only render the threads which changed.
+
+The default render quality is kept here rather than in figure.py, so that
+checking whether a plot is fresh does not load matplotlib.
+"""
+import hashlib
+import json
+import numpy as np
+import os
+
+
+_manifest_file = 'render_cache.json'
+_digest_length = 12
+qualities = ['publication', 'draft']
+_default_quality = 'publication'
+
+
+def set_default_quality(quality):
+    """Set the render quality of figures which do not specify one, see
+    figure.set_default_quality."""
+    global _default_quality
+    assert quality in qualities, "quality has to be publication or draft"
+    _default_quality = quality
+
+
+def get_default_quality():
+    """Return the render quality of figures which do not specify one."""
+    return _default_quality
+
+
+def digest(parts):
+    """Return the hex digest of an iterable of parts. Arrays are hashed
+    through their bytes, anything else through its repr."""
+    sha = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            sha.update(part.dtype.str)
+            sha.update(repr(part.shape))
+            sha.update(np.ascontiguousarray(part).tostring())
+        else:
+            sha.update(repr(part))
+    return sha.hexdigest()
+
+
+class RenderCache(object):
+    """Manifest of the plots rendered in a directory."""
+
+    def __init__(self, directory, figformat='pdf'):
+        """Constructor
+
+        @param directory: output directory of the plots
+        @param figformat: extension of the plot files
+        """
+        self.directory = directory
+        self.figformat = figformat
+        self.path = os.path.join(directory, _manifest_file)
+        self.manifest = dict()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.manifest = json.load(f)
+
+    def filename(self, base, key):
+        """Return the file name, without extension, of a plot with a key."""
+        return base + '_' + key[:_digest_length]
+
+    def is_fresh(self, base, key):
+        """Return True if the plot has already been rendered with this key."""
+        filename = self.filename(base, key)
+        return (self.manifest.get(os.path.basename(base)) ==
+                os.path.basename(filename) and
+                os.path.exists(filename + '.' + self.figformat))
+
+    def record(self, base, key):
+        """Record that the plot has been rendered with this key, removing
+        the file rendered before for it."""
+        name = os.path.basename(base)
+        new = os.path.basename(self.filename(base, key))
+        old = self.manifest.get(name)
+        if old is not None and old != new:
+            old_path = os.path.join(os.path.dirname(base),
+                                    old + '.' + self.figformat)
+            if os.path.exists(old_path):
+                os.remove(old_path)
+        self.manifest[name] = new
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.rename(temp_path, self.path)
@@ -0,0 +1,140 @@
+"""
+Studies of round-robin partitioning schedules over the intervals of a
+benchmark.
+
+A schedule (offset, quantum_size, first_preferred_thread) prefers one thread
+per quantum of quantum_size intervals after the first offset intervals,
+first_preferred_thread first and then the next threads in turn, as
+read_rddata_from_file_2phase assumes. A Study sums the profiles of every
+thread over the intervals in which it is preferred and over those in which
+it is not, for a whole grid of schedules at once, from the prefix sums of an
+IntervalIndex. The intervals in which a thread is preferred are runs of
+quantum_size intervals, so the preferred profile is the sum of the
+differences of two prefix rows per run, and the unpreferred profile the
+profile of all the intervals after the offset less the preferred one. No file
+is read again.
+"""
+import benchmark as bm
+import itertools as it
+import numpy as np
+
+
+_runs_per_sum = 4096  # prefix rows gathered at a time
+
+
+def grid(offsets, quantum_sizes, first_preferred_threads):
+    """Return the schedules of all the combinations of offsets, quantum
+    sizes and first preferred threads."""
+    return list(it.product(offsets, quantum_sizes, first_preferred_threads))
+
+
+def preferred_runs(schedule, thread, num_intervals, num_threads):
+    """Return the first and the last intervals of the quanta of a schedule
+    in which a thread is preferred, as arrays."""
+    offset, quantum_size, first_preferred_thread = schedule
+    quantum = (thread - first_preferred_thread) % num_threads
+    firsts = np.arange(offset + quantum * quantum_size + 1, num_intervals + 1,
+                       quantum_size * num_threads)
+    return firsts, np.minimum(firsts + quantum_size - 1, num_intervals)
+
+
+def _phase_sums(prefix, offset, firsts, lasts):
+    """Return the sum of the rows of the intervals in the runs firsts to
+    lasts and the sum of the other intervals after the offset, stacked, from
+    the prefix sums of the rows (row i sums the intervals 1 to i)."""
+    preferred = np.zeros(prefix.shape[1:], prefix.dtype)
+    for start in xrange(0, len(firsts), _runs_per_sum):
+        runs = slice(start, start + _runs_per_sum)
+        preferred += prefix[lasts[runs]].sum(axis=0, dtype=prefix.dtype)
+        preferred -= prefix[firsts[runs] - 1].sum(axis=0, dtype=prefix.dtype)
+    after_offset = prefix[-1] - prefix[min(offset, len(prefix) - 1)]
+    return np.array((preferred, after_offset - preferred))
+
+
+class Study(object):
+    """The profiles of all threads, preferred and unpreferred, for a grid of
+    round-robin schedules."""
+
+    def __init__(self, index, schedules):
+        """Constructor
+
+        @param index: IntervalIndex of the benchmark
+        @param schedules: (offset, quantum_size, first_preferred_thread)
+        tuples, see grid
+        """
+        self.index = index
+        self.schedules = list(schedules)
+        # per thread: the frequencies of every distance, whether it appears
+        # and the total frequencies, preferred and unpreferred, indexed by
+        # schedule, phase (0 preferred, 1 unpreferred) and distance
+        self.frequencies = list()
+        self.appear = list()
+        self.totals = list()
+        for t in xrange(index.num_threads):
+            shape = ((len(self.schedules), 2) +
+                     index.frequencies[t].shape[1:])
+            frequencies = np.empty(shape, np.int64)
+            appear = np.empty(shape[:3], bool)
+            totals = np.empty(shape[:2], np.int64)
+            for s, schedule in enumerate(self.schedules):
+                firsts, lasts = preferred_runs(schedule, t,
+                                               index.num_intervals,
+                                               index.num_threads)
+                frequencies[s] = _phase_sums(index.frequencies[t],
+                                             schedule[0], firsts, lasts)
+                appear[s] = _phase_sums(index.appearances[t], schedule[0],
+                                        firsts, lasts) > 0
+                totals[s] = _phase_sums(index.totals[t], schedule[0],
+                                        firsts, lasts)
+            self.frequencies.append(frequencies)
+            self.appear.append(appear)
+            self.totals.append(totals)
+
+    def benchmark(self, schedule):
+        """Return a Benchmark with the profiles
+        read_rddata_from_file_2phase reads for a schedule: profile id 1 is
+        the preferred profile of every thread, 2 the unpreferred one. The
+        total frequencies, misses included, are set too.
+
+        @param schedule: index of the schedule
+        """
+        benchmark = bm.Benchmark(self.index.name, self.index.num_threads,
+                                 self.index.stack_type, self.index.num_sets,
+                                 self.index.num_ways)
+        for t in xrange(self.index.num_threads):
+            distances = self.index.distances[t]
+            for phase in xrange(2):
+                appear = self.appear[t][schedule, phase]
+                benchmark.set_rd_arrays(
+                    t, phase + 1, distances[appear],
+                    self.frequencies[t][schedule, phase][appear],
+                    self.totals[t].item(schedule, phase))
+        benchmark.compact()
+        return benchmark
+
+    def misses(self, capacities=None):
+        """Return the misses of all threads for all schedules as an array
+        indexed by schedule, thread, phase (0 preferred, 1 unpreferred) and
+        capacity: the references with a reuse distance not smaller than the
+        capacity. By default the only capacity is infinite, the misses are
+        those of the input.
+
+        @param capacities: capacities in blocks, see
+        Benchmark.miss_rate_tensor
+        """
+        if capacities is None:
+            capacities = [bm._MAGIC_MISS_DISTANCE]
+        limits = np.array([bm._capacity(c) for c in capacities])
+        misses = np.empty((len(self.schedules), self.index.num_threads, 2,
+                           len(limits)), np.int64)
+        for t in xrange(self.index.num_threads):
+            frequencies = self.frequencies[t]
+            if frequencies.ndim == 4:
+                frequencies = frequencies.sum(axis=3)
+            # hits below every limit: the cdf up to the distances under it
+            cdf = np.concatenate((np.zeros(frequencies.shape[:2] + (1,),
+                                           np.int64),
+                                  frequencies.cumsum(axis=2)), axis=2)
+            hits = cdf[:, :, np.searchsorted(self.index.distances[t], limits)]
+            misses[:, t] = self.totals[t][:, :, np.newaxis] - hits
+        return misses
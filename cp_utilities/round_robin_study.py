@@ -0,0 +1,95 @@
+#! /usr/bin/env python
+"""Sums the profiles of the threads for a grid of round-robin schedules.
+
+NAME
+    round_robin_study.py
+
+SYNOPSYS
+    ./round_robin_study.py benchmark input_file num_threads offsets
+    quantum_sizes first_preferred_threads [capacities]
+
+DESCRIPTION
+    Does what rda_by_hit_plot_2phase.py does for every combination of the
+    offsets, quantum sizes and first preferred threads in one pass, without
+    plotting: for every schedule, divides the intervals of each thread into
+    the intervals where it was preferred and the others, sums the reuse
+    distance signatures of each phase and writes their references and misses
+    to the output, one line per schedule, thread and phase. The input file is
+    read once, see round_robin.py.
+
+OPTIONS
+    benchmark
+        Benchmark name
+
+    input_file
+        Input file containing reuse-distance signatures per interval. This has
+        to be the output of the reuse distance tool, using Pin or simics.
+
+    num_threads
+        Number of threads
+
+    offsets, quantum_sizes, first_preferred_threads
+        Comma separated values or first-last ranges, see
+        rda_by_hit_plot_2phase.py.
+
+    capacities
+        Comma separated capacities in blocks, such as 64,1K, the misses are
+        the references with a reuse distance not smaller. Default the misses
+        of the input only.
+
+EXAMPLES
+    ./round_robin_study.py blackscholes
+    inter_rda_blackscholes_large_4_5mil.out 4 0,1 1-40 0-3 256,1K
+"""
+
+import sys
+import benchmark as bm
+import interval_index as ii
+import round_robin as rr
+
+
+def parse_values(arg):
+    """Return the integers of comma separated values or first-last
+    ranges."""
+    values = list()
+    for token in arg.split(','):
+        bounds = token.split('-')
+        values.extend(xrange(int(bounds[0]), int(bounds[-1]) + 1))
+    return values
+
+
+def round_robin_study():
+    """See script description."""
+    if not(7 <= len(sys.argv) <= 8):
+        sys.stdout.write("Incorrect number of arguments. Program description:\n"
+                         + __doc__)
+        sys.exit(1)
+    benchmark = sys.argv[1]
+    input_file = sys.argv[2]
+    num_threads = int(sys.argv[3])
+    schedules = rr.grid(parse_values(sys.argv[4]), parse_values(sys.argv[5]),
+                        parse_values(sys.argv[6]))
+    capacities = None
+    if len(sys.argv) == 8: capacities = sys.argv[7].split(',')
+
+    new_bm = bm.Benchmark(benchmark, num_threads, None)
+    new_bm.read_rddata_from_file(input_file, num_threads)
+    study = rr.Study(ii.IntervalIndex(new_bm), schedules)
+    misses = study.misses(capacities)
+    columns = ['misses']
+    if capacities is not None:
+        columns = ['misses@' + c for c in capacities]
+    sys.stdout.write("# offset quantum_size first_preferred_thread thread "
+                     "phase references %s\n" % ' '.join(columns))
+    for s, schedule in enumerate(schedules):
+        for t in xrange(num_threads):
+            for phase, name in enumerate(('preferred', 'unpreferred')):
+                sys.stdout.write("%d %d %d %d %s %d %s\n" % (
+                    schedule + (t, name, study.totals[t][s, phase],
+                                ' '.join(str(x) for x in
+                                         misses[s, t, phase].tolist()))))
+    sys.stderr.write("my work is done here\n")
+
+
+if __name__ == '__main__':
+    round_robin_study()
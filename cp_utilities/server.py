@@ -0,0 +1,225 @@
+#! /usr/bin/env python
+"""Answers partition and miss curve queries on benchmarks kept in memory.
+
+NAME
+    server.py
+
+SYNOPSYS
+    ./server.py (--socket path | --port port) store [store ...]
+
+DESCRIPTION
+    Loads the benchmarks of the stores written by the export stage of
+    cp_utils.py (see export.py) once, and answers queries on a local Unix
+    socket or on a TCP port of localhost until interrupted or terminated. The cdfs of every
+    benchmark are kept as one tensor and the best allocations for a number
+    of ways are computed for all intervals on the first query, so a query
+    is a lookup.
+
+    The protocol is JSON Lines: every request is one line, a query object or
+    a list of query objects, and is answered by one line, the answer object
+    or the list of answers in the same order. Sending many queries in one
+    list saves the round trips. Connections are served by one thread each.
+    Queries:
+
+    {"op": "partition", "benchmark": b, "interval": i, "ways": w,
+     "preferred_thread": t}
+        Best number of ways of the preferred thread for the interval, the
+        other threads sharing the rest equally, see
+        Benchmark.best_alloc_for_profile. ways defaults to the ways of the
+        benchmark and can be smaller. Answer {"alloc": a}.
+
+    {"op": "misses", "benchmark": b, "interval": i, "thread": t}
+        Misses of the thread in the interval for 0 to the ways of the
+        benchmark. Answer {"misses": [m0, m1, ...]}.
+
+    {"op": "benchmarks"}
+        Answer {"benchmarks": {name: {"num_threads": n, "num_ways": w,
+        "intervals": [first, last]}}}.
+
+    A query which cannot be answered gets {"error": message}.
+
+OPTIONS
+    --socket path
+        Unix socket to listen on.
+
+    --port port
+        TCP port of localhost to listen on.
+
+    store
+        Directory written by the export stage of cp_utils.py. The stores
+        need the cache geometry, export them after a partition stage or with
+        --set-bits and --ways.
+
+EXAMPLES
+    ./cp_utils.py --set-bits 9 --ways 32 blackscholes rda.out 4 export bs
+    ./server.py --socket /tmp/cp_utils.sock bs
+    echo '{"op": "partition", "benchmark": "blackscholes", "interval": 7}' |
+    nc -U /tmp/cp_utils.sock
+
+NOTES
+    The partitions are those of the private profiles only, the hybrid
+    partitioning of best_partition.py is not served.
+    See benchmarks/server_load.py for a load test client.
+"""
+
+import argparse
+import json
+import os
+import signal
+import SocketServer
+import socket
+import sys
+import threading
+import export
+import numpy as np
+
+
+class AnalysisData(object):
+    """Benchmarks held in memory and the answers computed from them."""
+
+    def __init__(self):
+        """Constructor"""
+        self.benchmarks = dict()
+        self.lock = threading.Lock()
+
+    def add(self, benchmark):
+        """Hold a benchmark, building its cdfs if needed."""
+        if not benchmark.get_cdf_ids():
+            benchmark.build_freq_vs_capacity_profile()
+        profile_ids = benchmark.get_cdf_ids()
+        cdfs = benchmark.cdf_tensor(profile_ids)
+        self.benchmarks[benchmark.name] = {
+            'benchmark': benchmark,
+            'first_id': profile_ids[0] if profile_ids else 0,
+            'num_ids': len(profile_ids),
+            'cdfs': cdfs,
+            'misses': cdfs[:, :, -1:] - np.concatenate(
+                (np.zeros_like(cdfs[:, :, :1]), cdfs[:, :, :-1]), axis=2),
+            'allocs': dict()}
+
+    def _row(self, entry, interval):
+        row = interval - entry['first_id']
+        if not 0 <= row < entry['num_ids']:
+            raise ValueError("no interval %d" % interval)
+        return row
+
+    def partition(self, query):
+        entry = self.benchmarks[query['benchmark']]
+        benchmark = entry['benchmark']
+        ways = query.get('ways', benchmark.num_ways)
+        allocs = entry['allocs'].get(ways)
+        if allocs is None:
+            with self.lock:
+                allocs = entry['allocs'].get(ways)
+                if allocs is None:
+                    allocs = benchmark.best_alloc_table(ways,
+                                                        cdfs=entry['cdfs'])
+                    entry['allocs'][ways] = allocs
+        row = self._row(entry, query['interval'])
+        return {'alloc': int(allocs[query.get('preferred_thread', 0), row])}
+
+    def misses(self, query):
+        entry = self.benchmarks[query['benchmark']]
+        row = self._row(entry, query['interval'])
+        return {'misses': entry['misses'][query.get('thread', 0),
+                                          row].tolist()}
+
+    def list_benchmarks(self, query):
+        return {'benchmarks': dict((name, {
+            'num_threads': entry['benchmark'].num_threads,
+            'num_ways': entry['benchmark'].num_ways,
+            'intervals': [entry['first_id'],
+                          entry['first_id'] + entry['num_ids'] - 1]})
+            for name, entry in self.benchmarks.iteritems())}
+
+    def answer(self, query):
+        """Return the answer to one query."""
+        try:
+            op = {'partition': self.partition,
+                  'misses': self.misses,
+                  'benchmarks': self.list_benchmarks}[query.get('op')]
+            return op(query)
+        except KeyError as err:
+            return {'error': 'unknown %s' % err}
+        except (ValueError, TypeError, IndexError, AssertionError) as err:
+            return {'error': str(err)}
+
+
+class _Handler(SocketServer.StreamRequestHandler):
+    """Answers the lines of one connection."""
+
+    def handle(self):
+        data = self.server.data
+        for line in iter(self.rfile.readline, ''):
+            try:
+                request = json.loads(line)
+            except ValueError:
+                response = {'error': 'malformed request'}
+            else:
+                if isinstance(request, list):
+                    response = [data.answer(query) for query in request]
+                else:
+                    response = data.answer(request)
+            self.wfile.write(json.dumps(response) + '\n')
+            self.wfile.flush()
+
+
+class UnixServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    """Server on a Unix socket, one thread per connection."""
+    daemon_threads = True
+
+    def __init__(self, path, data):
+        if os.path.exists(path):
+            os.remove(path)
+        SocketServer.UnixStreamServer.__init__(self, path, _Handler)
+        self.data = data
+
+
+class TCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    """Server on a TCP port of localhost, one thread per connection."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port, data):
+        SocketServer.TCPServer.__init__(self, ('127.0.0.1', port), _Handler)
+        self.data = data
+
+    def get_request(self):
+        connection, address = SocketServer.TCPServer.get_request(self)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection, address
+
+
+def server():
+    """See script description."""
+    parser = argparse.ArgumentParser(prog='server.py', add_help=False)
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument('--socket')
+    address.add_argument('--port', type=int)
+    parser.add_argument('stores', nargs='+')
+    try:
+        args = parser.parse_args()
+    except SystemExit:
+        sys.stdout.write("Program description:\n" + __doc__)
+        raise
+    data = AnalysisData()
+    for store in args.stores:
+        data.add(export.load_benchmark(store))
+    if args.socket:
+        analysis_server = UnixServer(args.socket, data)
+    else:
+        analysis_server = TCPServer(args.port, data)
+    sys.stderr.write("serving %s\n" % ', '.join(sorted(data.benchmarks)))
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        analysis_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        analysis_server.server_close()
+        if args.socket: os.remove(args.socket)
+    sys.stderr.write("my work is done here\n")
+
+
+if __name__ == '__main__':
+    server()
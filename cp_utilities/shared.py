@@ -0,0 +1,180 @@
+"""
+Shares the profiles and cdfs of a Benchmark between processes without
+copying them.
+
+share() writes the arrays of the tables of a Benchmark (see profile_table.py)
+to .npy files in a directory of shared memory, /dev/shm where it exists, and
+returns a Handle, a small picklable object naming the files. The Benchmark
+itself is switched to the files, so the data is in memory once.
+Handle.attach() maps the files and returns a Benchmark on them: every
+process attached to a handle reads the same physical pages, whatever the
+size of the data, and nothing is pickled but the handle. An attached
+Benchmark may still be changed, the pages it writes become private copies
+of the process. The miss rates of read_mrdata_from_file are not shared.
+
+Python 2 has no multiprocessing.shared_memory, a file in a tmpfs is the same
+memory under a name. Handle.release(), or the end of a with block, removes
+the files; the processes attached by then keep their mappings.
+
+find_best_partition solves the intervals on a pool of processes attached to
+the handles.
+"""
+import benchmark as bm
+import instrument
+import json
+import multiprocessing as mp
+import numpy as np
+import os
+import shutil
+import tempfile
+
+
+_shm = '/dev/shm'
+_description_file = 'benchmark.json'
+_attached = None
+
+
+class Handle(object):
+    """Names the shared arrays of a Benchmark."""
+
+    def __init__(self, directory):
+        """Constructor
+
+        @param directory: directory written by share
+        """
+        self.directory = directory
+
+    def _path(self, thread, table, name):
+        return os.path.join(self.directory,
+                            '%d.%s.%s.npy' % (thread, table, name))
+
+    def attach(self):
+        """Return a Benchmark on the shared arrays."""
+        with open(os.path.join(self.directory, _description_file)) as f:
+            description = json.load(f)
+        benchmark = bm.Benchmark(description['name'],
+                                 description['num_threads'],
+                                 description['stack_type'],
+                                 description['num_sets'],
+                                 description['num_ways'])
+        table_arrays = list()
+        for t, tables in enumerate(description['tables']):
+            thread_arrays = dict()
+            for table, state in tables.iteritems():
+                arrays = thread_arrays[str(table)] = dict()
+                for name, value in state.iteritems():
+                    if isinstance(value, dict):
+                        # an empty file cannot be mapped
+                        if np.prod(value['shape']) == 0:
+                            value = np.empty(value['shape'],
+                                             np.dtype(str(value['dtype'])))
+                        else:
+                            value = np.load(self._path(t, table, name),
+                                            mmap_mode='c')
+                    arrays[str(name)] = value
+            table_arrays.append(thread_arrays)
+        benchmark.set_table_arrays(table_arrays)
+        return benchmark
+
+    def release(self):
+        """Remove the files of the shared arrays."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def share(benchmark, directory=None):
+    """Write the arrays of a Benchmark to shared memory and switch the
+    Benchmark to them, return their Handle.
+
+    @param benchmark: Benchmark to share
+    @param directory: where the directory of the files is created, default
+    /dev/shm, or the temporary directory where there is no /dev/shm
+    """
+    if directory is None and os.path.isdir(_shm):
+        directory = _shm
+    handle = Handle(tempfile.mkdtemp(prefix='cp_utils_', dir=directory))
+    description = {'name': benchmark.name,
+                   'num_threads': benchmark.num_threads,
+                   'stack_type': benchmark.stack_type,
+                   'num_sets': benchmark.num_sets,
+                   'num_ways': benchmark.num_ways,
+                   'tables': list()}
+    for t, tables in enumerate(benchmark.table_arrays()):
+        thread_tables = dict()
+        for table, arrays in tables.iteritems():
+            state = thread_tables[table] = dict()
+            for name, value in arrays.iteritems():
+                if isinstance(value, np.ndarray):
+                    if value.size:
+                        np.save(handle._path(t, table, name), value)
+                    value = {'dtype': value.dtype.str,
+                             'shape': list(value.shape)}
+                state[name] = value
+        description['tables'].append(thread_tables)
+    with open(os.path.join(handle.directory, _description_file), 'w') as f:
+        json.dump(description, f)
+    benchmark.set_table_arrays(handle.attach().table_arrays())
+    return handle
+
+
+def _init_solver(handles):
+    """Attach a solver process to the benchmarks."""
+    global _attached
+    _attached = [None if handle is None else handle.attach()
+                 for handle in handles]
+
+
+def _solve(profile_ids):
+    """Solve a chunk of intervals in a solver process, return the
+    allocations and the instrumentation records (see instrument.py)."""
+    benchmark, shared_profile = _attached
+    if instrument.enabled():
+        instrument.reset()
+    allocations = benchmark.find_best_partition(shared_profile=shared_profile,
+                                                profile_ids=profile_ids)
+    return allocations, instrument.snapshot()
+
+
+def find_best_partition(handle, shared_handle=None, profile_ids=None,
+                        processes=None):
+    """Return the best partitions of Benchmark.find_best_partition, solved
+    by processes attached to the shared benchmarks.
+
+    @param handle: Handle of the benchmark
+    @param shared_handle: Handle of the shared profile of the hybrid case
+    @param profile_ids: intervals to solve, default all
+    @param processes: number of solver processes, default is the number of
+    cores
+    """
+    if processes is None:
+        processes = mp.cpu_count()
+    if profile_ids is None:
+        benchmark = handle.attach()
+        profile_ids = xrange(1, len(benchmark.get_cdf_ids()) + 1)
+    profile_ids = list(profile_ids)
+    # a few chunks per process balance the load
+    num_chunks = min(len(profile_ids), 4 * processes) or 1
+    bounds = np.linspace(0, len(profile_ids), num_chunks + 1).astype(int)
+    chunks = [profile_ids[start:end]
+              for start, end in zip(bounds[:-1], bounds[1:])]
+    pool = mp.Pool(processes, initializer=_init_solver,
+                   initargs=([handle, shared_handle],))
+    try:
+        results = pool.map(_solve, chunks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    best_allocations = None
+    for allocations, records in results:
+        instrument.merge(records)
+        if best_allocations is None:
+            best_allocations = allocations
+        else:
+            for allocs, more in zip(best_allocations, allocations):
+                allocs.extend(more)
+    return best_allocations
@@ -3,9 +3,15 @@ Unit tests for the benchmark module.
 """
 
 import cp_utilities.benchmark as bm
+import cp_utilities.partition_memo as pm
+import cp_utilities.render_cache as rcache
 import errno # file does not exist error
 import os
+import shutil
+from StringIO import StringIO
+import subprocess
 import sys
+import tempfile
 
 def setUpModule():
     pass
@@ -203,6 +209,210 @@ class Test_build_freq_vs_capacity_profile_basic_algo(object):
             if e.errno != errno.ENOENT: raise
 
 
+class Test_find_best_partition_memo(object):
+    """Checks that identical intervals reuse the memoized partition and give
+    the same result as solving every interval."""
+
+    def setUp(self):
+        self.testbm = bm.Benchmark("test_bm", 2, None, 2, 16)
+        cdfs = [[0] * 10 + [100] * 7, [100] * 17]
+        for profile_id in xrange(1, 7):
+            for t in xrange(2):
+                self.testbm.set_freq_cdf(t, profile_id, cdfs[profile_id % 2])
+
+    def test_memo_hits(self):
+        memo = pm.PartitionMemo(verify=True)
+        memoized = self.testbm.find_best_partition(memo=memo)
+        assert memoized == self.testbm.find_best_partition()
+        report = memo.report()
+        assert report['lookups'] == 12
+        assert report['hits'] == 8
+        assert report['mismatches'] == 0
+
+    def test_unequal_volumes(self):
+        # Same shapes, volumes swapped: thread 0 gains at 13 ways, thread 1
+        # loses below 7 ways.
+        testbm = bm.Benchmark("test_bm", 2, None, 2, 16)
+        for profile_id, (big, small) in [(1, (0, 1)), (2, (1, 0))]:
+            volumes = [0, 0]
+            volumes[big], volumes[small] = 1000000, 10
+            testbm.set_freq_cdf(0, profile_id, [0] * 12 + [volumes[0]] * 5)
+            testbm.set_freq_cdf(1, profile_id, [0] * 6 + [volumes[1]] * 11)
+        memo = pm.PartitionMemo()
+        for profile_id in [1, 2]:
+            for preferred_t in xrange(2):
+                assert (testbm.memoized_alloc_for_profile(memo, preferred_t,
+                                                          profile_id) ==
+                        testbm.best_alloc_for_profile(preferred_t, profile_id))
+        assert testbm.best_alloc_for_profile(0, 1) == 13
+        assert testbm.best_alloc_for_profile(0, 2) == 8
+
+
+class Test_best_alloc_table(object):
+    """Checks that the allocations found on the cdf tensor are those of the
+    per interval solver, also with fewer ways."""
+
+    def setUp(self):
+        self.cdfs = [[0] * 10 + [100] * 7, [100] * 17, [10 * x for x in
+                     xrange(17)]]
+
+    def make_benchmark(self, num_ways):
+        testbm = bm.Benchmark("test_bm", 2, None, 2, num_ways)
+        for profile_id in xrange(1, 7):
+            for t in xrange(2):
+                cdf = self.cdfs[(profile_id + t) % 3]
+                testbm.set_freq_cdf(t, profile_id,
+                                    cdf[:num_ways] + cdf[-1:])
+        return testbm
+
+    def test_table(self):
+        full = self.make_benchmark(16)
+        for num_ways in [16, 8]:
+            solved = self.make_benchmark(num_ways).find_best_partition()
+            assert full.best_alloc_table(num_ways).tolist() == solved
+
+
+class Test_get_interval_matrix(object):
+    """Checks that the profiles of all intervals are aligned on the union of
+    their distances."""
+
+    def setUp(self):
+        self.testbm = bm.Benchmark("test_bm", 1, None, 2, 16)
+        self.testbm.set_rd_profile(0, 1, {'1.00': '2', '4.00': '3'}, 5)
+        self.testbm.set_rd_profile(0, 2, {'2.00': '7', '4.00': '1'}, 8)
+
+    def test_matrix(self):
+        ids, distances, matrix = self.testbm.get_interval_matrix(0)
+        assert ids == [1, 2]
+        assert list(distances) == [1.0, 2.0, 4.0]
+        assert matrix.tolist() == [[2, 0, 3], [0, 7, 1]]
+
+
+class Test_aligned_profiles(object):
+    """Checks that the profiles of all threads for an interval are aligned on
+    the union of their distances."""
+
+    def setUp(self):
+        self.testbm = bm.Benchmark("test_bm", 3, None, 2, 18)
+        self.testbm.set_rd_profile(0, 1, {'1.00': '2', '4.00': '3'}, 10)
+        self.testbm.set_rd_profile(1, 1, {'2.00': '7', '4.00': '1'}, 8)
+        self.testbm.set_rd_profile(2, 1, {}, 0)
+
+    def test_profiles(self):
+        distances, matrix = self.testbm.get_aligned_profiles(1)
+        assert list(distances) == [1.0, 2.0, 4.0]
+        assert matrix.tolist() == [[2, 0, 3], [0, 7, 1], [0, 0, 0]]
+        distances, matrix = self.testbm.get_aligned_profiles(1, [1])
+        assert list(distances) == [2.0, 4.0]
+        assert matrix.tolist() == [[7, 1]]
+
+    def test_miss_rates(self):
+        distances, miss_rates = self.testbm.get_aligned_miss_rates(1)
+        assert miss_rates.tolist() == [[0.8, 0.8, 0.5], [1.0, 0.125, 0.0],
+                                       [0.0, 0.0, 0.0]]
+
+
+class Test_miss_rate_tensor(object):
+    """Checks the miss rates computed from the profiles against a loop over
+    the distances."""
+
+    def setUp(self):
+        self.testbm = bm.Benchmark("test_bm", 2, None, 2, 16)
+        self.testbm.set_rd_profile(0, 1, {'1.00': '2', '4.00': '3'}, 10)
+        self.testbm.set_rd_profile(0, 2, {'2.00': '7', '2048.00': '1'}, 8)
+        self.testbm.set_rd_profile(1, 1, {'3.00': '4'}, 4)
+        self.testbm.set_rd_profile(1, 2, {}, 0)
+
+    def expected(self, t, profile_id, capacity):
+        total = self.testbm.get_total_freq(t, profile_id)
+        if not total:
+            return 0.0
+        profile = self.testbm.get_rd_profile(t, profile_id)
+        hits = sum(int(f) for d, f in profile.iteritems()
+                   if float(d) < capacity)
+        return 1 - float(hits) / total
+
+    def test_tensor(self):
+        capacities = [4, 1, '2K', 2]
+        rates = self.testbm.miss_rate_tensor(capacities)
+        assert rates.shape == (2, 2, 4)
+        for t in xrange(2):
+            for i, profile_id in enumerate([1, 2]):
+                for k, capacity in enumerate([4, 1, 2048, 2]):
+                    assert abs(rates[t, i, k] -
+                               self.expected(t, profile_id, capacity)) < 1e-12
+
+    def test_profile_ids(self):
+        rates = self.testbm.miss_rate_tensor([3], [2])
+        assert rates[:, 0, 0].tolist() == [1 - 7.0 / 8, 0.0]
+
+
+class Test_plot_partition_v_misses(object):
+    """Checks that the best partitions are written out, also when the plot
+    is fresh."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory)
+        os.mkdir("test_bm")
+        self.testbm = bm.Benchmark("test_bm", 4, None, 2, 32)
+        cdfs = [[0] * 10 + [100] * 23, [100] * 33,
+                [10 * x for x in xrange(33)]]
+        for profile_id in xrange(1, 3):
+            for t in xrange(4):
+                self.testbm.set_freq_cdf(t, profile_id,
+                                         cdfs[(profile_id + t) % 3])
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_result_written(self):
+        partitions, labels = self.testbm.all_possible_partitions()
+        cache = rcache.RenderCache("test_bm")
+        base = "test_bm/test_bm"
+        key = self.testbm._plot_key('partition_v_misses', xrange(4), False,
+                                    partitions)
+        open(cache.filename(base, key) + '.pdf', 'w').close()
+        cache.record(base, key)
+        out = StringIO()
+        best_allocations = self.testbm.plot_partition_v_misses(out=out)
+        assert len(best_allocations) == 2
+        expected = StringIO()
+        self.testbm.write_best_partition(
+            [[best_allocations[0][t], best_allocations[1][t]]
+             for t in xrange(4)], out=expected)
+        assert out.getvalue() == expected.getvalue()
+        lines = out.getvalue().splitlines()
+        assert lines[0] == "Preferred thread: 0"
+        assert lines[1] == ("Best Alloc for Interval 1: %s" %
+                            best_allocations[0][0])
+        assert len(lines) == 12
+
+
+class Test_headless_import(object):
+    """Checks that the compute core does not load any plotting code."""
+
+    def test_no_matplotlib(self):
+        code = ("import sys, cp_utilities.benchmark, cp_utilities.cluster, "
+                "cp_utilities.phase, cp_utilities.partition_memo; "
+                "sys.exit('matplotlib' in sys.modules)")
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            os.pardir, os.pardir)
+        assert subprocess.call([sys.executable, '-c', code], cwd=root) == 0
+
+    def test_plot_key_no_matplotlib(self):
+        code = ("import sys, cp_utilities.benchmark as bm; "
+                "b = bm.Benchmark('bm', 1, None); "
+                "b.set_rd_profile(0, 1, {'1.00': '2'}, 2); "
+                "b._plot_key('rdp', [0]); "
+                "sys.exit('matplotlib' in sys.modules)")
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            os.pardir, os.pardir)
+        assert subprocess.call([sys.executable, '-c', code], cwd=root) == 0
+
+
 def tearDownModule():
     pass
 
@@ -0,0 +1,69 @@
+"""
+Unit tests for the chunked module.
+"""
+
+import cp_utilities.benchmark as bm
+import cp_utilities.chunked as chunked
+import cp_utilities.export as ex
+import os
+import shutil
+import StringIO
+import tempfile
+
+
+class Test_chunked_store(object):
+    """Checks that a store read one chunk at a time holds the profiles of
+    the whole file and gives the same partitions."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.directory, 'rd.out')
+        with open(self.input_file, 'w') as f:
+            for interval in xrange(1, 8):
+                f.write('Interval:%d\n' % interval)
+                for t in xrange(4):
+                    f.write('thread:%d\n' % t)
+                    f.write('histogram:{%d:%d, %d:10, 4611686018427387904:3}\n'
+                            % (t, 5 * interval, 8 * interval + t))
+        self.testbm = bm.Benchmark("test_bm", 4, None, 1, 32)
+        self.testbm.read_rddata_from_file(self.input_file, 4, 0, 2)
+        self.testbm.build_freq_vs_capacity_profile()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def ingest(self, build_cdfs=True):
+        return chunked.ingest(self.input_file,
+                              os.path.join(self.directory, 'store'),
+                              "test_bm", 4, None, 1, 32, quantum_size=2,
+                              chunk_intervals=2, build_cdfs=build_cdfs)
+
+    def test_chunks(self):
+        store = self.ingest()
+        assert store.num_chunks() == 2
+        assert store.profile_id_range(0) == (1, 2)
+        assert store.profile_id_range(1) == (3, 4)
+        assert store.chunk(1).get_profile_ids(2) == [3, 4]
+        loaded = ex.load_benchmark(store.directory)
+        for t in xrange(4):
+            assert loaded.get_profile_ids(t) == [1, 2, 3, 4]
+            for profile_id in xrange(1, 5):
+                assert (loaded.get_rd_profile(t, profile_id) ==
+                        self.testbm.get_rd_profile(t, profile_id))
+                assert (loaded.get_total_freq(t, profile_id) ==
+                        self.testbm.get_total_freq(t, profile_id))
+                assert (loaded.get_freq_cdf(t, profile_id) ==
+                        self.testbm.get_freq_cdf(t, profile_id))
+
+    def test_partitions(self):
+        store = self.ingest(build_cdfs=False)
+        store.build_freq_vs_capacity_profile()
+        store.find_best_partition()
+        out = StringIO.StringIO()
+        store.write_best_partition(out)
+        expected = StringIO.StringIO()
+        self.testbm.write_best_partition(self.testbm.find_best_partition(),
+                                         out=expected)
+        assert out.getvalue() == expected.getvalue()
+        store.find_best_partition()
+        assert len(list(ex.read_table(store.directory, 'partitions'))) == 2
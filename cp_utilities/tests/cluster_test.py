@@ -0,0 +1,66 @@
+"""
+Unit tests for the cluster module.
+"""
+
+import cp_utilities.benchmark as bm
+import cp_utilities.cluster as cl
+import numpy as np
+
+
+class Test_kmeans(object):
+    """Checks that well separated groups of rows are found, with both the
+    full and the mini-batch variants."""
+
+    def make_data(self):
+        rng = np.random.RandomState(1)
+        centers = np.array([[0.0, 0.0], [10.0, 0.0], [0.0, 10.0]])
+        self.labels = np.repeat(np.arange(3), 20)
+        return centers[self.labels] + rng.normal(scale=0.1, size=(60, 2))
+
+    def check_groups(self, assignments):
+        for group in xrange(3):
+            found = assignments[self.labels == group]
+            assert np.all(found == found[0])
+        assert len(set(assignments)) == 3
+
+    def test_kmeans(self):
+        dummy, assignments = cl.kmeans(self.make_data(), 3)
+        self.check_groups(assignments)
+
+    def test_minibatch_kmeans(self):
+        dummy, assignments = cl.kmeans(self.make_data(), 3, batch_size=10)
+        self.check_groups(assignments)
+
+
+class Test_cluster_intervals(object):
+    """Checks clustering of the intervals of a benchmark."""
+
+    def setUp(self):
+        self.testbm = bm.Benchmark("test_bm", 2, None, 2, 16)
+        for profile_id in xrange(1, 7):
+            dist = '1.00' if profile_id <= 4 else '100.00'
+            for t in xrange(2):
+                self.testbm.set_rd_profile(t, profile_id, {dist: '10'}, 10)
+
+    def test_weights_and_representatives(self):
+        clustering = cl.cluster_intervals(self.testbm, 2)
+        assert sorted(clustering.weights) == [2.0 / 6, 4.0 / 6]
+        assert clustering.representative_of(2) in [1, 2, 3, 4]
+        assert clustering.representative_of(6) in [5, 6]
+
+    def test_representative_partition(self):
+        self.testbm.build_freq_vs_capacity_profile()
+        clustering = cl.cluster_intervals(self.testbm, 2)
+        solved = list()
+        find_best_partition = self.testbm.find_best_partition
+        def recording(shared_profile=None, profile_ids=None, **kwargs):
+            solved.append(profile_ids)
+            return find_best_partition(shared_profile,
+                                       profile_ids=profile_ids, **kwargs)
+        self.testbm.find_best_partition = recording
+        allocations = cl.representative_partition(self.testbm, clustering)
+        reps = sorted(clustering.representatives)
+        assert solved == [reps]
+        compared, report = cl.partition_error(self.testbm, clustering)
+        assert compared == allocations
+        assert report['relative_error'] >= 0.0
@@ -0,0 +1,89 @@
+"""
+Unit tests for the cp_utils module.
+"""
+
+import cp_utilities.cp_utils as cu
+import cp_utilities.instrument as instrument
+import cp_utilities.render_cache as rcache
+import os
+import shutil
+import tempfile
+
+
+class Test_stages(object):
+    """Checks the splitting of the stages and that an input is parsed once
+    for all the runs with the same options."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.directory, 'rd.out')
+        with open(self.input_file, 'w') as f:
+            for interval in xrange(1, 4):
+                f.write('Interval:%d\n' % interval)
+                for t in xrange(2):
+                    f.write('thread:%d\nhistogram:{1:10, 5:3}\n' % t)
+
+    def tearDown(self):
+        cu._parse_cache.clear()
+        shutil.rmtree(self.directory)
+
+    def test_split_stages(self):
+        stages = cu._split_stages(['cluster', '4', 'partition', '--phases',
+                                   'export', 'out'], cu._stage_parsers())
+        assert stages == [('cluster', ['4']), ('partition', ['--phases']),
+                          ('export', ['out'])]
+
+    def test_parse_once(self):
+        argv = ['--set-bits', '1', '--ways', '4', 'bm', self.input_file, '2']
+        first = cu.load(cu._main_parser().parse_args(argv + ['partition']))
+        again = cu.load(cu._main_parser().parse_args(argv + ['export', 'x']))
+        assert first is again
+        assert first[0][1].get_profile_ids(1) == [1, 2, 3]
+        cu.run(argv + ['partition', 'export',
+                       os.path.join(self.directory, 'store')])
+        assert os.path.exists(os.path.join(self.directory, 'store',
+                                           'partitions.00000.alloc.npy'))
+
+    def test_batch_resets_options(self):
+        report = os.path.join(self.directory, 'report.json')
+        manifest = os.path.join(self.directory, 'runs.txt')
+        argv = '--set-bits 1 --ways 4 bm %s 2 partition' % self.input_file
+        with open(manifest, 'w') as f:
+            f.write('--draft --instrument %s %s\n' % (report, argv))
+            f.write(argv + '\n')
+        seen = list()
+        partition_stage = cu._stages['partition']
+        def recording(*args):
+            seen.append((rcache.get_default_quality(), instrument.enabled()))
+            partition_stage(*args)
+        cu._stages['partition'] = recording
+        try:
+            cu.batch(manifest)
+        finally:
+            cu._stages['partition'] = partition_stage
+        assert seen == [('draft', True), ('publication', False)]
+        assert os.path.exists(report)
+        assert rcache.get_default_quality() == 'publication'
+        assert not instrument.enabled()
+
+    def test_batch_drops_parsed_inputs(self):
+        other_file = os.path.join(self.directory, 'other.out')
+        shutil.copy(self.input_file, other_file)
+        manifest = os.path.join(self.directory, 'runs.txt')
+        argv = '--set-bits 1 --ways 4 bm %s 2 partition'
+        with open(manifest, 'w') as f:
+            for input_file in [self.input_file, self.input_file, other_file]:
+                f.write(argv % input_file + '\n')
+        seen = list()
+        partition_stage = cu._stages['partition']
+        def recording(args, options, benchmarks, state):
+            seen.append((len(cu._parse_cache), benchmarks))
+            partition_stage(args, options, benchmarks, state)
+        cu._stages['partition'] = recording
+        try:
+            cu.batch(manifest)
+        finally:
+            cu._stages['partition'] = partition_stage
+        assert [size for size, dummy in seen] == [1, 1, 1]
+        assert seen[0][1] is seen[1][1] and seen[1][1] is not seen[2][1]
+        assert not cu._parse_cache
@@ -0,0 +1,78 @@
+"""
+Unit tests for the export module.
+"""
+
+import cp_utilities.benchmark as bm
+import cp_utilities.export as ex
+import shutil
+import StringIO
+import tempfile
+
+
+class Test_export_benchmark(object):
+    """Checks that a benchmark is rebuilt from its store and that the
+    partition tables match the solvers."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.testbm = bm.Benchmark("test_bm", 4, None, 1, 32)
+        for profile_id in xrange(1, 4):
+            for t in xrange(4):
+                profile = {'%.2f' % (t + profile_id): '10', '20.00': '3'}
+                self.testbm.set_rd_profile(t, profile_id, profile, 15)
+        self.testbm.build_freq_vs_capacity_profile()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        ex.export_benchmark(self.testbm, self.directory, chunk_profiles=2)
+        loaded = ex.load_benchmark(self.directory)
+        for t in xrange(4):
+            assert loaded.get_profile_ids(t) == [1, 2, 3]
+            for profile_id in xrange(1, 4):
+                assert (loaded.get_rd_profile(t, profile_id) ==
+                        self.testbm.get_rd_profile(t, profile_id))
+                assert loaded.get_total_freq(t, profile_id) == 15
+                assert (loaded.get_freq_cdf(t, profile_id) ==
+                        self.testbm.get_freq_cdf(t, profile_id))
+
+    def test_empty_chunk(self):
+        for profile_id in xrange(1, 3):
+            self.testbm.set_rd_profile(0, profile_id, dict(), 5)
+        ex.export_benchmark(self.testbm, self.directory, chunk_profiles=2)
+        info = ex.read_metadata(self.directory)['tables']
+        assert info['profiles']['chunks'][0] == 0
+        assert (len(info['profiles']['chunks']) ==
+                len(info['totals']['chunks']))
+        for chunk in xrange(len(info['totals']['chunks'])):
+            loaded = ex.load_benchmark(self.directory, chunks=[chunk])
+            t, start = divmod(chunk, 2)
+            for profile_id in xrange(2 * start + 1, min(2 * start + 3, 4)):
+                assert (loaded.get_rd_profile(t, profile_id) ==
+                        self.testbm.get_rd_profile(t, profile_id))
+                assert (loaded.get_total_freq(t, profile_id) ==
+                        self.testbm.get_total_freq(t, profile_id))
+        out = StringIO.StringIO()
+        ex.write_csv(self.directory, 'profiles', out)
+        assert len(out.getvalue().splitlines()) == 1 + 2 + 3 * 2 * 3
+
+    def test_partitions(self):
+        allocs = self.testbm.find_best_partition()
+        ex.export_benchmark(self.testbm, self.directory, allocs,
+                            partition_misses=True)
+        partitions, dummy = self.testbm.all_possible_partitions()
+        chunk = next(ex.read_table(self.directory, 'partition_misses'))
+        for row, profile_id in enumerate(chunk['profile_id']):
+            for preferred_t in xrange(4):
+                for k, alloc in enumerate(partitions):
+                    misses = sum(self.testbm.get_misses(
+                        (preferred_t + index) % 4, profile_id, x)
+                        for index, x in enumerate(alloc))
+                    assert chunk['misses'][row, preferred_t, k] == misses
+        out = StringIO.StringIO()
+        ex.write_csv(self.directory, 'partitions', out)
+        lines = out.getvalue().splitlines()
+        assert lines[0] == 'alloc,preferred_thread,profile_id'
+        assert lines[1] == '%d,0,1' % allocs[0][0]
+        assert len(lines) == 13
@@ -0,0 +1,86 @@
+"""
+Unit tests for the downsampling and the labels of the figure module.
+"""
+
+import cp_utilities.benchmark as bm
+import cp_utilities.figure as fig
+from distutils.spawn import find_executable
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class Test_decimation(object):
+    """Checks that the downsampled series keep their ends and peaks."""
+
+    def setUp(self):
+        self.x = np.arange(10000)
+        self.y = np.zeros(10000)
+        self.y[1234] = 50.0
+        self.y[7000] = -20.0
+
+    def test_lttb(self):
+        kept = fig.lttb(self.x, self.y, 100)
+        assert len(kept) == 100
+        assert kept[0] == 0 and kept[-1] == 9999
+        assert 1234 in kept and 7000 in kept
+        assert np.all(np.diff(kept) > 0)
+
+    def test_minmax(self):
+        kept = fig.minmax(self.y, 50)
+        assert len(kept) <= 100
+        assert 1234 in kept and 7000 in kept
+        assert np.all(np.diff(kept) > 0)
+
+    def test_short_series(self):
+        assert list(fig.lttb(self.x[:5], self.y[:5], 100)) == range(5)
+        assert list(fig.minmax(self.y[:5], 50)) == range(5)
+
+
+class Test_thin_ticks(object):
+    """Checks that blank labels are dropped first and the number of ticks is
+    bounded."""
+
+    def test_thin_ticks(self):
+        labels = [str(i) if i % 2 == 0 else ' ' for i in xrange(100)]
+        ticks, kept_labels = fig.thin_ticks(range(100), labels, 10)
+        assert len(ticks) == 10
+        assert ticks[0] == 0 and ticks[-1] == 98
+        assert kept_labels == [str(t) for t in ticks]
+
+
+class Test_publication_labels(object):
+    """Checks that the labels of the miss rate plot are valid LaTeX."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_axis_label(self):
+        figure = fig.Figure('labels', quality='publication')
+        assert figure.axis_label('Miss rate (%)')[0] == \
+            r'\textit{Miss rate (\%)}'
+        assert figure.axis_label(r'Miss rate (\%)')[0] == \
+            r'\textit{Miss rate (\%)}'
+        figure.quality = 'draft'
+        assert figure.axis_label('Miss rate (%)')[0] == 'Miss rate (%)'
+        figure.filename.close()
+
+    def test_mr_plot(self):
+        if find_executable('latex') is None:
+            raise unittest.SkipTest("publication quality needs LaTeX")
+        testbm = bm.Benchmark("test_bm", 2, None)
+        for profile_id in xrange(1, 4):
+            for t in xrange(2):
+                testbm.set_rd_profile(t, profile_id, {'1.00': '10',
+                                                      '300.00': '5'}, 20)
+        os.mkdir("test_bm")
+        testbm.plot_mr_v_interval(capacities=[64, '1K'])
+        assert any(name.endswith('.pdf') for name in os.listdir("test_bm"))
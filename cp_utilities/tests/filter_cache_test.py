@@ -0,0 +1,87 @@
+"""
+Unit tests for the filter_cache module.
+"""
+
+import cp_utilities.benchmark as bm
+import cp_utilities.filter_cache as fc
+import errno # file does not exist error
+import os
+import random
+
+
+class Test_reuse_distance_stack(object):
+    """Checks the stack distances against a naive computation, with a small
+    initial size so that the timestamps get compacted and grown."""
+
+    def test_against_naive_distances(self):
+        rng = random.Random(7)
+        stack = fc.ReuseDistanceStack(initial_size=4)
+        history = list()
+        for dummy in xrange(2000):
+            address = rng.randint(0, 50)
+            if address in history:
+                last = len(history) - 1 - history[::-1].index(address)
+                expected = len(set(history[last + 1:]))
+            else:
+                expected = fc._MAGIC_MISS_DISTANCE
+            assert stack.access(address) == expected
+            history.append(address)
+
+
+class Test_filter_cache(object):
+    """Checks hits and LRU replacement in a set-associative filter."""
+
+    def test_lru_replacement(self):
+        cache = fc.FilterCache(4, 2)
+        # 0, 2 and 4 map to the same set of 2 ways.
+        hits = [cache.access(x) for x in [0, 2, 0, 4, 0, 2, 1, 0]]
+        assert hits == [False, False, True, False, True, False, False, True]
+
+    def test_fully_associative(self):
+        cache = fc.FilterCache(2)
+        hits = [cache.access(x) for x in [5, 9, 5, 7, 9]]
+        assert hits == [False, False, True, False, False]
+
+
+class Test_filtered_histograms(object):
+    """Checks that only references missing in the filter are profiled."""
+
+    def setUp(self):
+        self.input_file = "trace.txt"
+        with open(self.input_file, 'w') as f:
+            f.write('Interval:1\n')
+            f.write('thread:0\n')
+            f.write('access:0x1 0x2 0x1 0x3 0x4 0x1\n')
+
+    def test_filtered_distances(self):
+        results = list(fc.filtered_histograms(self.input_file, 1, 2))
+        # The second 0x1 hits in the filter. The third one misses, with 0x2,
+        # 0x3 and 0x4 in between in the filtered stream.
+        assert results == [(1, 0, {3.0: 1}, 5)]
+
+    def test_read_trace(self):
+        with open(self.input_file, 'a') as f:
+            f.write('Interval:2\n')
+            f.write('thread:0\n')
+            f.write('access:0x5 0x6 0x7 0x5\n')
+        testbm = bm.Benchmark("test_bm", 1, None)
+        testbm.read_trace_from_file(self.input_file, 1, 2, quantum_size=2)
+        # the interval 2 adds distance 2 for 0x5, after 0x6 and 0x7
+        assert testbm.get_profile_ids(0) == [1]
+        assert testbm.get_rd_profile(0, 1) == {'2.00': '1', '3.00': '1'}
+        assert testbm.get_total_freq(0, 1) == 9
+
+    def test_shared_rejected(self):
+        try:
+            list(fc.filtered_histograms(self.input_file, 1, 2, 0, "shared"))
+        except ValueError:
+            pass
+        else:
+            assert False, "shared stacks need an interleaved trace"
+
+    def tearDown(self):
+        try:
+            os.remove(self.input_file)
+        except OSError as e:
+            # errno.ENOENT = no such file or directory
+            if e.errno != errno.ENOENT: raise
@@ -0,0 +1,67 @@
+"""
+Unit tests for the instrument module.
+"""
+
+import cp_utilities.instrument as instrument
+import cp_utilities.render as render
+import os
+import shutil
+import tempfile
+
+
+def _job(n):
+    with instrument.stage('job'):
+        instrument.count('items', n)
+
+
+class Test_instrument(object):
+    """Checks the stage records and counters, off and on."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        instrument.disable()
+        shutil.rmtree(self.directory)
+
+    def test_disabled(self):
+        instrument.disable()
+        with instrument.stage('parse'):
+            instrument.count('lines', 10)
+        assert instrument.snapshot() is None
+
+    def test_stages(self):
+        instrument.enable()
+
+        @instrument.instrumented()
+        def solve(depth):
+            instrument.count('intervals')
+            if depth: solve(depth - 1)
+        with instrument.stage('parse'):
+            instrument.count('lines', 10)
+        solve(2)
+        solve(0)
+        records = instrument.report()
+        assert records['stages']['parse']['calls'] == 1
+        assert records['stages']['parse']['counters'] == {'lines': 10}
+        # a stage called from itself is timed once
+        assert records['stages']['solve']['calls'] == 2
+        assert records['stages']['solve']['counters'] == {'intervals': 4}
+        assert records['counters'] == {'lines': 10, 'intervals': 4}
+        assert records['wall'] >= records['stages']['parse']['wall']
+        assert instrument.summary(records).startswith('instrument: ')
+
+    def test_profile(self):
+        instrument.enable(profile_dir=self.directory)
+        with instrument.stage('parse'):
+            with instrument.stage('inner'):
+                pass
+        assert os.listdir(self.directory) == \
+            ['parse.%d.1.prof' % os.getpid()]
+
+    def test_workers(self):
+        instrument.enable()
+        render.run_jobs([(_job, (n,), {}) for n in xrange(1, 5)], 2)
+        records = instrument.report()
+        assert records['stages']['job']['calls'] == 4
+        assert records['counters'] == {'items': 10}
@@ -0,0 +1,54 @@
+"""
+Unit tests for the interval_index module.
+"""
+
+import cp_utilities.benchmark as bm
+import cp_utilities.interval_index as ii
+import os
+import shutil
+import tempfile
+
+
+class Test_interval_index(object):
+    """Checks that the profiles of ranges of intervals are those of the
+    intervals summed and that regrouping gives the profiles of
+    read_rddata_from_file."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.directory, 'rd.out')
+        with open(self.input_file, 'w') as f:
+            for interval in xrange(1, 12):
+                f.write('Interval:%d\n' % interval)
+                for t in xrange(2):
+                    f.write('thread:%d\n' % t)
+                    f.write('histogram:{%d:%d, %d:0, 4611686018427387904:3}\n'
+                            % (t + interval % 3, interval, 8 * interval + t))
+        self.testbm = bm.Benchmark("test_bm", 2, None, 1, 32)
+        self.testbm.read_rddata_from_file(self.input_file, 2)
+        self.index = ii.IntervalIndex(self.testbm)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_range_profile(self):
+        distances, frequencies, total = self.index.range_profile(1, 2, 4)
+        assert distances.tolist() == [1.0, 2.0, 3.0, 17.0, 25.0, 33.0]
+        assert frequencies.tolist() == [3, 4, 2, 0, 0, 0]
+        assert total == 18
+
+    def test_regroup(self):
+        for offset in (0, 1, 4):
+            for quantum_size in (1, 2, 3, 5):
+                expected = bm.Benchmark("test_bm", 2, None, 1, 32)
+                expected.read_rddata_from_file(self.input_file, 2, offset,
+                                               quantum_size)
+                regrouped = self.index.regroup(offset, quantum_size)
+                for t in xrange(2):
+                    profile_ids = expected.get_profile_ids(t)
+                    assert regrouped.get_profile_ids(t) == profile_ids
+                    for profile_id in profile_ids:
+                        assert (regrouped.get_rd_profile(t, profile_id) ==
+                                expected.get_rd_profile(t, profile_id))
+                        assert (regrouped.get_total_freq(t, profile_id) ==
+                                expected.get_total_freq(t, profile_id))
@@ -0,0 +1,50 @@
+"""
+Unit tests for the phase module.
+"""
+
+import cp_utilities.benchmark as bm
+import cp_utilities.phase as ph
+import numpy as np
+
+
+class Test_phase_boundaries(object):
+    """Checks that a change of signature starts a new phase, with both
+    metrics, and that the partitions are reused inside a phase."""
+
+    def setUp(self):
+        self.testbm = bm.Benchmark("test_bm", 2, None, 2, 16)
+        for profile_id in xrange(1, 9):
+            dist = '1.00' if profile_id <= 5 else '100.00'
+            for t in xrange(2):
+                self.testbm.set_rd_profile(t, profile_id,
+                                           {dist: '10', '3.00': '1'}, 11)
+
+    def test_boundaries(self):
+        for metric in ['l1', 'js']:
+            yield self.check_boundaries, metric
+
+    def check_boundaries(self, metric):
+        assert ph.phase_boundaries(self.testbm, metric=metric) == [1, 6]
+
+    def test_reuse_inside_phase(self):
+        self.testbm.build_freq_vs_capacity_profile()
+        boundaries = ph.phase_boundaries(self.testbm)
+        full = self.testbm.find_best_partition()
+        reused = self.testbm.find_best_partition(phase_boundaries=boundaries)
+        assert full == reused
+
+
+class Test_js(object):
+    """Checks that the divergence covers the mass at distance 0."""
+
+    def test_distance_zero(self):
+        testbm = bm.Benchmark("test_bm", 1, None, 2, 16)
+        testbm.set_rd_profile(0, 1, {'0.00': '10', '1.00': '10'}, 20)
+        testbm.set_rd_profile(0, 2, {'0.00': '30', '1.00': '10'}, 40)
+        p = np.array([0.5, 0.5])
+        q = np.array([0.75, 0.25])
+        m = 0.5 * (p + q)
+        expected = 0.5 * ((p * np.log2(p / m)).sum() +
+                          (q * np.log2(q / m)).sum())
+        found = ph._js(ph.log2_cdfs(testbm, 1), ph.log2_cdfs(testbm, 2))
+        assert np.allclose(found, expected)
@@ -0,0 +1,97 @@
+"""
+Unit tests for the profile_table module.
+"""
+
+import cp_utilities.profile_table as pt
+import numpy as np
+
+
+class Test_profile_table(object):
+    """Checks that the tables behave as the dicts they replace."""
+
+    def setUp(self):
+        self.profiles = pt.ProfileTable()
+        self.profiles[3] = {'12.00': '5', '1.00': '7', '100.00': '1'}
+        self.profiles[1] = {4.0: 2}
+        self.profiles[2] = dict()
+
+    def test_profiles(self):
+        assert self.profiles.keys() == [1, 2, 3]
+        assert len(self.profiles) == 3
+        assert 2 in self.profiles and 4 not in self.profiles
+        assert self.profiles[3] == {'1.00': '7', '12.00': '5',
+                                    '100.00': '1'}
+        assert self.profiles[1] == {'4.00': '2'}
+        assert self.profiles[2] == dict()
+        distances, frequencies = self.profiles.arrays(3)
+        assert distances.tolist() == [1.0, 12.0, 100.0]
+        assert frequencies.tolist() == [7, 5, 1]
+        assert self.profiles.get(7) is None
+
+    def test_concatenated(self):
+        lengths, distances, frequencies = self.profiles.concatenated([3, 1])
+        assert lengths.tolist() == [3, 1]
+        assert distances.tolist() == [1.0, 12.0, 100.0, 4.0]
+        assert frequencies.tolist() == [7, 5, 1, 2]
+        lengths, distances, frequencies = self.profiles.concatenated()
+        assert lengths.tolist() == [1, 0, 3]
+
+    def test_rounded_distances(self):
+        self.profiles[5] = {1.001: 2, 1.002: 3, 2.0: 1}
+        assert self.profiles[5] == {'1.00': '5', '2.00': '1'}
+
+    def test_hit_types(self):
+        profiles = pt.ProfileTable()
+        profiles[1] = {'2.00': ['1', '2', '3', '4', '5'],
+                       '1.00': ['0', '0', '1', '0', '0']}
+        distances, frequencies = profiles.arrays(1)
+        assert distances.tolist() == [1.0, 2.0]
+        assert frequencies.tolist() == [[0, 0, 1, 0, 0], [1, 2, 3, 4, 5]]
+        assert profiles[1]['2.00'] == ['1', '2', '3', '4', '5']
+
+    def test_growth(self):
+        values = pt.ValueTable()
+        rows = pt.RowTable()
+        for profile_id in xrange(1000, 0, -1):
+            values[profile_id] = 2 * profile_id
+            rows[profile_id] = [profile_id, profile_id + 1]
+        values[10] = 0
+        assert len(values) == 1000 and len(rows) == 1000
+        assert values.keys() == range(1, 1001)
+        assert values[10] == 0 and values[999] == 1998
+        assert rows[7] == [7, 8]
+        assert rows.value(7, 1) == 8
+        assert rows.array([3, 1]).tolist() == [[3, 4], [1, 2]]
+
+    def test_late_ids(self):
+        # the tables of a chunk late in a run are as large as the first ones
+        def tables(first):
+            profiles, values, rows = (pt.ProfileTable(), pt.ValueTable(),
+                                      pt.RowTable())
+            for profile_id in xrange(first + 9, first - 1, -1):
+                profiles[profile_id] = {'1.00': '2', '5.00': '3'}
+                values[profile_id] = profile_id
+                rows.set_rows([profile_id], [[profile_id, 1]])
+            for table in profiles, values, rows:
+                table.compact()
+            return profiles, values, rows
+        early, late = tables(1), tables(10 ** 7)
+        for early_table, late_table in zip(early, late):
+            assert early_table.nbytes() == late_table.nbytes()
+        assert late[0].keys() == range(10 ** 7, 10 ** 7 + 10)
+        assert late[1].array([10 ** 7 + 3]).tolist() == [10 ** 7 + 3]
+        assert late[2][10 ** 7] == [10 ** 7, 1]
+        assert 3 not in late[1] and late[1].get(10 ** 7 + 10) is None
+
+    def test_set_rows(self):
+        rows = pt.RowTable()
+        rows.set_rows([2, 5], np.array([[1, 2], [3, 4]]))
+        assert rows.keys() == [2, 5]
+        assert rows[5] == [3, 4]
+        assert rows.array().tolist() == [[1, 2], [3, 4]]
+        try:
+            rows[3]
+        except KeyError:
+            pass
+        else:
+            assert False, "missing profile id"
@@ -0,0 +1,60 @@
+"""
+Unit tests for the progress module.
+"""
+
+import cp_utilities.progress as progress
+import logging
+
+
+class _Records(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = list()
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class Test_progress(object):
+    """Checks the progress reports and the debug switch."""
+
+    def setUp(self):
+        self.level = progress.log.level
+        self.handler = _Records()
+        progress.log.addHandler(self.handler)
+
+    def tearDown(self):
+        progress.log.removeHandler(self.handler)
+        progress.log.setLevel(self.level)
+
+    def test_report(self):
+        progress.log.setLevel(logging.INFO)
+        assert not progress.debug_enabled()
+        done = progress.Progress('read', 4, 'bytes', period=0)
+        done.update(1, tokens=10)
+        done.set(3, tokens=30)
+        done.done()
+        assert len(self.handler.messages) == 3
+        assert self.handler.messages[0].startswith('read: 1/4 bytes, ')
+        assert 'tokens/s' in self.handler.messages[0]
+        assert 'ETA' in self.handler.messages[1]
+        assert self.handler.messages[2].startswith('read: 3 bytes, ')
+        assert ' in ' in self.handler.messages[2]
+
+    def test_rate_limit(self):
+        progress.log.setLevel(logging.INFO)
+        done = progress.Progress('solve', 1000, period=3600)
+        for dummy in xrange(1000):
+            done.update()
+        done.done()
+        assert self.handler.messages == []
+        assert done.done_units == 1000
+
+    def test_disabled(self):
+        progress.log.setLevel(logging.WARNING)
+        done = progress.Progress('solve', 10, period=0)
+        done.update(5)
+        done.done()
+        assert self.handler.messages == []
+        progress.log.setLevel(logging.DEBUG)
+        assert progress.debug_enabled()
@@ -0,0 +1,42 @@
+"""
+Unit tests for the render_cache module.
+"""
+
+import cp_utilities.render_cache as rcache
+import numpy as np
+import os
+import shutil
+import tempfile
+
+
+class Test_render_cache(object):
+    """Checks that a plot is fresh only with the key it was rendered with,
+    and that the file of an older key is replaced."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.base = os.path.join(self.directory, 'bm_t0_rdp')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def render(self, cache, key):
+        open(cache.filename(self.base, key) + '.pdf', 'w').close()
+        cache.record(self.base, key)
+
+    def test_digest(self):
+        data = np.arange(10)
+        assert rcache.digest([data, 'a']) == rcache.digest([data.copy(), 'a'])
+        assert rcache.digest([data, 'a']) != rcache.digest([data, 'b'])
+        assert rcache.digest([data]) != rcache.digest([data.astype(float)])
+
+    def test_fresh(self):
+        cache = rcache.RenderCache(self.directory)
+        assert not cache.is_fresh(self.base, 'a' * 40)
+        self.render(cache, 'a' * 40)
+        cache = rcache.RenderCache(self.directory)
+        assert cache.is_fresh(self.base, 'a' * 40)
+        assert not cache.is_fresh(self.base, 'b' * 40)
+        self.render(cache, 'b' * 40)
+        assert sorted(os.listdir(self.directory)) == \
+            ['bm_t0_rdp_' + 'b' * 12 + '.pdf', 'render_cache.json']
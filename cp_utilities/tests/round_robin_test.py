@@ -0,0 +1,76 @@
+"""
+Unit tests for the round_robin module.
+"""
+
+import cp_utilities.benchmark as bm
+import cp_utilities.interval_index as ii
+import cp_utilities.round_robin as rr
+import os
+import shutil
+import tempfile
+
+
+class Test_round_robin_study(object):
+    """Checks that a study of a grid of schedules gives the profiles of
+    read_rddata_from_file_2phase for every schedule, and their misses."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.directory, 'rd.out')
+        with open(self.input_file, 'w') as f:
+            for interval in xrange(1, 14):
+                f.write('Interval:%d\n' % interval)
+                for t in xrange(3):
+                    f.write('thread:%d\n' % t)
+                    f.write('histogram:{%d:%d, %d:2, 4611686018427387904:%d}\n'
+                            % (t + interval % 4, interval, 100 * t + 40,
+                               interval + t))
+        testbm = bm.Benchmark("test_bm", 3, None)
+        testbm.read_rddata_from_file(self.input_file, 3)
+        self.schedules = rr.grid((0, 2), (1, 3), (0, 2))
+        self.study = rr.Study(ii.IntervalIndex(testbm), self.schedules)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def runs(self, schedule, thread, num_intervals):
+        firsts, lasts = rr.preferred_runs(schedule, thread, num_intervals, 3)
+        return [i for first, last in zip(firsts, lasts)
+                for i in xrange(first, last + 1)]
+
+    def test_preferred_runs(self):
+        assert self.runs((2, 2, 1), 0, 9) == [7, 8]
+        assert self.runs((2, 2, 1), 1, 9) == [3, 4, 9]
+        assert self.runs((2, 2, 1), 2, 9) == [5, 6]
+        assert self.runs((5, 4, 1), 0, 13) == []
+        assert self.runs((5, 4, 1), 1, 13) == [6, 7, 8, 9]
+        assert self.runs((5, 4, 1), 2, 13) == [10, 11, 12, 13]
+        for t in xrange(3):
+            assert self.runs((20, 2, 0), t, 13) == []
+
+    def test_profiles(self):
+        for s, schedule in enumerate(self.schedules):
+            expected = bm.Benchmark("test_bm", 3, None)
+            expected.read_rddata_from_file_2phase(self.input_file, 3,
+                                                  *schedule)
+            studied = self.study.benchmark(s)
+            for t in xrange(3):
+                for profile_id in (1, 2):
+                    assert (studied.get_rd_profile(t, profile_id) ==
+                            expected.get_rd_profile(t, profile_id))
+
+    def test_misses(self):
+        misses = self.study.misses([41, '1K'])
+        for s in xrange(len(self.schedules)):
+            studied = self.study.benchmark(s)
+            for t in xrange(3):
+                for phase in xrange(2):
+                    total = studied.get_total_freq(t, phase + 1)
+                    profile = studied.get_rd_profile(t, phase + 1)
+                    hits = sum(int(f) for d, f in profile.iteritems()
+                               if float(d) < 41)
+                    assert misses[s, t, phase].tolist() == \
+                        [total - hits, total - sum(int(f) for f in
+                                                   profile.itervalues())]
+        default = self.study.misses()
+        assert (default[:, :, :, 0] == misses[:, :, :, 1]).all()
@@ -0,0 +1,43 @@
+"""
+Unit tests for the server module.
+"""
+
+import cp_utilities.benchmark as bm
+import cp_utilities.server as sv
+
+
+class Test_answer(object):
+    """Checks the answers to the queries, without a socket."""
+
+    def setUp(self):
+        testbm = bm.Benchmark("test_bm", 2, None, 2, 16)
+        cdfs = [[0] * 10 + [100] * 7, [100] * 17]
+        for profile_id in xrange(1, 4):
+            for t in xrange(2):
+                testbm.set_freq_cdf(t, profile_id, cdfs[profile_id % 2])
+        self.allocs = testbm.find_best_partition()
+        self.data = sv.AnalysisData()
+        self.data.add(testbm)
+
+    def test_partition(self):
+        for preferred_t in xrange(2):
+            for profile_id in xrange(1, 4):
+                answer = self.data.answer({'op': 'partition',
+                                           'benchmark': 'test_bm',
+                                           'interval': profile_id,
+                                           'preferred_thread': preferred_t})
+                assert answer == {'alloc':
+                                  self.allocs[preferred_t][profile_id - 1]}
+
+    def test_misses(self):
+        answer = self.data.answer({'op': 'misses', 'benchmark': 'test_bm',
+                                   'interval': 2, 'thread': 0})
+        assert answer == {'misses': [100] * 11 + [0] * 6}
+
+    def test_errors(self):
+        assert 'error' in self.data.answer({'op': 'misses',
+                                            'benchmark': 'test_bm',
+                                            'interval': 9})
+        assert 'error' in self.data.answer({'op': 'partition',
+                                            'benchmark': 'other',
+                                            'interval': 1})
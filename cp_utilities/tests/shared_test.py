@@ -0,0 +1,61 @@
+"""
+Unit tests for the shared module.
+"""
+
+import cp_utilities.benchmark as bm
+import cp_utilities.shared as shared
+import os
+import pickle
+
+
+class Test_shared(object):
+    """Checks that an attached benchmark holds the same data and that the
+    parallel solver finds the partitions of the serial one."""
+
+    def setUp(self):
+        self.testbm = bm.Benchmark("test_bm", 4, None, 1, 32)
+        for profile_id in xrange(1, 6):
+            for t in xrange(4):
+                profile = {'%.2f' % (t * profile_id): '10',
+                           '%.2f' % (3 * profile_id + 8): '30'}
+                self.testbm.set_rd_profile(t, profile_id, profile, 45)
+        self.testbm.build_freq_vs_capacity_profile()
+        self.expected = [[self.testbm.get_rd_profile(t, profile_id)
+                          for profile_id in xrange(1, 6)] for t in xrange(4)]
+        self.handle = shared.share(self.testbm)
+
+    def tearDown(self):
+        self.handle.release()
+
+    def test_attach(self):
+        handle = pickle.loads(pickle.dumps(self.handle))
+        attached = handle.attach()
+        for t in xrange(4):
+            assert attached.get_profile_ids(t) == [1, 2, 3, 4, 5]
+            for profile_id in xrange(1, 6):
+                assert (attached.get_rd_profile(t, profile_id) ==
+                        self.expected[t][profile_id - 1])
+                assert (self.testbm.get_rd_profile(t, profile_id) ==
+                        self.expected[t][profile_id - 1])
+                assert attached.get_total_freq(t, profile_id) == 45
+                assert (attached.get_freq_cdf(t, profile_id) ==
+                        self.testbm.get_freq_cdf(t, profile_id))
+
+    def test_private_changes(self):
+        attached = self.handle.attach()
+        cdf = attached.get_freq_cdf(1, 2)
+        attached.set_freq_cdf(1, 2, [0] * len(cdf))
+        attached.set_rd_profile(1, 6, {'1.00': '1'}, 1)
+        assert self.testbm.get_freq_cdf(1, 2) == cdf
+        assert self.handle.attach().get_freq_cdf(1, 2) == cdf
+        assert self.testbm.get_profile_ids(1) == [1, 2, 3, 4, 5]
+
+    def test_parallel_partition(self):
+        assert (shared.find_best_partition(self.handle, processes=2) ==
+                self.testbm.find_best_partition())
+
+    def test_release(self):
+        self.handle.attach()
+        self.handle.release()
+        assert not os.path.exists(self.handle.directory)
+        assert (self.testbm.get_rd_profile(0, 3) == self.expected[0][2])